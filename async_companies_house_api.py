@@ -0,0 +1,388 @@
+import asyncio
+import logging
+import os
+import time
+from urllib.parse import quote_plus
+
+try:
+    import aiohttp
+except ImportError:  # Optional dependency, only needed for the async client.
+    aiohttp = None
+
+from companies_house_api import CompaniesHouseAPI, RequestFailed, request_key
+from instrumentation import RequestMetrics
+from key_pool import KeyPool, resolve_api_keys
+from rate_limiter import RateLimiter
+from records import loads
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCompaniesHouseAPI:
+    """
+    An asyncio twin of CompaniesHouseAPI, for fanning out many lookups from a
+    single process.
+
+    Requests share a bounded pool of keep-alive connections and at most
+    `max_concurrency` of them are in flight at once. Rate limiting, retries and
+    caching behave as in CompaniesHouseAPI. Requires the aiohttp package.
+
+    Use it as an async context manager, or call close() when done:
+
+        async with AsyncCompaniesHouseAPI() as client:
+            profiles = await asyncio.gather(*(client.get_company_profile(n) for n in numbers))
+    """
+
+    BASE_URL = CompaniesHouseAPI.BASE_URL
+    RETRY_STATUSES = CompaniesHouseAPI.RETRY_STATUSES
+    BUNDLE_SECTIONS = CompaniesHouseAPI.BUNDLE_SECTIONS
+
+    def __init__(self, api_key=None, max_connections=20, max_concurrency=50, cache=None,
+                 rate_limiter=None, max_retries=5, timeout=30, base_url=None, api_keys=None):
+        """
+        Initializes the API client.
+
+        Args:
+            api_key (str, optional): Your Companies House API key.
+                                     If not provided, it will try to use the
+                                     COMPANIES_HOUSE_API_KEY environment variable.
+            max_connections (int): Size of the keep-alive connection pool. Defaults to 20.
+            max_concurrency (int): Maximum number of requests in flight at once. Defaults to 50.
+            cache (ResponseCache, optional): Response cache consulted before every
+                                             request. Defaults to no caching.
+            rate_limiter (RateLimiter, optional): Scheduler pacing requests for this key.
+                                                  Defaults to the standard 600 per 5 minutes.
+            max_retries (int): Times a 429/5xx response or connection failure is
+                               retried before giving up. Defaults to 5.
+            timeout (float): Total timeout in seconds for a single request. Defaults to 30.
+            base_url (str, optional): API root to send requests to. Defaults to the
+                                      COMPANIES_HOUSE_API_URL environment variable,
+                                      else the live API.
+            api_keys (list, optional): Several API keys to spread requests over.
+                                       See CompaniesHouseAPI.
+
+        Raises:
+            ValueError: If the API key is not provided or found.
+            ImportError: If aiohttp is not installed.
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncCompaniesHouseAPI requires the aiohttp package (pip install aiohttp).")
+
+        self.keys = KeyPool(resolve_api_keys(api_key, api_keys), rate_limiter or RateLimiter())
+        self.api_key = self.keys.keys[0].api_key
+        self.rate_limiter = self.keys.keys[0].rate_limiter
+
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.metrics = RequestMetrics()
+        self._flights = {}  # request_key -> Task fetching it
+        self.base_url = (base_url or os.getenv("COMPANIES_HOUSE_API_URL") or self.BASE_URL).rstrip('/')
+
+        # The sessions and semaphore must be created inside the running event loop.
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def session(self):
+        """The first API key's session."""
+        return self._session_for(self.keys.keys[0])
+
+    def _session_for(self, key):
+        if key.session is None or key.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=30)
+            key.session = aiohttp.ClientSession(
+                connector=connector,
+                auth=aiohttp.BasicAuth(key.api_key, ''),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return key.session
+
+    async def close(self):
+        """
+        Closes the connection pools and the response cache.
+        """
+        for key in self.keys:
+            if key.session is not None:
+                await key.session.close()
+                key.session = None
+        self._semaphore = None
+        if self.cache is not None:
+            self.cache.close()
+
+    async def _make_request(self, endpoint, raise_errors=False):
+        """
+        Internal method to handle API requests. See CompaniesHouseAPI._make_request.
+
+        Concurrent requests for the same endpoint share one HTTP call, run as a
+        task of its own so that cancelling one caller doesn't cancel it for the others.
+        """
+        try:
+            return await self._shared_fetch(endpoint)
+        except RequestFailed:
+            if raise_errors:
+                raise
+            return None
+
+    async def _shared_fetch(self, endpoint):
+        """
+        Returns a fresh cached response, or joins (or starts) the request for
+        `endpoint`. Raises RequestFailed if the request fails.
+        """
+        cached = self.cache.get(endpoint) if self.cache is not None else None
+        if self.cache is not None:
+            self.metrics.record_cache(endpoint, cached is not None and cached.is_fresh())
+        if cached is not None and cached.is_fresh():
+            return cached.data
+
+        key = request_key(endpoint)
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.metrics.record_coalesced(endpoint)
+        else:
+            flight = self._flights[key] = asyncio.ensure_future(self._fetch(endpoint, cached))
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        return await asyncio.shield(flight)
+
+    async def _fetch(self, endpoint, cached):
+        """
+        Requests `endpoint`, revalidating the `cached` entry if there is one, and
+        caches the response.
+        """
+        headers = {}
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
+
+        try:
+            status, response_headers, data, text = await self._send(f"{self.base_url}{endpoint}", headers, endpoint)
+            if status == 304 and cached is not None:
+                self.cache.refresh(endpoint, cached)
+                return cached.data
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as req_err:
+            self.metrics.record_error(endpoint)
+            logger.error("A request error occurred for %s: %r", endpoint, req_err)
+            raise RequestFailed(endpoint, repr(req_err)) from req_err
+        if status >= 400:
+            if status == 404:
+                logger.debug("HTTP error occurred: %s for url: %s%s - %s", status, self.base_url, endpoint, text)
+                return None
+            self.metrics.record_error(endpoint)
+            logger.warning("HTTP error occurred: %s for url: %s%s - %s", status, self.base_url, endpoint, text)
+            raise RequestFailed(endpoint, f"HTTP {status}", status)
+        if self.cache is not None:
+            self.cache.set(endpoint, data, etag=response_headers.get("ETag"))
+        return data
+
+    async def _send(self, url, headers, endpoint=None):
+        """
+        Sends a GET through the rate limiter and concurrency limit, retrying
+        429/5xx responses and connection failures with jittered exponential
+        backoff. See CompaniesHouseAPI._send for how several keys are used.
+
+        Returns:
+            tuple: (status, headers, decoded JSON or None, body text or None)
+        """
+        endpoint = endpoint or url
+        attempt = 0
+        while True:
+            key, wait = self.keys.reserve()
+            session = self._session_for(key)
+            self.metrics.record_wait(endpoint, wait)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                async with self._semaphore:
+                    started = time.perf_counter()
+                    async with session.get(url, headers=headers) as response:
+                        body = await response.read()
+                        self.metrics.record_request(endpoint, time.perf_counter() - started, response.status, len(body))
+                        key.rate_limiter.update_from_headers(response.headers)
+                        if response.status >= 500 or response.status in (401, 403):
+                            if self.keys.record_failure(key, response.status):
+                                logger.warning("Sidelining API key %s after HTTP %s", key.label, response.status)
+                                if response.status in (401, 403) and self.keys.healthy():
+                                    continue  # The key was rejected, not the request; resend with another.
+                        elif response.status != 429:
+                            self.keys.record_success(key)
+                        retry = response.status in self.RETRY_STATUSES and attempt < self.max_retries
+                        if retry:
+                            delay = key.rate_limiter.backoff_delay(attempt, _StatusView(response))
+                            if response.status == 429 and len(self.keys) > 1:
+                                delay = 0.0
+                        elif response.status == 304:
+                            return response.status, response.headers, None, None
+                        elif response.status >= 400:
+                            return response.status, response.headers, None, await response.text()
+                        else:
+                            return response.status, response.headers, loads(body), None
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                if self.keys.record_failure(key):
+                    logger.warning("Sidelining API key %s after repeated failures", key.label)
+                if attempt >= self.max_retries:
+                    raise
+                delay = key.rate_limiter.backoff_delay(attempt)
+                logger.info("Retrying %s in %.1fs after %r", endpoint, delay, err)
+            else:
+                logger.info("Retrying %s in %.1fs after HTTP %s", endpoint, delay, response.status)
+            self.metrics.record_retry(endpoint)
+            self.metrics.record_wait(endpoint, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _iter_pages(self, endpoint, page_size, prefetch=False):
+        """
+        Lazily yields the items of a paginated endpoint. See CompaniesHouseAPI._iter_pages.
+        """
+        separator = "&" if "?" in endpoint else "?"
+
+        def fetch(start_index):
+            return self._make_request(f"{endpoint}{separator}items_per_page={page_size}&start_index={start_index}")
+
+        start_index = 0
+        pending = None
+        page = await fetch(start_index)
+        try:
+            while page:
+                items = page.get('items') or []
+                total = page.get('total_results', page.get('total_count'))
+                start_index += len(items)
+                has_more = bool(items) and (total is None or start_index < total)
+
+                if has_more and prefetch:
+                    pending = asyncio.ensure_future(fetch(start_index))
+
+                for item in items:
+                    yield item
+
+                if not has_more:
+                    return
+                if pending is not None:
+                    page, pending = await pending, None
+                else:
+                    page = await fetch(start_index)
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    def quota_status(self):
+        """
+        Reports API quota consumption for this client. See KeyPool.quota_status.
+        """
+        return self.keys.quota_status()
+
+    async def search_companies(self, query):
+        """
+        Searches for companies by name. See CompaniesHouseAPI.search_companies.
+        """
+        return await self._make_request(f"/search/companies?q={quote_plus(query)}")
+
+    async def get_company_profile(self, company_number, raise_errors=False):
+        """
+        Retrieves the profile for a specific company.
+        """
+        return await self._make_request(f"/company/{company_number}", raise_errors=raise_errors)
+
+    async def get_persons_with_significant_control(self, company_number, raise_errors=False):
+        """
+        Retrieves the Persons with Significant Control for a specific company.
+        """
+        return await self._make_request(f"/company/{company_number}/persons-with-significant-control", raise_errors=raise_errors)
+
+    async def get_filing_history(self, company_number, items_per_page=100, start_index=0, raise_errors=False):
+        """
+        Retrieves filing history items for a specific company.
+        """
+        endpoint = f"/company/{company_number}/filing-history?items_per_page={items_per_page}"
+        if start_index:
+            endpoint += f"&start_index={start_index}"
+        return await self._make_request(endpoint, raise_errors=raise_errors)
+
+    async def get_company_officers(self, company_number, raise_errors=False):
+        """
+        Retrieves the officers list for a specific company.
+        """
+        return await self._make_request(f"/company/{company_number}/officers", raise_errors=raise_errors)
+
+    async def get_company_charges(self, company_number, raise_errors=False):
+        """
+        Retrieves the charges registered against a specific company.
+        """
+        return await self._make_request(f"/company/{company_number}/charges", raise_errors=raise_errors)
+
+    async def get_company_bundle(self, company_number, include_officers=False, include_charges=False):
+        """
+        Retrieves a company's sections concurrently. See CompaniesHouseAPI.get_company_bundle.
+        """
+        sections = ["profile", "filing_history", "pscs"]
+        if include_officers:
+            sections.append("officers")
+        if include_charges:
+            sections.append("charges")
+
+        results = await asyncio.gather(
+            *(getattr(self, self.BUNDLE_SECTIONS[section])(company_number, raise_errors=True) for section in sections),
+            return_exceptions=True,
+        )
+        bundle = {"company_number": company_number, "errors": {}}
+        for section, result in zip(sections, results):
+            if isinstance(result, BaseException):
+                bundle[section] = None
+                bundle["errors"][section] = str(result)
+            else:
+                bundle[section] = result
+        return bundle
+
+    async def search_officers(self, query):
+        """
+        Searches for officers by name.
+        """
+        return await self._make_request(f"/search/officers?q={quote_plus(query)}")
+
+    async def get_officer_appointments(self, appointments_link):
+        """
+        Retrieves the appointment history for a specific officer using their appointments link.
+        """
+        return await self._make_request(appointments_link)
+
+    def iter_search_companies(self, query, page_size=100, prefetch=False):
+        """
+        Async generator over every company matching a search.
+        """
+        return self._iter_pages(f"/search/companies?q={quote_plus(query)}", page_size, prefetch)
+
+    def iter_filing_history(self, company_number, page_size=100, prefetch=False):
+        """
+        Async generator over a company's complete filing history.
+        """
+        return self._iter_pages(f"/company/{company_number}/filing-history", page_size, prefetch)
+
+    def iter_search_officers(self, query, page_size=100, prefetch=False):
+        """
+        Async generator over every officer matching a search.
+        """
+        return self._iter_pages(f"/search/officers?q={quote_plus(query)}", page_size, prefetch)
+
+    def iter_officer_appointments(self, appointments_link, page_size=50, prefetch=False):
+        """
+        Async generator over an officer's complete appointment history.
+        """
+        return self._iter_pages(appointments_link, page_size, prefetch)
+
+
+class _StatusView:
+    """
+    Minimal response view (status code and headers) handed to RateLimiter.backoff_delay.
+    """
+
+    def __init__(self, response):
+        self.status_code = response.status
+        self.headers = response.headers
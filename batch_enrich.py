@@ -0,0 +1,370 @@
+"""
+Headless batch enrichment: reads company numbers from a file or stdin, fetches
+each company's profile, PSCs and filing history concurrently within the API
+rate limit, and streams the results out as JSON Lines or CSV.
+
+Progress is checkpointed as results are written, so an interrupted run picks up
+where it stopped when started again with the same output file. Runs writing to
+stdout are only checkpointed with --checkpoint.
+
+    python3 batch_enrich.py numbers.txt -o enriched.jsonl
+    cut -d, -f1 crm_export.csv | python3 batch_enrich.py - -o enriched.csv --format csv
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from companies_house_api import CompaniesHouseAPI, RequestFailed
+from document_downloader import DocumentDownloader, parse_categories
+from filing_analytics import FilingTable
+from psc_engine import OwnershipResolver, PSCTable
+from records import RecordPage, json_default
+from response_cache import ResponseCache
+
+CSV_FIELDS = [
+    "company_number", "company_name", "company_status", "type", "date_of_creation",
+    "postal_code", "sic_codes", "psc_count", "active_psc_count",
+    "filing_count", "latest_filing_date", "latest_filing_type", "errors",
+]
+
+# Error recorded for a section the API doesn't have for a company (e.g. no
+# PSCs). Any other error is a failure worth retrying.
+NOT_AVAILABLE = "not available"
+
+
+def normalise_company_number(raw):
+    """
+    Cleans up a company number as typically exported from a CRM: strips
+    whitespace, upper-cases prefixes (SC, NI, OC...) and restores leading zeros
+    dropped by spreadsheets.
+    """
+    number = raw.strip().upper()
+    if number.isdigit():
+        number = number.zfill(8)
+    return number
+
+
+def read_company_numbers(stream):
+    """
+    Yields normalised company numbers from a text stream, one per line.
+    Blank lines and lines starting with '#' are ignored.
+    """
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        # Tolerate CSV input by taking the first column.
+        yield normalise_company_number(line.split(',')[0])
+
+
+def load_checkpoint(path):
+    """
+    Returns the set of company numbers already written by a previous run.
+    """
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def enrich_company(client, company_number, include_officers=False, include_charges=False, full_history=False):
+    """
+    Fetches the bundle for one company and records which sections are missing:
+    NOT_AVAILABLE for sections the company doesn't have, the error for ones
+    that failed (see failed_sections). With `full_history`, the filing history
+    holds every filing rather than the most recent page.
+    """
+    bundle = client.get_company_bundle(company_number, include_officers, include_charges)
+    filings = bundle.get('filing_history')
+    items = (filings or {}).get('items') or []
+    if full_history and filings and len(items) < filings.get('total_count', 0):
+        try:
+            # Carry on after the page the bundle already holds. The cached response
+            # itself is shared, so the complete history goes into a copy.
+            rest = client.iter_filing_history(company_number, start_index=len(items), raise_errors=True)
+            items = list(items) + list(rest)
+            if isinstance(filings, RecordPage):
+                bundle['filing_history'] = RecordPage(items, filings.total_count, filings.start_index,
+                                                      filings.items_per_page, filings.name)
+            else:
+                bundle['filing_history'] = dict(filings, items=items)
+        except RequestFailed as err:
+            bundle["errors"]["filing_history"] = f"incomplete: {err}"
+    for section in client.BUNDLE_SECTIONS:
+        if section in bundle and bundle[section] is None:
+            bundle["errors"].setdefault(section, NOT_AVAILABLE)
+    return bundle
+
+
+def failed_sections(bundle):
+    """
+    Returns the sections of a bundle whose requests failed (timeouts, 5xx,
+    exhausted retries), as opposed to sections the company doesn't have.
+    """
+    return [section for section, error in bundle["errors"].items() if error != NOT_AVAILABLE]
+
+
+def flatten_bundle(bundle):
+    """
+    Reduces a company bundle to one CSV row of summary columns.
+    """
+    profile = bundle.get('profile') or {}
+    pscs = (bundle.get('pscs') or {}).get('items') or []
+    filings = (bundle.get('filing_history') or {}).get('items') or []
+    latest = filings[0] if filings else {}
+    return {
+        "company_number": bundle["company_number"],
+        "company_name": profile.get('company_name', ''),
+        "company_status": profile.get('company_status', ''),
+        "type": profile.get('type', ''),
+        "date_of_creation": profile.get('date_of_creation', ''),
+        "postal_code": (profile.get('registered_office_address') or {}).get('postal_code', ''),
+        "sic_codes": ' '.join(profile.get('sic_codes') or []),
+        "psc_count": len(pscs),
+        "active_psc_count": sum(1 for psc in pscs if not psc.get('ceased_on')),
+        "filing_count": (bundle.get('filing_history') or {}).get('total_count', len(filings)),
+        "latest_filing_date": latest.get('date', ''),
+        "latest_filing_type": latest.get('type', ''),
+        "errors": '; '.join(f"{section}: {error}" for section, error in bundle["errors"].items()),
+    }
+
+
+class ResultWriter:
+    """
+    Appends results to the output file and records each written company in the
+    checkpoint file (if there is one), flushing both so an interruption loses
+    at most the companies still in flight.
+    """
+
+    def __init__(self, output_path, checkpoint_path, fmt):
+        self.fmt = fmt
+        is_new = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        if output_path == '-':
+            self.output = sys.stdout
+        else:
+            self.output = open(output_path, 'a', encoding='utf-8', newline='')
+        self.checkpoint = open(checkpoint_path, 'a', encoding='utf-8') if checkpoint_path else None
+        self.csv_writer = None
+        if fmt == 'csv':
+            self.csv_writer = csv.DictWriter(self.output, fieldnames=CSV_FIELDS)
+            if is_new or output_path == '-':
+                self.csv_writer.writeheader()
+
+    def write(self, bundle):
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(flatten_bundle(bundle))
+        else:
+            self.output.write(json.dumps(bundle, separators=(',', ':'), default=json_default) + '\n')
+        self.output.flush()
+        if self.checkpoint is not None:
+            self.checkpoint.write(bundle["company_number"] + '\n')
+            self.checkpoint.flush()
+
+    def close(self):
+        if self.output is not sys.stdout:
+            self.output.close()
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+
+
+def run_batch(client, company_numbers, writer, done=frozenset(), workers=8,
+              include_officers=False, include_charges=False, progress=None,
+              full_history=False, analytics=None, psc_table=None, documents=None):
+    """
+    Enriches every company number not in `done`, writing results as they complete.
+
+    Input is consumed lazily with at most `workers * 2` companies in flight, so
+    arbitrarily long inputs run in constant memory. If a FilingTable is given
+    as `analytics`, each company's filings are also added to it, and likewise
+    each company's PSCs to a PSCTable given as `psc_table`. With a
+    DocumentDownloader as `documents`, the documents of each company's filings
+    are downloaded alongside, and run_batch returns once they are all done.
+
+    A company with a section that failed (rather than one it doesn't have) is
+    neither written nor checkpointed, so running the batch again retries it.
+
+    Returns:
+        tuple: (companies written, companies skipped from the checkpoint,
+                companies that failed)
+    """
+    written = skipped = failed = 0
+    seen = set(done)
+    in_flight = set()
+    downloads = []
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def drain(return_when):
+            nonlocal written, failed, in_flight
+            completed, in_flight = wait(in_flight, return_when=return_when)
+            for future in completed:
+                bundle = future.result()
+                failures = failed_sections(bundle)
+                if failures:
+                    failed += 1
+                    if progress:
+                        progress(f"{bundle['company_number']}: "
+                                 + "; ".join(f"{section}: {bundle['errors'][section]}" for section in failures)
+                                 + " (will be retried on the next run)")
+                    continue
+                writer.write(bundle)
+                if analytics is not None:
+                    analytics.extend(bundle["company_number"], (bundle.get('filing_history') or {}).get('items') or [])
+                if psc_table is not None and bundle.get('pscs') is not None:
+                    psc_table.extend(bundle["company_number"], bundle['pscs'])
+                if documents is not None:
+                    filings = (bundle.get('filing_history') or {}).get('items') or []
+                    downloads.extend(documents.submit(bundle["company_number"], filings))
+                written += 1
+                if progress and written % 100 == 0:
+                    rate = written / max(time.monotonic() - started, 1e-9)
+                    progress(f"{written} companies written ({rate:.1f}/s)")
+
+        for number in company_numbers:
+            if number in seen:
+                skipped += 1
+                continue
+            seen.add(number)
+            in_flight.add(pool.submit(enrich_company, client, number, include_officers, include_charges, full_history))
+            if len(in_flight) >= workers * 2:
+                drain(FIRST_COMPLETED)
+        while in_flight:
+            drain(FIRST_COMPLETED)
+
+    pending = [future for future in downloads if not future.done()]
+    if pending:
+        if progress:
+            progress(f"Waiting for {len(pending)} document downloads...")
+        wait(pending)
+    return written, skipped, failed
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Enrich a list of company numbers from the Companies House API.")
+    parser.add_argument("input", nargs="?", default="-", help="File of company numbers, one per line ('-' for stdin).")
+    parser.add_argument("-o", "--output", default="-", help="Output file ('-' for stdout). Defaults to stdout.")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Output format. Defaults to the output file's extension, else jsonl.")
+    parser.add_argument("--checkpoint", help="Checkpoint file. Defaults to OUTPUT.checkpoint; runs writing "
+                                                 "to stdout are only checkpointed with this option.")
+    parser.add_argument("--workers", type=int, default=8, help="Companies fetched in parallel. Defaults to 8.")
+    parser.add_argument("--officers", action="store_true", help="Also fetch each company's officers.")
+    parser.add_argument("--charges", action="store_true", help="Also fetch each company's charges.")
+    parser.add_argument("--full-history", action="store_true", help="Fetch every filing, not just the latest 100.")
+    parser.add_argument("--analytics", help="Write a filing analytics report (filings per type per year, overdue "
+                                            "accounts, status timelines) for this run's companies to this JSON file.")
+    parser.add_argument("--owners", help="Resolve each company's ultimate beneficial owners through corporate "
+                                         "PSCs and write them to this JSON file.")
+    parser.add_argument("--owner-depth", type=int, default=6, help="Corporate links followed for --owners. Defaults to 6.")
+    parser.add_argument("--documents", help="Download the filed documents (PDFs) of each company's filings into this "
+                                            "directory. Documents already there are skipped.")
+    parser.add_argument("--document-categories", help="Comma separated filing categories to download, or 'all'. "
+                                                      "Defaults to accounts,confirmation-statement.")
+    parser.add_argument("--document-workers", type=int, default=4, help="Documents downloaded at once. Defaults to 4.")
+    parser.add_argument("--as-of", help="Date overdue accounts are measured from (YYYY-MM-DD). Defaults to today.")
+    parser.add_argument("--no-cache", action="store_true", help="Don't use the on-disk response cache.")
+    parser.add_argument("--metrics", help="Write per-endpoint request metrics (Prometheus text format) to this file when done.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log retries and failed requests to stderr.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    fmt = args.format or ('csv' if args.output.endswith('.csv') else 'jsonl')
+    if args.checkpoint:
+        checkpoint_path = args.checkpoint
+    elif args.output != '-':
+        checkpoint_path = args.output + '.checkpoint'
+    else:
+        # A shared default would make any later stdout run skip these companies.
+        checkpoint_path = None
+
+    def progress(message):
+        print(message, file=sys.stderr)
+
+    try:
+        client = CompaniesHouseAPI(
+            max_workers=args.workers * 5,
+            cache=None if args.no_cache else ResponseCache.default(),
+        )
+    except ValueError as e:
+        progress(f"API Key Error: {e}")
+        return 2
+
+    done = load_checkpoint(checkpoint_path)
+    if done:
+        progress(f"Resuming: {len(done)} companies already done according to {checkpoint_path}")
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    writer = ResultWriter(args.output, checkpoint_path, fmt)
+    analytics = FilingTable() if args.analytics else None
+    psc_table = PSCTable() if args.owners else None
+    documents = None
+    if args.documents:
+        documents = DocumentDownloader(client, args.documents, parse_categories(args.document_categories),
+                                       args.document_workers)
+    try:
+        written, skipped, failed = run_batch(
+            client, read_company_numbers(source), writer, done,
+            workers=args.workers, include_officers=args.officers,
+            include_charges=args.charges, progress=progress,
+            full_history=args.full_history, analytics=analytics, psc_table=psc_table, documents=documents,
+        )
+        if psc_table is not None:
+            portfolio = list(psc_table.companies)
+            progress(f"Resolving ultimate owners of {len(portfolio)} companies...")
+            owners = OwnershipResolver(client, psc_table, max_depth=args.owner_depth).resolve_all(portfolio)
+            with open(args.owners, 'w', encoding='utf-8') as f:
+                json.dump({number: [owner.to_dict() for owner in result] for number, result in owners.items()}, f, indent=2)
+    except KeyboardInterrupt:
+        if checkpoint_path:
+            progress(f"Interrupted. Run the same command again to resume from {checkpoint_path}.")
+        else:
+            progress("Interrupted. Pass --checkpoint to make stdout runs resumable.")
+        return 130
+    finally:
+        writer.close()
+        if source is not sys.stdin:
+            source.close()
+        if documents is not None:
+            documents.close()
+        client.close()
+        if args.metrics:
+            with open(args.metrics, 'w', encoding='utf-8') as f:
+                f.write(client.metrics.to_prometheus())
+
+    if analytics is not None:
+        with open(args.analytics, 'w', encoding='utf-8') as f:
+            json.dump(analytics.summary(args.as_of), f, indent=2)
+    if skipped and (analytics is not None or psc_table is not None or documents is not None):
+        progress(f"Note: the analytics and owners reports and document downloads cover only the {written} "
+                 f"companies fetched in this run.")
+    if documents is not None:
+        stats = documents.stats
+        progress(f"Documents: {stats['downloaded'] + stats['resumed']} downloaded ({stats['bytes'] / 1048576:.1f} MB), "
+                 f"{stats['present']} already present, {stats['unavailable']} unavailable, {stats['failed']} failed")
+
+    quota = client.quota_status()
+    for key in quota.pop("keys", ()):
+        progress(f"Key {key['key']}: {key['state']}, {key['requests']} requests, {key['errors']} errors")
+    progress(f"Done: {written} companies written, {skipped} skipped, {failed} failed. Quota: {quota}")
+    for line in client.metrics.format_table():
+        progress(line)
+    if failed:
+        if checkpoint_path:
+            progress(f"Run the same command again to retry the {failed} companies that failed.")
+        else:
+            progress(f"{failed} companies failed. Pass --checkpoint to retry only those on the next run.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
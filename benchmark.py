@@ -0,0 +1,308 @@
+"""
+Offline benchmark suite, run against the local mock server (mock_server.py).
+
+Measures throughput and tail latency for single lookups, bundle fetches,
+paginated filing histories, batch enrichment and the TUI's text rendering, and
+saves the results as JSON so versions can be compared:
+
+    python3 benchmark.py -o before.json
+    git checkout my-branch
+    python3 benchmark.py -o after.json --compare before.json
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import batch_enrich
+from companies_house_api import CompaniesHouseAPI
+from mock_server import MockCompaniesHouseServer, MockDataset
+from rate_limiter import RateLimiter
+from response_cache import MemoryCache, ResponseCache
+
+
+def summarise(latencies, elapsed, ops=None):
+    """
+    Reduces per-operation latencies (seconds) to throughput and percentiles.
+    """
+    ops = len(latencies) if ops is None else ops
+    result = {"ops": ops, "seconds": round(elapsed, 4), "ops_per_second": round(ops / elapsed, 2) if elapsed else 0.0}
+    if latencies:
+        ordered = sorted(latencies)
+        cuts = statistics.quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 else ordered * 99
+        result.update({
+            "p50_ms": round(cuts[49] * 1000, 3),
+            "p95_ms": round(cuts[94] * 1000, 3),
+            "p99_ms": round(cuts[98] * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3),
+            "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        })
+    return result
+
+
+def run_concurrently(operation, args_list, concurrency):
+    """
+    Runs `operation(*args)` for every entry in `args_list` on `concurrency`
+    threads, timing each call.
+
+    Returns:
+        dict: See summarise().
+    """
+    def timed(args):
+        started = time.perf_counter()
+        operation(*args)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        latencies = [timed(args) for args in args_list]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, args_list))
+    return summarise(latencies, time.perf_counter() - started)
+
+
+class BenchmarkContext:
+    """
+    A mock server plus a factory for fresh clients pointed at it, so each
+    benchmark starts with cold caches and zeroed metrics.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        dataset = MockDataset(company_count=args.companies, filings_per_company=args.filings)
+        self.server = MockCompaniesHouseServer(
+            dataset=dataset, latency=args.latency, jitter=args.jitter,
+            slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+            error_rate=args.error_rate, retry_after=args.retry_after,
+            rate_limit=args.rate_limit, window=args.window,
+        ).start()
+        self.clients = []
+
+    def client(self, max_workers=8):
+        # The real 600/5min budget would turn every benchmark into a measurement of
+        # the rate limiter; the mock's own limit (if any) is learned from its headers.
+        cache = ResponseCache([MemoryCache()]) if self.args.cache else None
+        client = CompaniesHouseAPI(
+            api_key="benchmark", base_url=self.server.url, max_workers=max_workers, cache=cache,
+            rate_limiter=RateLimiter(limit=1_000_000, window=1, base_backoff=0.05, max_backoff=1.0),
+        )
+        self.clients.append(client)
+        return client
+
+    def company_numbers(self, count, offset=0):
+        return [self.server.dataset.company_number(1 + (offset + i * 7) % self.args.companies) for i in range(count)]
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        self.server.stop()
+
+
+def bench_single_lookups(ctx):
+    """Profile lookups, one at a time and from a pool of threads."""
+    n = ctx.args.lookups
+    sequential_client = ctx.client()
+    sequential = run_concurrently(sequential_client.get_company_profile, [(number,) for number in ctx.company_numbers(n)], 1)
+    concurrent_client = ctx.client(max_workers=ctx.args.concurrency)
+    concurrent = run_concurrently(concurrent_client.get_company_profile,
+                                  [(number,) for number in ctx.company_numbers(n, offset=n)], ctx.args.concurrency)
+    return {"sequential": sequential, "concurrent": concurrent}
+
+
+def bench_bundles(ctx):
+    """Company bundles (profile, filing history, PSCs, officers) fetched in parallel sections."""
+    client = ctx.client(max_workers=ctx.args.concurrency * 4)
+    numbers = ctx.company_numbers(ctx.args.bundles, offset=3)
+    return run_concurrently(lambda number: client.get_company_bundle(number, include_officers=True),
+                            [(number,) for number in numbers], ctx.args.concurrency)
+
+
+def bench_filing_history(ctx):
+    """Full filing histories walked page by page, with and without next-page prefetch."""
+    results = {}
+    numbers = ctx.company_numbers(ctx.args.histories, offset=5)
+    for prefetch in (False, True):
+        client = ctx.client()
+        items = []
+
+        def walk(number):
+            items.append(sum(1 for _ in client.iter_filing_history(number, prefetch=prefetch)))
+
+        result = run_concurrently(walk, [(number,) for number in numbers], 1)
+        result["items_per_second"] = round(sum(items) / result["seconds"], 1) if result["seconds"] else 0.0
+        results["prefetch" if prefetch else "sequential"] = result
+    return results
+
+
+def bench_batch(ctx):
+    """batch_enrich.run_batch over a list of companies, written as JSON Lines to memory."""
+    workers = ctx.args.concurrency
+    client = ctx.client(max_workers=workers * 5)
+    numbers = ctx.company_numbers(ctx.args.batch, offset=11)
+
+    class MemoryWriter(batch_enrich.ResultWriter):
+        def __init__(self):
+            self.fmt = "jsonl"
+            self.csv_writer = None
+            self.output = io.StringIO()
+            self.checkpoint = io.StringIO()
+
+        def close(self):
+            pass
+
+    started = time.perf_counter()
+    written, _, _ = batch_enrich.run_batch(client, iter(numbers), MemoryWriter(), workers=workers)
+    return summarise([], time.perf_counter() - started, ops=written)
+
+
+def bench_render(ctx):
+    """
+    The text rendering behind company_search_flow: formatting the Profile,
+    Filing History and PSC tabs and wrapping them for the viewer, on
+    pre-fetched data so only the rendering is timed.
+    """
+    import tui_search  # Imported here so the network benchmarks don't need curses
+
+    client = ctx.client(max_workers=ctx.args.concurrency)
+    numbers = ctx.company_numbers(ctx.args.renders, offset=13)
+    fetched = []
+    for number in numbers:
+        fetched.append((
+            client.get_company_profile(number),
+            {"items": list(client.iter_filing_history(number))},
+            client.get_persons_with_significant_control(number),
+        ))
+
+    def render(profile, filing, pscs):
+        for content in (tui_search.format_company_profile(profile),
+                        tui_search.format_filing_history(filing),
+                        tui_search.format_pscs(pscs)):
+            document = tui_search.TabDocument.from_content(content)
+            for width in (80, 132):
+                total = document.ensure_rows(width, 1 << 30)
+                for top in range(0, total, 40):
+                    document.rows(width, top, 40)
+
+    return run_concurrently(render, fetched, 1)
+
+
+BENCHMARKS = {
+    "single_lookups": bench_single_lookups,
+    "bundles": bench_bundles,
+    "filing_history": bench_filing_history,
+    "batch": bench_batch,
+    "render": bench_render,
+}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmarks(args):
+    ctx = BenchmarkContext(args)
+    results = {}
+    try:
+        for name in args.only or BENCHMARKS:
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = BENCHMARKS[name](ctx)
+        requests_served = dict(ctx.server.stats)
+    finally:
+        ctx.close()
+    return {
+        "label": args.label or _git_revision() or "unlabelled",
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "only", "label")},
+        "server": requests_served,
+        "results": results,
+    }
+
+
+def _flatten(results, prefix=""):
+    """Yields (name, metrics dict) for every leaf benchmark result."""
+    for name, value in results.items():
+        if "ops" in value:
+            yield prefix + name, value
+        else:
+            yield from _flatten(value, f"{prefix}{name}.")
+
+
+def format_report(report, baseline=None):
+    """
+    Returns report lines, with the change from `baseline` when given.
+    """
+    baseline_results = dict(_flatten(baseline["results"])) if baseline else {}
+    lines = [f"{'Benchmark':<30} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}" + ("   vs " + baseline["label"] if baseline else "")]
+    for name, result in _flatten(report["results"]):
+        percentiles = " ".join(f"{result[key]:>9.2f}" if key in result else f"{'-':>9}" for key in ("p50_ms", "p95_ms", "p99_ms"))
+        line = f"{name:<30} {result['ops_per_second']:>10.1f} {percentiles}"
+        old = baseline_results.get(name)
+        if old and old.get("ops_per_second"):
+            change = (result["ops_per_second"] / old["ops_per_second"] - 1) * 100
+            line += f"   {change:+.1f}% ops/s"
+            if old.get("p95_ms"):
+                line += f", {(result.get('p95_ms', 0) / old['p95_ms'] - 1) * 100:+.1f}% p95"
+        lines.append(line)
+    return lines
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the Companies House client against a local mock server.")
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Results JSON from an earlier run to compare against.")
+    parser.add_argument("--label", help="Name for this run. Defaults to the git revision.")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="Run only this benchmark (repeatable).")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock server mean latency in seconds. Defaults to 0.02.")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Latency jitter as a fraction of the mean.")
+    parser.add_argument("--slow-rate", type=float, default=0.01, help="Fraction of slow responses. Defaults to 0.01.")
+    parser.add_argument("--slow-latency", type=float, default=0.25, help="Latency of slow responses. Defaults to 0.25.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an injected 429.")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Reset delay reported on injected 429s.")
+    parser.add_argument("--rate-limit", type=int, help="Mock server requests per window before real 429s.")
+    parser.add_argument("--window", type=float, default=300, help="Mock server rate-limit window in seconds.")
+    parser.add_argument("--cache", action="store_true", help="Give each client an in-memory response cache.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel operations. Defaults to 8.")
+    parser.add_argument("--companies", type=int, default=100000, help="Companies in the mock data set.")
+    parser.add_argument("--filings", type=int, default=240, help="Filings per company. Defaults to 240.")
+    parser.add_argument("--lookups", type=int, default=200, help="Profile lookups per mode. Defaults to 200.")
+    parser.add_argument("--bundles", type=int, default=100, help="Company bundles. Defaults to 100.")
+    parser.add_argument("--histories", type=int, default=20, help="Filing histories per mode. Defaults to 20.")
+    parser.add_argument("--batch", type=int, default=200, help="Companies in the batch run. Defaults to 200.")
+    parser.add_argument("--renders", type=int, default=50, help="Companies rendered. Defaults to 50.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    report = run_benchmarks(args)
+    for line in format_report(report, baseline):
+        print(line)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,44 @@
-
 import requests
+import logging
 import os
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from urllib.parse import parse_qsl, quote_plus, urlencode, urljoin, urlsplit
+from instrumentation import RequestMetrics
+from key_pool import KeyPool, resolve_api_keys
+from rate_limiter import RateLimiter
+from records import CompanyProfile, FilingItem, OfficerAppointment, PSC, RecordPage, loads
+from streaming import StreamConsumer, TimepointCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(endpoint):
+    """
+    Normalises an endpoint for matching identical requests: query parameters
+    are sorted, so ?a=1&b=2 and ?b=2&a=1 are the same request.
+    """
+    path, _, query = endpoint.partition("?")
+    if not query:
+        return path
+    return f"{path}?{urlencode(sorted(parse_qsl(query, keep_blank_values=True)))}"
+
+
+class RequestFailed(Exception):
+    """
+    Raised (with raise_errors=True) when a request fails for any reason other
+    than the resource not existing: a connection failure or timeout, an error
+    status that outlasted the retries, or a body that couldn't be decoded. A
+    404 is not a failure; it is how the API says there is nothing there.
+    """
+
+    def __init__(self, endpoint, reason, status_code=None):
+        super().__init__(f"{endpoint}: {reason}")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.status_code = status_code
+
 
 class CompaniesHouseAPI:
     """
@@ -9,7 +47,20 @@ class CompaniesHouseAPI:
     
     BASE_URL = "https://api.companieshouse.gov.uk"
 
-    def __init__(self, api_key=None):
+    # Responses worth retrying: rate limited, or a transient server-side failure.
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    # Sections that make up a company bundle, mapped to the method that fetches them.
+    BUNDLE_SECTIONS = {
+        "profile": "get_company_profile",
+        "filing_history": "get_filing_history",
+        "pscs": "get_persons_with_significant_control",
+        "officers": "get_company_officers",
+        "charges": "get_company_charges",
+    }
+
+    def __init__(self, api_key=None, max_workers=8, cache=None, rate_limiter=None, max_retries=5, local_index=None,
+                 base_url=None, records=False, api_keys=None):
         """
         Initializes the API client.
         
@@ -17,79 +68,532 @@ class CompaniesHouseAPI:
             api_key (str, optional): Your Companies House API key. 
                                      If not provided, it will try to use the 
                                      COMPANIES_HOUSE_API_KEY environment variable.
+            max_workers (int): Maximum number of requests run in parallel by the
+                               concurrent fetch methods. Defaults to 8.
+            cache (ResponseCache, optional): Response cache consulted before every
+                                             request. Defaults to no caching.
+            rate_limiter (RateLimiter, optional): Scheduler pacing requests for this key.
+                                                  Defaults to the standard 600 per 5 minutes.
+            max_retries (int): Times a 429/5xx response or connection failure is
+                               retried before giving up. Defaults to 5.
+            local_index (CompanyIndex, optional): Offline snapshot index used to answer
+                                                  company searches and profile lookups
+                                                  without a network round-trip.
+            base_url (str, optional): API root to send requests to, e.g. a local
+                                      mock server. Defaults to the
+                                      COMPANIES_HOUSE_API_URL environment variable,
+                                      else the live API.
+            records (bool): Return compact typed records (see records.py) instead of
+                            JSON dicts from the profile, filing history, PSC and
+                            appointment methods. Defaults to False.
+            api_keys (list, optional): Several API keys to spread requests over,
+                                       each with its own quota and session (see
+                                       key_pool.KeyPool). Defaults to the
+                                       COMPANIES_HOUSE_API_KEYS environment
+                                       variable (comma separated) when no
+                                       api_key is given.
         
         Raises:
             ValueError: If the API key is not provided or found.
         """
-        self.api_key = api_key or os.getenv("COMPANIES_HOUSE_API_KEY")
-        if not self.api_key:
-            raise ValueError("API key not found. Please provide it or set the COMPANIES_HOUSE_API_KEY environment variable.")
-        
-        self.session = requests.Session()
-        self.session.auth = (self.api_key, '')
+        self.keys = KeyPool(resolve_api_keys(api_key, api_keys), rate_limiter or RateLimiter())
+        for key in self.keys:
+            key.session = requests.Session()
+            key.session.auth = (key.api_key, '')
+            # Keep one pooled connection per worker so parallel fetches don't queue on the pool.
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            key.session.mount("https://", adapter)
+            key.session.mount("http://", adapter)
+        # The first key's session and limiter, for code that only knows about one key.
+        self.api_key = self.keys.keys[0].api_key
+        self.session = self.keys.keys[0].session
+        self.rate_limiter = self.keys.keys[0].rate_limiter
 
-    def _make_request(self, endpoint):
+        self.max_workers = max_workers
+        self._executor = None
+        self._stream_consumers = []
+        self._flights = {}  # request_key -> Future of the response being fetched
+        self._flights_lock = threading.Lock()
+        self.cache = cache
+        self.max_retries = max_retries
+        self.local_index = local_index
+        self.metrics = RequestMetrics()
+        self.base_url = (base_url or os.getenv("COMPANIES_HOUSE_API_URL") or self.BASE_URL).rstrip('/')
+        self.records = records
+
+    @property
+    def executor(self):
+        """
+        Thread pool shared by the concurrent fetch methods, created on first use.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="companies-house")
+        return self._executor
+
+    def close(self):
+        """
+        Shuts down the worker pool and closes the HTTP session.
+        """
+        for consumer in self._stream_consumers:
+            consumer.stop()
+        self._stream_consumers = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        for key in self.keys:
+            key.session.close()
+        if self.cache is not None:
+            self.cache.close()
+        if self.local_index is not None:
+            self.local_index.close()
+
+    def _make_request(self, endpoint, revalidate=False, raise_errors=False):
         """
         Internal method to handle API requests.
+        
+        Fresh cached responses are returned without touching the network, unless
+        `revalidate` is set. Stale ones (and, with `revalidate`, fresh ones) are
+        revalidated with If-None-Match when the server supplied an ETag.
+
+        Concurrent requests for the same endpoint share a single HTTP call: the
+        first caller sends it and the others wait for its decoded result.
+
+        Returns None for a 404. Any other failure also returns None, unless
+        `raise_errors` is set, in which case it raises RequestFailed.
         """
         try:
-            response = self.session.get(f"{self.BASE_URL}{endpoint}")
+            return self._shared_fetch(endpoint, revalidate)
+        except RequestFailed:
+            if raise_errors:
+                raise
+            return None
+
+    def _shared_fetch(self, endpoint, revalidate):
+        """
+        Returns a fresh cached response, or joins (or starts) the request for
+        `endpoint`. Raises RequestFailed if the request fails.
+        """
+        cached = self.cache.get(endpoint) if self.cache is not None else None
+        hit = cached is not None and cached.is_fresh() and not revalidate
+        if self.cache is not None:
+            self.metrics.record_cache(endpoint, hit)
+        if hit:
+            return cached.data
+
+        key = request_key(endpoint)
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+        if not leader:
+            self.metrics.record_coalesced(endpoint)
+            try:
+                return flight.result()
+            except CancelledError:
+                # The thread sending it was interrupted; send it again.
+                return self._shared_fetch(endpoint, revalidate)
+        try:
+            data = self._fetch(endpoint, cached)
+        except Exception as err:
+            self._end_flight(key)
+            flight.set_exception(err)
+            raise
+        except BaseException:
+            # KeyboardInterrupt or SystemExit concern this thread only: the waiters
+            # get a CancelledError and send the request themselves.
+            self._end_flight(key)
+            flight.cancel()
+            raise
+        self._end_flight(key)
+        flight.set_result(data)
+        return data
+
+    def _end_flight(self, key):
+        with self._flights_lock:
+            del self._flights[key]
+
+    def _fetch(self, endpoint, cached):
+        """
+        Requests `endpoint`, revalidating the `cached` entry if there is one, and
+        caches the response.
+        """
+        headers = {}
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
+
+        try:
+            response = self._send(f"{self.base_url}{endpoint}", headers, endpoint)
+            if response.status_code == 304 and cached is not None:
+                self.cache.refresh(endpoint, cached)
+                return cached.data
             response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
-            return response.json()
+            data = loads(response.content)
+            if self.cache is not None:
+                self.cache.set(endpoint, data, etag=response.headers.get("ETag"))
+            return data
         except requests.exceptions.HTTPError as http_err:
-            print(f"HTTP error occurred: {http_err} - {response.text}")
-        except requests.exceptions.RequestException as req_err:
-            print(f"A request error occurred: {req_err}")
-        return None
+            if response.status_code == 404:
+                # How the API says "no PSCs/charges/etc.": not a failure, so not an error or worth a warning.
+                logger.debug("HTTP error occurred: %s - %s", http_err, response.text)
+                return None
+            self.metrics.record_error(endpoint)
+            logger.warning("HTTP error occurred: %s - %s", http_err, response.text)
+            raise RequestFailed(endpoint, f"HTTP {response.status_code}", response.status_code) from http_err
+        except (requests.exceptions.RequestException, ValueError) as req_err:
+            self.metrics.record_error(endpoint)
+            logger.error("A request error occurred for %s: %s", endpoint, req_err)
+            raise RequestFailed(endpoint, str(req_err) or type(req_err).__name__) from req_err
+
+    def _send(self, url, headers, endpoint=None, stream=False):
+        """
+        Sends a GET through the rate limiter, retrying 429/5xx responses and
+        connection failures with jittered exponential backoff.
+
+        With `stream`, the body of the returned response is left unread for the
+        caller to consume (and close), e.g. with iter_content().
+
+        With several API keys, each attempt goes to the key that can send
+        soonest, so a 429 is retried on another key straight away rather than
+        after waiting for the first key's window to reset.
+        """
+        endpoint = endpoint or url
+        attempt = 0
+        while True:
+            key, wait = self.keys.reserve()
+            if wait > 0:
+                time.sleep(wait)
+            self.metrics.record_wait(endpoint, wait)
+            started = time.perf_counter()
+            try:
+                response = key.session.get(url, headers=headers, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+                self.metrics.record_request(endpoint, time.perf_counter() - started)
+                if self.keys.record_failure(key):
+                    logger.warning("Sidelining API key %s after repeated failures", key.label)
+                if attempt >= self.max_retries:
+                    raise
+                delay = key.rate_limiter.backoff_delay(attempt)
+                logger.info("Retrying %s in %.1fs after %s", endpoint, delay, err)
+                self.metrics.record_retry(endpoint)
+                self.metrics.record_wait(endpoint, delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            size = int(response.headers.get("Content-Length") or 0) if stream else len(response.content)
+            self.metrics.record_request(endpoint, time.perf_counter() - started, response.status_code, size)
+            key.rate_limiter.update_from_headers(response.headers)
+            if response.status_code >= 500 or response.status_code in (401, 403):
+                if self.keys.record_failure(key, response.status_code):
+                    logger.warning("Sidelining API key %s after HTTP %s", key.label, response.status_code)
+                    if response.status_code in (401, 403) and self.keys.healthy():
+                        response.close()
+                        continue  # The key was rejected, not the request; resend with another.
+            elif response.status_code != 429:
+                self.keys.record_success(key)
+            if response.status_code not in self.RETRY_STATUSES or attempt >= self.max_retries:
+                return response
+            delay = key.rate_limiter.backoff_delay(attempt, response)
+            if response.status_code == 429 and len(self.keys) > 1:
+                # That key is now blocked until its window resets; the next reserve() picks another.
+                delay = 0.0
+            logger.info("Retrying %s in %.1fs after HTTP %s", endpoint, delay, response.status_code)
+            response.close()
+            self.metrics.record_retry(endpoint)
+            self.metrics.record_wait(endpoint, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def get_url(self, url, headers=None, stream=False):
+        """
+        Sends a GET for a link the API returned, e.g. a filing's
+        links.document_metadata, through the rate limiter and retries like any
+        other request. Nothing is cached and error statuses are not raised.
+
+        Args:
+            url (str): Absolute URL, or a path relative to the API root.
+            headers (dict, optional): Extra request headers, e.g. Accept or Range.
+            stream (bool, optional): Leave the body unread for the caller to
+                                     consume (and close), e.g. with iter_content().
+
+        Returns:
+            requests.Response: The response; its `url` is the one finally fetched.
+
+        Raises:
+            requests.exceptions.RequestException: If the request could not be sent.
+        """
+        # Links are absolute from the live API; relative ones (from a mock server) are relative to the API root.
+        url = urljoin(self.base_url + "/", url)
+        return self._send(url, headers or {}, urlsplit(url).path, stream=stream)
+
+    def _to_records(self, data, record_class, page=False):
+        """
+        Converts a response to `record_class` records (or a RecordPage of them)
+        when the client was created with records=True; otherwise returns it unchanged.
+        """
+        if not self.records or data is None:
+            return data
+        return RecordPage.from_json(data, record_class) if page else record_class.from_json(data)
+
+    def _iter_pages(self, endpoint, page_size, prefetch=False, record_class=None, start_index=0, raise_errors=False):
+        """
+        Lazily yields the items of a paginated endpoint, one page at a time.
+        
+        Pages are requested with items_per_page/start_index until the reported
+        total (total_results, or total_count for filing history) is reached or a
+        page comes back empty. With `prefetch`, the next page is requested in the
+        background while the current one is being consumed. In records mode,
+        items are converted to `record_class` one at a time as they are yielded.
+
+        Iteration starts at item `start_index`. A page that fails to load ends
+        the iteration, unless `raise_errors` is set, in which case it raises
+        RequestFailed (see _make_request).
+        """
+        convert = record_class.from_json if self.records and record_class is not None else None
+        separator = "&" if "?" in endpoint else "?"
+
+        def fetch(start_index):
+            return self._make_request(f"{endpoint}{separator}items_per_page={page_size}&start_index={start_index}",
+                                      raise_errors=raise_errors)
+
+        pending = None
+        page = fetch(start_index)
+        try:
+            while page:
+                items = page.get('items') or []
+                total = page.get('total_results', page.get('total_count'))
+                start_index += len(items)
+                has_more = bool(items) and (total is None or start_index < total)
+
+                if has_more and prefetch:
+                    pending = self.executor.submit(fetch, start_index)
+
+                yield from (map(convert, items) if convert else items)
+
+                if not has_more:
+                    return
+                if pending is not None:
+                    page, pending = pending.result(), None
+                else:
+                    page = fetch(start_index)
+        finally:
+            # The consumer stopped early; don't spend quota on a page nobody will read.
+            if pending is not None:
+                pending.cancel()
+
+    def quota_status(self):
+        """
+        Reports API quota consumption for this client.
+        
+        Returns:
+            dict: See KeyPool.quota_status.
+        """
+        return self.keys.quota_status()
+
+    def start_streaming(self, streams=("companies", "filings", "pscs"), stream_key=None, checkpoint=None,
+                        on_event=None, stream_url=None):
+        """
+        Follows the streaming API in the background and applies its events to
+        this client's cache, so cached lookups stay current without polling.
+        Without a cache the events are only passed to `on_event`.
+
+        Args:
+            streams (iterable): Stream names from streaming.STREAMS.
+            stream_key (str, optional): Streaming API key. Defaults to the
+                                        COMPANIES_HOUSE_STREAM_KEY environment variable.
+            checkpoint (str, optional): File the last timepoint of each stream is kept in,
+                                        so a later call resumes where this one stopped.
+            on_event (callable, optional): Called with each StreamEvent after it is applied.
+            stream_url (str, optional): Streaming API root, e.g. a local stand-in.
+
+        Returns:
+            StreamConsumer: The running consumer. It is stopped by close().
+        """
+        consumer = StreamConsumer(streams, stream_key=stream_key, stream_url=stream_url, cache=self.cache,
+                                  checkpoint=TimepointCheckpoint(checkpoint), on_event=on_event)
+        self._stream_consumers.append(consumer)
+        return consumer.start()
 
-    def search_companies(self, query):
+    def search_companies(self, query, fresh=False):
         """
         Searches for companies by name.
         
+        When a local index is configured, a query that some indexed name starts
+        with is answered from it. Otherwise (the index only has similar names,
+        and the company may have been incorporated since the snapshot) or when
+        `fresh` is set, the API is queried; the index's similar names are
+        returned only if that request fails.
+        
         Args:
             query (str): The search term.
+            fresh (bool): Always query the API rather than the local index or a
+                          cached response. Defaults to False.
             
         Returns:
             dict: The JSON response from the API, or None if an error occurred.
         """
-        return self._make_request(f"/search/companies?q={query}")
+        results = None
+        if self.local_index is not None and not fresh:
+            results = self.local_index.search_companies(query)
+            if results.get("prefix_matches"):
+                return results
+        response = self._make_request(f"/search/companies?q={quote_plus(query)}", revalidate=fresh)
+        if response is None and results is not None and results["items"]:
+            return results
+        return response
 
-    def get_company_profile(self, company_number):
+    def get_company_profile(self, company_number, fresh=False, raise_errors=False):
         """
         Retrieves the profile for a specific company.
         
+        When a local index is configured and holds the company, its snapshot
+        profile is returned unless `fresh` is set.
+        
         Args:
             company_number (str): The company registration number.
+            fresh (bool): Always query the API rather than the local index or a
+                          cached response (which is revalidated with its ETag).
+                          Defaults to False.
+            raise_errors (bool): Raise RequestFailed if the request fails, rather than
+                                 returning None. A 404 still returns None. Defaults to False.
             
         Returns:
-            dict: The JSON response from the API, or None if an error occurred.
+            dict: The JSON response from the API (a CompanyProfile in records mode),
+                  or None if an error occurred.
         """
-        return self._make_request(f"/company/{company_number}")
+        if self.local_index is not None and not fresh:
+            profile = self.local_index.get_company_profile(company_number)
+            if profile is not None:
+                return self._to_records(profile, CompanyProfile)
+        return self._to_records(self._make_request(f"/company/{company_number}", revalidate=fresh,
+                                                   raise_errors=raise_errors), CompanyProfile)
 
-    def get_persons_with_significant_control(self, company_number):
+    def get_persons_with_significant_control(self, company_number, fresh=False, raise_errors=False):
         """
         Retrieves the Persons with Significant Control for a specific company.
         
         Args:
             company_number (str): The company registration number.
+            fresh (bool): Revalidate a cached response rather than returning it. Defaults to False.
+            raise_errors (bool): Raise RequestFailed if the request fails, rather than
+                                 returning None. A 404 still returns None. Defaults to False.
             
         Returns:
-            dict: The JSON response from the API, or None if an error occurred.
+            dict: The JSON response from the API (a RecordPage of PSC in records mode),
+                  or None if an error occurred.
         """
-        return self._make_request(f"/company/{company_number}/persons-with-significant-control")
+        endpoint = f"/company/{company_number}/persons-with-significant-control"
+        return self._to_records(self._make_request(endpoint, revalidate=fresh, raise_errors=raise_errors), PSC, page=True)
 
-    def get_filing_history(self, company_number, items_per_page=100):
+    def get_filing_history(self, company_number, items_per_page=100, start_index=0, fresh=False, raise_errors=False):
         """
         Retrieves filing history items for a specific company.
         
         Args:
             company_number (str): The company registration number.
             items_per_page (int): Number of items to retrieve per page. Defaults to 100.
+            start_index (int): Index of the first item to retrieve. Defaults to 0.
+            fresh (bool): Revalidate a cached response rather than returning it. Defaults to False.
+            raise_errors (bool): Raise RequestFailed if the request fails, rather than
+                                 returning None. A 404 still returns None. Defaults to False.
+            
+        Returns:
+            dict: The JSON response from the API (a RecordPage of FilingItem in records mode),
+                  or None if an error occurred.
+        """
+        endpoint = f"/company/{company_number}/filing-history?items_per_page={items_per_page}"
+        if start_index:
+            endpoint += f"&start_index={start_index}"
+        return self._to_records(self._make_request(endpoint, revalidate=fresh, raise_errors=raise_errors),
+                                FilingItem, page=True)
+
+    def get_company_officers(self, company_number, raise_errors=False):
+        """
+        Retrieves the officers list for a specific company.
+        
+        Args:
+            company_number (str): The company registration number.
+            raise_errors (bool): Raise RequestFailed if the request fails, rather than
+                                 returning None. A 404 still returns None. Defaults to False.
+            
+        Returns:
+            dict: The JSON response from the API, or None if an error occurred.
+        """
+        return self._make_request(f"/company/{company_number}/officers", raise_errors=raise_errors)
+
+    def get_company_charges(self, company_number, raise_errors=False):
+        """
+        Retrieves the charges registered against a specific company.
+        
+        Args:
+            company_number (str): The company registration number.
+            raise_errors (bool): Raise RequestFailed if the request fails, rather than
+                                 returning None. A 404 still returns None. Defaults to False.
             
         Returns:
             dict: The JSON response from the API, or None if an error occurred.
         """
-        return self._make_request(f"/company/{company_number}/filing-history?items_per_page={items_per_page}")
+        return self._make_request(f"/company/{company_number}/charges", raise_errors=raise_errors)
+
+    def submit_company_bundle(self, company_number, include_officers=False, include_charges=False):
+        """
+        Starts fetching every section of a company bundle in parallel.
+        
+        Args:
+            company_number (str): The company registration number.
+            include_officers (bool): Also fetch the company's officers. Defaults to False.
+            include_charges (bool): Also fetch the company's charges. Defaults to False.
+            
+        Returns:
+            dict: Section name ("profile", "filing_history", "pscs" and optionally
+                  "officers" and "charges") mapped to a Future for that section's
+                  response. The response is None if the API has no such section
+                  for the company (a 404); a Future whose request failed raises
+                  RequestFailed.
+        """
+        sections = ["profile", "filing_history", "pscs"]
+        if include_officers:
+            sections.append("officers")
+        if include_charges:
+            sections.append("charges")
+
+        return {
+            section: self.executor.submit(getattr(self, self.BUNDLE_SECTIONS[section]), company_number, raise_errors=True)
+            for section in sections
+        }
+
+    def get_company_bundle(self, company_number, include_officers=False, include_charges=False):
+        """
+        Retrieves the profile, filing history and PSCs (and optionally officers and
+        charges) for a company concurrently, so the total latency is close to the
+        slowest single call.
+        
+        Each section is fetched independently. A section the API doesn't have for
+        the company (a 404, e.g. no charges) is None. A section whose request
+        failed (a network error, or an error status that outlasted the retries)
+        is also None, and its error is recorded under "errors", without affecting
+        the others. So a section missing from "errors" is definitive, and one in
+        it is worth fetching again later.
+        
+        Args:
+            company_number (str): The company registration number.
+            include_officers (bool): Also fetch the company's officers. Defaults to False.
+            include_charges (bool): Also fetch the company's charges. Defaults to False.
+            
+        Returns:
+            dict: Section name mapped to its JSON response (or None), plus an "errors"
+                  dict mapping the names of sections that failed to their error message.
+        """
+        futures = self.submit_company_bundle(company_number, include_officers, include_charges)
+        bundle = {"company_number": company_number, "errors": {}}
+        for section, future in futures.items():
+            try:
+                bundle[section] = future.result()
+            except Exception as err:
+                bundle[section] = None
+                bundle["errors"][section] = str(err)
+        return bundle
 
     def search_officers(self, query):
         """
@@ -101,7 +605,7 @@ class CompaniesHouseAPI:
         Returns:
             dict: The JSON response from the API, or None if an error occurred.
         """
-        return self._make_request(f"/search/officers?q={query}")
+        return self._make_request(f"/search/officers?q={quote_plus(query)}")
 
     def get_officer_appointments(self, appointments_link):
         """
@@ -111,9 +615,90 @@ class CompaniesHouseAPI:
             appointments_link (str): The relative URL for the officer's appointments (e.g., /officers/{officer_id}/appointments).
             
         Returns:
-            dict: The JSON response from the API, or None if an error occurred.
+            dict: The JSON response from the API (a RecordPage of OfficerAppointment in records mode),
+                  or None if an error occurred.
+        """
+        return self._to_records(self._make_request(appointments_link), OfficerAppointment, page=True)
+
+    def iter_search_companies(self, query, page_size=100, prefetch=False):
+        """
+        Streams every company matching a search, fetching further pages as needed.
+        
+        Args:
+            query (str): The search term.
+            page_size (int): Number of items to request per page. Defaults to 100.
+            prefetch (bool): Fetch the next page in the background. Defaults to False.
+            
+        Yields:
+            dict: Each search result item.
+        """
+        return self._iter_pages(f"/search/companies?q={quote_plus(query)}", page_size, prefetch)
+
+    def iter_filing_history(self, company_number, page_size=100, prefetch=False, start_index=0, raise_errors=False):
+        """
+        Streams a company's complete filing history, newest first.
+        
+        Args:
+            company_number (str): The company registration number.
+            page_size (int): Number of items to request per page. Defaults to 100.
+            prefetch (bool): Fetch the next page in the background. Defaults to False.
+            start_index (int): Skip this many of the newest filings, e.g. ones
+                               already read with get_filing_history. Defaults to 0.
+            raise_errors (bool): Raise RequestFailed if a page fails to load, rather
+                                 than ending early. Defaults to False.
+            
+        Yields:
+            dict: Each filing history item (a FilingItem in records mode).
+        """
+        return self._iter_pages(f"/company/{company_number}/filing-history", page_size, prefetch, FilingItem,
+                                start_index, raise_errors)
+
+    def iter_search_officers(self, query, page_size=100, prefetch=False):
+        """
+        Streams every officer matching a search, fetching further pages as needed.
+        
+        Args:
+            query (str): The search term.
+            page_size (int): Number of items to request per page. Defaults to 100.
+            prefetch (bool): Fetch the next page in the background. Defaults to False.
+            
+        Yields:
+            dict: Each search result item.
+        """
+        return self._iter_pages(f"/search/officers?q={quote_plus(query)}", page_size, prefetch)
+
+    def iter_officer_appointments(self, appointments_link, page_size=50, prefetch=False, start_index=0):
+        """
+        Streams an officer's complete appointment history.
+        
+        Args:
+            appointments_link (str): The relative URL for the officer's appointments.
+            page_size (int): Number of items to request per page. Defaults to 50,
+                             the most the appointments endpoint returns.
+            prefetch (bool): Fetch the next page in the background. Defaults to False.
+            start_index (int): Skip this many appointments, e.g. ones already read
+                               with get_officer_appointments. Defaults to 0.
+            
+        Yields:
+            dict: Each appointment item (an OfficerAppointment in records mode).
         """
-        return self._make_request(appointments_link)
+        return self._iter_pages(appointments_link, page_size, prefetch, OfficerAppointment, start_index)
+
+    def iter_company_officers(self, company_number, page_size=100, prefetch=False, start_index=0):
+        """
+        Streams a company's complete officers list.
+        
+        Args:
+            company_number (str): The company registration number.
+            page_size (int): Number of items to request per page. Defaults to 100.
+            prefetch (bool): Fetch the next page in the background. Defaults to False.
+            start_index (int): Skip this many officers, e.g. ones already read
+                               with get_company_officers. Defaults to 0.
+            
+        Yields:
+            dict: Each officer item.
+        """
+        return self._iter_pages(f"/company/{company_number}/officers", page_size, prefetch, start_index=start_index)
 
     def get_officer_details(self, officer_id):
         """
@@ -136,9 +721,7 @@ class CompaniesHouseAPI:
         # endpoint for all details like a company profile is not standard.
         # This method can be expanded if a specific detail endpoint is discovered
         # or if aggregation from multiple company-specific officer endpoints is needed.
-        print(f"Warning: Attempted to get comprehensive officer details for ID: {officer_id}")
-        print("The Companies House API typically provides officer details within search results or company-specific officer lists.")
-        print("This method currently serves as a placeholder.")
+        logger.warning("Attempted to get comprehensive officer details for ID: %s. "
+                       "The Companies House API typically provides officer details within search results "
+                       "or company-specific officer lists; this method currently serves as a placeholder.", officer_id)
         return {"officer_id": officer_id, "message": "Details usually embedded in search/list results."}
-
-
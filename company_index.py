@@ -0,0 +1,540 @@
+"""
+Offline company search index built from the Companies House "BasicCompanyData"
+bulk snapshot (a free monthly CSV download, also distributed as zip files).
+
+The importer writes a single compact file that is memory-mapped at query time:
+
+  * records are sorted by normalised name, so name-prefix search is a binary
+    search over the name column;
+  * a company-number column plus a permutation sorted by number gives
+    O(log n) lookups by company_number;
+  * a trigram posting table over the normalised names answers queries that
+    are not prefixes ("TESCO STORES" -> "... TESCO STORES HOLDINGS").
+
+Nothing is loaded into memory up front, so opening a multi-million company
+index is instant, and number and prefix lookups touch only a handful of pages.
+Trigram matching reads the posting lists of the query's rarest trigrams; their
+candidates are counted with NumPy when it is installed.
+
+    python3 company_index.py build BasicCompanyData-2026-10-01.zip -o companies.idx
+    python3 company_index.py search companies.idx "tesco stores"
+    python3 company_index.py lookup companies.idx 00445790
+"""
+import argparse
+import bisect
+import heapq
+import csv
+import io
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+import unicodedata
+import zipfile
+from array import array
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency; trigram candidates are counted with Counter instead.
+    np = None
+
+MAGIC = b"CHIDX1\n\0"
+FIELD_SEPARATOR = "\x1f"
+RECORD_FIELDS = (
+    "company_name", "company_number", "company_status", "type", "address_line_1",
+    "address_line_2", "locality", "postal_code", "country_of_origin",
+    "date_of_creation", "date_of_cessation", "sic_codes",
+)
+NUMBER_WIDTH = 8
+
+# Trigrams are taken over the normalised alphabet (space, 0-9, A-Z), so each
+# maps to a small integer and the posting table can be indexed directly.
+TRIGRAM_ALPHABET = " 0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_ALPHABET_INDEX = {ch: i for i, ch in enumerate(TRIGRAM_ALPHABET)}
+_RADIX = len(TRIGRAM_ALPHABET)
+TRIGRAM_SPACE = _RADIX ** 3
+
+# Legal-form suffixes and spellings that should not affect matching.
+_SUFFIX_ALIASES = {
+    "LTD": "LIMITED", "LIMITED": "LIMITED", "PLC": "PLC", "LLP": "LLP", "CO": "COMPANY",
+    "CYF": "CYFYNGEDIG", "CYFYNGEDIG": "CYFYNGEDIG", "CIC": "CIC",
+}
+_DROPPED_SUFFIXES = {"LIMITED", "PLC", "LLP", "CYFYNGEDIG", "CIC"}
+_NON_ALNUM = re.compile(r"[^0-9A-Z ]+")
+
+# BasicCompanyData category names mapped to the API's company "type" values.
+_CATEGORY_TYPES = {
+    "private limited company": "ltd",
+    "public limited company": "plc",
+    "limited liability partnership": "llp",
+    "private unlimited company": "private-unlimited",
+    "pri/ltd by guar/nsc (private, limited by guarantee, no share capital)": "private-limited-guarant-nsc",
+    "pri/lbg/nsc (private, limited by guarantee, no share capital, use of 'limited' exemption)": "private-limited-guarant-nsc-limited-exemption",
+    "community interest company": "community-interest-company",
+    "limited partnership": "limited-partnership",
+    "scottish partnership": "scottish-partnership",
+    "charitable incorporated organisation": "charitable-incorporated-organisation",
+    "scottish charitable incorporated organisation": "scottish-charitable-incorporated-organisation",
+    "overseas entity": "registered-overseas-entity",
+}
+
+
+def normalise_name(name, drop_suffix=True):
+    """
+    Normalises a company or officer name for matching: ASCII-folds and
+    upper-cases it, turns '&' into AND, strips punctuation, unifies legal-form
+    abbreviations (LTD -> LIMITED) and, with `drop_suffix`, removes a trailing
+    legal form altogether.
+    """
+    text = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode("ascii").upper()
+    text = text.replace("&", " AND ").replace("'", "")
+    words = _NON_ALNUM.sub(" ", text).split()
+    words = [_SUFFIX_ALIASES.get(word, word) for word in words]
+    if drop_suffix and len(words) > 1 and words[-1] in _DROPPED_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def trigrams(key):
+    """
+    Returns the set of trigram codes of a normalised key, padded with spaces so
+    that short names and word starts still produce trigrams.
+    """
+    padded = f"  {key} "
+    codes = set()
+    for i in range(len(padded) - 2):
+        a, b, c = padded[i:i + 3]
+        codes.add((_ALPHABET_INDEX[a] * _RADIX + _ALPHABET_INDEX[b]) * _RADIX + _ALPHABET_INDEX[c])
+    return codes
+
+
+def _iso_date(value):
+    """
+    Converts the snapshot's dd/mm/yyyy dates to the API's yyyy-mm-dd.
+    """
+    value = (value or "").strip()
+    if len(value) == 10 and value[2] == "/" and value[5] == "/":
+        return f"{value[6:]}-{value[3:5]}-{value[:2]}"
+    return value
+
+
+def _open_csv_sources(path):
+    """
+    Yields text streams for the CSV file, or for each CSV inside a zip archive.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in sorted(archive.namelist()):
+                if member.lower().endswith(".csv"):
+                    with archive.open(member) as raw:
+                        yield io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+    else:
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            yield f
+
+
+def read_snapshot(paths):
+    """
+    Yields one record tuple (in RECORD_FIELDS order) per company in the given
+    BasicCompanyData CSV or zip files.
+    """
+    for path in paths:
+        for stream in _open_csv_sources(path):
+            reader = csv.reader(stream)
+            header = [column.strip() for column in next(reader)]
+            col = {name: i for i, name in enumerate(header)}
+
+            def field(row, name):
+                i = col.get(name)
+                return row[i].strip() if i is not None and i < len(row) else ""
+
+            sic_columns = [col[name] for name in header if name.startswith("SICCode.SicText_")]
+            for row in reader:
+                number = field(row, "CompanyNumber")
+                if not number:
+                    continue
+                category = field(row, "CompanyCategory")
+                sic_codes = []
+                for i in sic_columns:
+                    if i < len(row) and row[i].strip() and row[i].strip() != "None Supplied":
+                        sic_codes.append(row[i].split(" - ")[0].strip())
+                yield (
+                    field(row, "CompanyName"),
+                    number.upper(),
+                    field(row, "CompanyStatus").lower().replace(" ", "-"),
+                    _CATEGORY_TYPES.get(category.lower(), category),
+                    field(row, "RegAddress.AddressLine1"),
+                    field(row, "RegAddress.AddressLine2"),
+                    field(row, "RegAddress.PostTown"),
+                    field(row, "RegAddress.PostCode"),
+                    field(row, "CountryOfOrigin"),
+                    _iso_date(field(row, "IncorporationDate")),
+                    _iso_date(field(row, "DissolutionDate")),
+                    " ".join(sic_codes),
+                )
+
+
+def build_index(records, output_path, source=None):
+    """
+    Writes a search index for `records` (tuples in RECORD_FIELDS order) to
+    `output_path`. The index is written to a temporary file and moved into
+    place, so readers never see a half-built index.
+
+    Returns:
+        int: The number of companies indexed.
+    """
+    rows = []
+    for record in records:
+        rows.append((normalise_name(record[0]), FIELD_SEPARATOR.join(record).encode("utf-8"), record[1]))
+    rows.sort(key=lambda row: row[0])
+    count = len(rows)
+
+    sections = {}
+    record_offsets = array("Q", [0])
+    name_offsets = array("Q", [0])
+    numbers = bytearray()
+    records_blob = bytearray()
+    names_blob = bytearray()
+    trigram_counts = array("Q", bytes(8 * (TRIGRAM_SPACE + 1)))
+    row_trigrams = []
+
+    for key, record_bytes, number in rows:
+        records_blob += record_bytes
+        record_offsets.append(len(records_blob))
+        names_blob += key.encode("ascii")
+        name_offsets.append(len(names_blob))
+        numbers += number.encode("ascii")[:NUMBER_WIDTH].ljust(NUMBER_WIDTH)
+        codes = array("H", sorted(trigrams(key)))
+        row_trigrams.append(codes)
+        for code in codes:
+            trigram_counts[code + 1] += 1
+
+    # Counting sort of (trigram, record id) pairs into one posting array.
+    for code in range(TRIGRAM_SPACE):
+        trigram_counts[code + 1] += trigram_counts[code]
+    trigram_offsets = array("Q", trigram_counts)
+    postings = array("I", bytes(4 * trigram_offsets[-1]))
+    cursor = array("Q", trigram_offsets)
+    for record_id, codes in enumerate(row_trigrams):
+        for code in codes:
+            postings[cursor[code]] = record_id
+            cursor[code] += 1
+    del row_trigrams, cursor
+
+    number_order = array("I", sorted(range(count), key=lambda i: numbers[i * NUMBER_WIDTH:(i + 1) * NUMBER_WIDTH]))
+    del rows
+
+    blobs = [
+        ("records", bytes(records_blob)),
+        ("record_offsets", record_offsets.tobytes()),
+        ("names", bytes(names_blob)),
+        ("name_offsets", name_offsets.tobytes()),
+        ("numbers", bytes(numbers)),
+        ("number_order", number_order.tobytes()),
+        ("trigram_offsets", trigram_offsets.tobytes()),
+        ("postings", postings.tobytes()),
+    ]
+
+    offset = 0
+    for name, blob in blobs:
+        sections[name] = [offset, len(blob)]
+        offset += len(blob) + (-len(blob) % 8)
+    header = json.dumps({
+        "count": count,
+        "fields": RECORD_FIELDS,
+        "sections": sections,
+        "built_at": time.time(),
+        "source": source,
+    }).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % 8)
+
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name, blob in blobs:
+            f.write(blob)
+            f.write(b"\0" * (-len(blob) % 8))
+    os.replace(tmp_path, output_path)
+    return count
+
+
+class CompanyIndex:
+    """
+    Read-only, memory-mapped view of an index written by build_index.
+
+    search_companies() and get_company_profile() return dicts shaped like the
+    corresponding API responses, so CompaniesHouseAPI can answer from the index
+    transparently.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a company index file.")
+        (header_length,) = struct.unpack_from("<Q", self._mm, len(MAGIC))
+        data_start = len(MAGIC) + 8 + header_length
+        header = json.loads(self._mm[len(MAGIC) + 8:data_start])
+        self.count = header["count"]
+        self.fields = tuple(header["fields"])
+        self.built_at = header.get("built_at")
+
+        view = memoryview(self._mm)
+        self._views = [view]
+
+        def section(name, typecode=None):
+            start, length = header["sections"][name]
+            part = view[data_start + start:data_start + start + length]
+            self._views.append(part)
+            if typecode:
+                part = part.cast(typecode)
+                self._views.append(part)
+            return part
+
+        self._records = section("records")
+        self._record_offsets = section("record_offsets", "Q")
+        self._names = section("names")
+        self._name_offsets = section("name_offsets", "Q")
+        self._numbers = section("numbers")
+        self._number_order = section("number_order", "I")
+        self._trigram_offsets = section("trigram_offsets", "Q")
+        self._postings = section("postings", "I")
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def _name(self, record_id):
+        return bytes(self._names[self._name_offsets[record_id]:self._name_offsets[record_id + 1]])
+
+    def _number(self, record_id):
+        return bytes(self._numbers[record_id * NUMBER_WIDTH:(record_id + 1) * NUMBER_WIDTH]).rstrip()
+
+    def record(self, record_id):
+        """
+        Returns the stored fields of a record as a dict keyed by RECORD_FIELDS.
+        """
+        raw = bytes(self._records[self._record_offsets[record_id]:self._record_offsets[record_id + 1]])
+        return dict(zip(self.fields, raw.decode("utf-8").split(FIELD_SEPARATOR)))
+
+    def find_number(self, company_number):
+        """
+        Returns the record id for `company_number`, or None if it isn't indexed.
+        """
+        target = company_number.strip().upper().encode("ascii", "ignore")
+        order = self._number_order
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._number(order[mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._number(order[lo]) == target:
+            return order[lo]
+        return None
+
+    def _prefix_ids(self, key, limit):
+        target = key.encode("ascii")
+        lo = bisect.bisect_left(range(self.count), target, key=self._name)
+        ids = []
+        while lo < self.count and len(ids) < limit and self._name(lo).startswith(target):
+            ids.append(lo)
+            lo += 1
+        return ids
+
+    def _trigram_ids(self, key, limit, exclude):
+        codes = trigrams(key)
+        if not codes:
+            return []
+        offsets = self._trigram_offsets
+        lists = sorted(
+            (self._postings[offsets[code]:offsets[code + 1]] for code in codes),
+            key=len,
+        )
+        # Score candidates from the rarest trigrams only; common ones add cost
+        # but little selectivity. A candidate needs at least half of them.
+        lists = [postings for postings in lists[:8] if len(postings)]
+        if not lists:
+            return []
+        needed = max(1, (len(lists) + 1) // 2)
+        if np is not None:
+            ids, scores = np.unique(np.concatenate([np.frombuffer(postings, dtype=np.uint32) for postings in lists]),
+                                    return_counts=True)
+            keep = scores >= needed
+            if exclude:
+                keep &= ~np.isin(ids, np.fromiter(exclude, dtype=np.uint32, count=len(exclude)))
+            ids, scores = ids[keep].astype(np.int64), scores[keep]
+            name_offsets = np.frombuffer(self._name_offsets, dtype=np.uint64)
+            lengths = name_offsets[ids + 1] - name_offsets[ids]
+            return ids[np.lexsort((ids, lengths, -scores))[:limit]].tolist()
+        scores = Counter()
+        for postings in lists:
+            scores.update(postings)
+        name_offsets = self._name_offsets
+        return [record_id for _, _, record_id in heapq.nsmallest(limit, (
+            (-score, name_offsets[record_id + 1] - name_offsets[record_id], record_id)
+            for record_id, score in scores.items()
+            if score >= needed and record_id not in exclude
+        ))]
+
+    def search(self, query, limit=20):
+        """
+        Returns up to `limit` record ids matching `query`: exact-prefix matches on
+        the normalised name first, then the best trigram matches.
+        """
+        return self._search(query, limit)[0]
+
+    def _search(self, query, limit):
+        """search(), also returning how many of the ids are prefix matches."""
+        key = normalise_name(query)
+        if not key:
+            return [], 0
+        ids = self._prefix_ids(key, limit)
+        prefix_matches = len(ids)
+        if len(ids) < limit:
+            ids += self._trigram_ids(key, limit - len(ids), set(ids))
+        return ids, prefix_matches
+
+    def search_companies(self, query, limit=20):
+        """
+        Answers a company search from the index.
+
+        Returns:
+            dict: A response shaped like the API's /search/companies result.
+                  total_results is None when there were more than `limit`
+                  matches, since counting them all would cost a full scan.
+                  prefix_matches counts the items whose name starts with the
+                  query; the rest are only similar to it.
+        """
+        record_ids, prefix_matches = self._search(query, limit + 1)
+        truncated = len(record_ids) > limit
+        items = []
+        for record_id in record_ids[:limit]:
+            record = self.record(record_id)
+            address = {
+                "address_line_1": record["address_line_1"],
+                "address_line_2": record["address_line_2"],
+                "locality": record["locality"],
+                "postal_code": record["postal_code"],
+            }
+            items.append({
+                "kind": "searchresults#company",
+                "title": record["company_name"],
+                "company_number": record["company_number"],
+                "company_status": record["company_status"],
+                "company_type": record["type"],
+                "date_of_creation": record["date_of_creation"],
+                "address": address,
+                "address_snippet": ", ".join(value for value in address.values() if value),
+            })
+        return {"items": items, "total_results": None if truncated else len(items), "items_per_page": limit,
+                "prefix_matches": min(prefix_matches, limit), "source": "local_index"}
+
+    def get_company_profile(self, company_number):
+        """
+        Answers a company profile lookup from the index.
+
+        Returns:
+            dict: A response shaped like the API's /company/{number} result
+                  (limited to the fields in the snapshot), or None if the
+                  company isn't indexed.
+        """
+        record_id = self.find_number(company_number)
+        if record_id is None:
+            return None
+        record = self.record(record_id)
+        profile = {
+            "company_name": record["company_name"],
+            "company_number": record["company_number"],
+            "company_status": record["company_status"],
+            "type": record["type"],
+            "date_of_creation": record["date_of_creation"],
+            "registered_office_address": {
+                "address_line_1": record["address_line_1"],
+                "address_line_2": record["address_line_2"],
+                "locality": record["locality"],
+                "postal_code": record["postal_code"],
+            },
+            "jurisdiction": record["country_of_origin"],
+            "sic_codes": record["sic_codes"].split(),
+            "source": "local_index",
+        }
+        if record["date_of_cessation"]:
+            profile["date_of_cessation"] = record["date_of_cessation"]
+        return profile
+
+
+def default_index_path():
+    """
+    Returns the index location used by the TUI: $COMPANIES_HOUSE_INDEX, or
+    companies.idx in the user's companycheck cache directory.
+    """
+    path = os.getenv("COMPANIES_HOUSE_INDEX")
+    if path:
+        return path
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "companycheck", "companies.idx")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query an offline company index from BasicCompanyData snapshots.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build an index from BasicCompanyData CSV or zip files.")
+    build.add_argument("snapshots", nargs="+", help="BasicCompanyData CSV or zip files.")
+    build.add_argument("-o", "--output", default=default_index_path(), help="Index file to write.")
+
+    search = commands.add_parser("search", help="Search an index by company name.")
+    search.add_argument("index")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=20)
+
+    lookup = commands.add_parser("lookup", help="Look up a company by number.")
+    lookup.add_argument("index")
+    lookup.add_argument("company_number")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        started = time.monotonic()
+        count = build_index(read_snapshot(args.snapshots), args.output, source=[os.path.basename(p) for p in args.snapshots])
+        print(f"Indexed {count} companies into {args.output} in {time.monotonic() - started:.1f}s", file=sys.stderr)
+    elif args.command == "search":
+        with CompanyIndex(args.index) as index:
+            for item in index.search_companies(args.query, args.limit)["items"]:
+                print(f"{item['company_number']}  {item['title']}  [{item['company_status']}]")
+    elif args.command == "lookup":
+        with CompanyIndex(args.index) as index:
+            profile = index.get_company_profile(args.company_number)
+            if profile is None:
+                print(f"{args.company_number} not found", file=sys.stderr)
+                return 1
+            print(json.dumps(profile, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
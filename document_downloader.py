@@ -0,0 +1,269 @@
+"""
+Downloads the filed documents (accounts, confirmation statements...) behind a
+company's filing history from the Companies House Document API.
+
+Each filing's links.document_metadata gives the document's metadata, whose
+links.document is the content URL (the API redirects it to the file itself).
+Bodies are streamed to disk in chunks, so a large PDF never sits in memory,
+and written as <directory>/<company number>/<transaction id>.pdf: a file that
+is already there is never fetched again. Downloads go to a .part file first,
+and an interrupted one is resumed with a Range request on the next run.
+
+Several documents are fetched at once, through the client's rate limiter and
+API keys, so downloads share the quota with everything else the client does.
+
+    python3 document_downloader.py 00445790 -o documents/
+    python3 document_downloader.py 00445790 --categories all --since 2020-01-01
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+
+from records import loads
+
+logger = logging.getLogger(__name__)
+
+# Filing categories downloaded unless told otherwise.
+DEFAULT_CATEGORIES = ("accounts", "confirmation-statement")
+CONTENT_TYPE = "application/pdf"
+CHUNK_SIZE = 64 * 1024
+
+
+def default_directory():
+    return os.getenv("COMPANYCHECK_DOCUMENTS") or os.path.join(os.path.expanduser("~"), "companycheck-documents")
+
+
+def parse_categories(value):
+    """Parses a comma separated category list; "all" means every category (None)."""
+    if value is None:
+        return DEFAULT_CATEGORIES
+    categories = tuple(category.strip() for category in value.split(",") if category.strip())
+    return None if "all" in categories else categories
+
+
+def document_metadata_link(filing):
+    """
+    The document metadata link of a filing history item, a JSON dict (under
+    links) or a FilingItem record, or None if the filing has no document.
+    """
+    if isinstance(filing, dict):
+        return (filing.get('links') or {}).get('document_metadata')
+    return filing.get('document_metadata')
+
+
+class DocumentDownloader:
+    """
+    Fetches filing documents concurrently and streams them to disk.
+
+    Every download returns (and passes to `on_result`) a dict with the filing's
+    transaction_id, date, type and description, the file `path`, the `bytes`
+    written and a `status`: "downloaded", "resumed", "present" (already on
+    disk), "unavailable" (no document for the filing) or "failed".
+    """
+
+    def __init__(self, client, directory=None, categories=DEFAULT_CATEGORIES, workers=4, chunk_size=CHUNK_SIZE):
+        """
+        Args:
+            client (CompaniesHouseAPI): Client whose keys and rate limiter are used.
+            directory (str, optional): Where documents are saved. Defaults to the
+                                       COMPANYCHECK_DOCUMENTS environment variable,
+                                       else ~/companycheck-documents.
+            categories (tuple, optional): Filing categories to download; None for all.
+                                          Defaults to accounts and confirmation statements.
+            workers (int): Documents downloaded at the same time. Defaults to 4.
+            chunk_size (int): Bytes read and written at a time. Defaults to 64 KB.
+        """
+        self.client = client
+        self.directory = directory or default_directory()
+        self.categories = categories
+        self.chunk_size = chunk_size
+        self.stats = {"downloaded": 0, "resumed": 0, "present": 0, "unavailable": 0, "failed": 0, "bytes": 0}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="documents")
+        self._lock = threading.Lock()
+        self._pending = {}  # (company number, transaction id) -> Future, while queued or downloading
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def path_for(self, company_number, filing):
+        return os.path.join(self.directory, company_number, f"{filing['transaction_id']}.pdf")
+
+    def wanted(self, filing, since=None):
+        """True if `filing` has a document in one of the chosen categories, filed on or after `since`."""
+        if not filing.get('transaction_id') or not document_metadata_link(filing):
+            return False
+        if self.categories is not None and filing.get('category') not in self.categories:
+            return False
+        return since is None or (filing.get('date') or "") >= since
+
+    def submit(self, company_number, filings, since=None, on_result=None):
+        """
+        Queues the documents of `filings` (filing history items) for download.
+        A document already queued or downloading isn't queued again; its
+        existing Future is returned instead.
+
+        Returns:
+            list: A Future per document, resolving to its result dict.
+        """
+        futures = []
+        for filing in filings:
+            if self.wanted(filing, since):
+                key = (company_number, filing['transaction_id'])
+                with self._lock:
+                    future = self._pending.get(key)
+                    if future is None:
+                        future = self._pending[key] = self._executor.submit(self.download, company_number, filing)
+                        future.add_done_callback(lambda future, key=key: self._pending.pop(key, None))
+                if on_result is not None:
+                    future.add_done_callback(lambda future: future.cancelled() or on_result(future.result()))
+                futures.append(future)
+        return futures
+
+    def download_company(self, company_number, since=None, on_result=None):
+        """
+        Downloads the documents in a company's filing history, reading the history
+        page by page while earlier documents are already downloading.
+
+        Returns:
+            list: The result dicts, newest filing first.
+        """
+        futures = []
+        for filing in self.client.iter_filing_history(company_number):
+            if since is not None and (filing.get('date') or "") < since:
+                break  # Newest first: everything after this is older still
+            futures += self.submit(company_number, [filing], since, on_result)
+        return [future.result() for future in futures]
+
+    def download(self, company_number, filing):
+        """
+        Downloads one filing's document, unless it is already on disk.
+
+        Returns:
+            dict: The result (see the class docstring).
+        """
+        path = self.path_for(company_number, filing)
+        result = {
+            "company_number": company_number,
+            "transaction_id": filing['transaction_id'],
+            "date": filing.get('date'),
+            "type": filing.get('type'),
+            "description": filing.get('description'),
+            "path": path,
+            "bytes": 0,
+        }
+        if os.path.exists(path):
+            result["status"] = "present"
+        else:
+            try:
+                result["status"], result["bytes"] = self._fetch(document_metadata_link(filing), path)
+            except (requests.exceptions.RequestException, OSError, ValueError) as err:
+                logger.warning("Downloading %s for %s failed: %s", filing['transaction_id'], company_number, err)
+                result["status"] = "failed"
+        with self._lock:
+            self.stats[result["status"]] += 1
+            self.stats["bytes"] += result["bytes"]
+        return result
+
+    def _fetch(self, metadata_link, path):
+        """
+        Returns:
+            tuple: (status, bytes written)
+        """
+        response = self.client.get_url(metadata_link, {"Accept": "application/json"})
+        if response.status_code == 404:
+            return "unavailable", 0
+        response.raise_for_status()
+        metadata = loads(response.content)
+        metadata_url = response.url
+        content_link = (metadata.get('links') or {}).get('document')
+        resources = metadata.get('resources') or {}
+        if not content_link or (resources and CONTENT_TYPE not in resources):
+            return "unavailable", 0
+        expected = (resources.get(CONTENT_TYPE) or {}).get('content_length')
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = path + ".part"
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        if offset and offset == expected:
+            os.replace(partial, path)
+            return "resumed", 0
+        headers = {"Accept": CONTENT_TYPE}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+
+        response = self.client.get_url(urljoin(metadata_url, content_link), headers, stream=True)
+        with response:
+            if response.status_code == 416:
+                # The partial file doesn't fit the document (it changed, or is corrupt): start again.
+                os.remove(partial)
+                return self._fetch(metadata_link, path)
+            response.raise_for_status()
+            if response.status_code != 206:
+                offset = 0  # The server sent the whole document
+            written = 0
+            with open(partial, "ab" if offset else "wb") as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+                    written += len(chunk)
+        if expected is not None and offset + written != expected:
+            raise ValueError(f"got {offset + written} of {expected} bytes; the download will resume next time")
+        os.replace(partial, path)
+        return ("resumed" if offset else "downloaded"), written
+
+
+def format_result(result):
+    """One line describing a download, for progress output."""
+    name = os.path.basename(result["path"])
+    detail = f"{result['bytes'] / 1024:.0f} KB" if result["bytes"] else ""
+    return f"{result['date'] or '':10}  {result['type'] or '':6}  {result['status']:11} {name}  {detail}".rstrip()
+
+
+def main(argv=None):
+    from companies_house_api import CompaniesHouseAPI
+    from response_cache import ResponseCache
+
+    parser = argparse.ArgumentParser(description="Download the filed documents of one or more companies.")
+    parser.add_argument("company_numbers", nargs="+", help="Company registration numbers.")
+    parser.add_argument("-o", "--output", help="Directory to save to. Defaults to COMPANYCHECK_DOCUMENTS, "
+                                               "else ~/companycheck-documents.")
+    parser.add_argument("--categories", help="Comma separated filing categories, or 'all'. "
+                                             "Defaults to accounts,confirmation-statement.")
+    parser.add_argument("--since", help="Only filings made on or after this date (YYYY-MM-DD).")
+    parser.add_argument("--workers", type=int, default=4, help="Documents downloaded at once. Defaults to 4.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log retries and failed requests to stderr.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    try:
+        client = CompaniesHouseAPI(cache=ResponseCache.default())
+    except ValueError as e:
+        print(f"API Key Error: {e}", file=sys.stderr)
+        return 2
+    downloader = DocumentDownloader(client, args.output, parse_categories(args.categories), args.workers)
+    try:
+        for number in args.company_numbers:
+            print(f"{number}:")
+            downloader.download_company(number.strip().upper(), args.since,
+                                        on_result=lambda result: print("  " + format_result(result), flush=True))
+    except KeyboardInterrupt:
+        print("Interrupted. Run the same command again to resume.", file=sys.stderr)
+        return 130
+    finally:
+        downloader.close()
+        client.close()
+    stats = downloader.stats
+    print(f"Done: {stats['downloaded'] + stats['resumed']} downloaded ({stats['bytes'] / 1048576:.1f} MB), "
+          f"{stats['present']} already present, {stats['unavailable']} unavailable, {stats['failed']} failed. "
+          f"Saved under {downloader.directory}", file=sys.stderr)
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
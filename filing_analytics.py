@@ -0,0 +1,436 @@
+"""
+Portfolio-level filing-history analytics.
+
+FilingTable loads paginated filing histories for any number of companies into
+columnar arrays: one row per filing, with the company, date (days since
+1970-01-01), type, category and description each stored as a small integer
+code. The strings are kept once each in per-column vocabularies. Queries
+(filings per type per year, time windows, latest accounts and overdue
+detection, status-change timelines) run as vectorised group-bys over the
+columns. They use NumPy when it is installed, and plain loops over the same
+arrays otherwise.
+
+    python3 batch_enrich.py numbers.txt -o enriched.jsonl --full-history --analytics report.json
+    python3 filing_analytics.py enriched.jsonl
+"""
+import argparse
+import datetime
+import json
+import sys
+from array import array
+from collections import Counter
+from concurrent.futures import as_completed
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency; the array-backed fallback is used instead.
+    np = None
+
+EPOCH = datetime.date(1970, 1, 1)
+NO_DATE = -(2 ** 31)  # Date column value for filings without a (parseable) date
+
+# Company states that filings imply, in the order of their codes (0 = no change implied).
+STATUSES = ("", "trading", "dormant", "strike-off notice", "dissolved", "insolvency", "restored")
+_STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+
+def classify_status(category, description):
+    """
+    Returns the company state a filing implies ("dormant", "trading",
+    "dissolved"...), or "" if it says nothing about the company's state.
+    """
+    category = category or ""
+    description = description or ""
+    if category == "accounts":
+        return "dormant" if "dormant" in description else "trading"
+    if category == "gazette" or description.startswith("gazette"):
+        return "dissolved" if "dissolved" in description else "strike-off notice"
+    if category in ("insolvency", "liquidation") or description.startswith(("liquidation", "administration")):
+        return "insolvency"
+    if category == "restoration" or description.startswith("restoration"):
+        return "restored"
+    return ""
+
+
+def to_days(date_string):
+    """Converts a YYYY-MM-DD date to days since 1970-01-01 (NO_DATE if missing or invalid)."""
+    try:
+        return (datetime.date.fromisoformat(date_string) - EPOCH).days
+    except (TypeError, ValueError):
+        return NO_DATE
+
+
+def from_days(days):
+    """Converts days since 1970-01-01 back to a YYYY-MM-DD string (None for NO_DATE)."""
+    if days == NO_DATE:
+        return None
+    return (EPOCH + datetime.timedelta(days=int(days))).isoformat()
+
+
+class Vocabulary:
+    """
+    Two-way mapping between strings and dense integer codes for one column.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class FilingTable:
+    """
+    Filing histories of many companies held as parallel integer columns.
+
+    Rows are appended with extend() (or load() straight from the API) and are
+    never modified, so NumPy views of the columns are built once per query
+    without copying.
+    """
+
+    def __init__(self):
+        self.companies = Vocabulary()
+        self.types = Vocabulary()
+        self.categories = Vocabulary()
+        self.descriptions = Vocabulary()
+        self.company = array('i')
+        self.date = array('i')
+        self.type = array('i')
+        self.category = array('i')
+        self.description = array('i')
+        self._years = {}  # days -> year, for the pure-Python path
+
+    def __len__(self):
+        return len(self.date)
+
+    @property
+    def backend(self):
+        return "numpy" if np is not None else "array"
+
+    def add_company(self, company_number):
+        """Registers a company, so it is reported even if it has no filings."""
+        return self.companies.code(company_number)
+
+    def extend(self, company_number, items):
+        """
+        Appends a company's filing history items (JSON dicts or records.FilingItem).
+
+        Returns:
+            int: The number of filings added.
+        """
+        company = self.add_company(company_number)
+        added = 0
+        for item in items:
+            self.company.append(company)
+            self.date.append(to_days(item.get('date')))
+            self.type.append(self.types.code(item.get('type') or ""))
+            self.category.append(self.categories.code(item.get('category') or ""))
+            self.description.append(self.descriptions.code(item.get('description') or ""))
+            added += 1
+        return added
+
+    @classmethod
+    def load(cls, client, company_numbers):
+        """
+        Builds a table from the complete filing histories of `company_numbers`,
+        fetching the companies in parallel on the client's worker pool.
+        """
+        # Pages aren't prefetched: the prefetch would queue on the same pool the
+        # companies are already occupying, and could wait behind them forever.
+        table = cls()
+
+        def fetch(number):
+            return list(client.iter_filing_history(number))
+
+        futures = {client.executor.submit(fetch, number): number for number in company_numbers}
+        for future in as_completed(futures):
+            try:
+                items = future.result()
+            except Exception:
+                items = []
+            table.extend(futures[future], items)
+        return table
+
+    @classmethod
+    def from_bundles(cls, bundles):
+        """Builds a table from company bundles, e.g. batch_enrich JSON Lines output."""
+        table = cls()
+        for bundle in bundles:
+            table.extend(bundle["company_number"], (bundle.get('filing_history') or {}).get('items') or [])
+        return table
+
+    # --- column access ---
+
+    def _columns(self, *names):
+        """Returns the named columns as NumPy arrays (zero-copy views) or as the arrays themselves."""
+        if np is None:
+            return tuple(getattr(self, name) for name in names)
+        return tuple(np.frombuffer(getattr(self, name), dtype=np.int32) if len(self) else np.zeros(0, np.int32)
+                     for name in names)
+
+    def _years_of(self, dates):
+        if np is not None:
+            years = dates.astype("datetime64[D]").astype("datetime64[Y]").astype(np.int32) + 1970
+            return np.where(dates == NO_DATE, 0, years)
+        years = array('i')
+        for days in dates:
+            year = self._years.get(days)
+            if year is None:
+                year = self._years[days] = 0 if days == NO_DATE else (EPOCH + datetime.timedelta(days=days)).year
+            years.append(year)
+        return years
+
+    def _window_mask(self, dates, start, end):
+        """Rows dated within [start, end] (YYYY-MM-DD strings, either may be None)."""
+        low = to_days(start) if start else NO_DATE + 1
+        high = to_days(end) if end else 2 ** 31 - 1
+        if np is not None:
+            return (dates >= low) & (dates <= high)
+        return [low <= days <= high for days in dates]
+
+    def _vocabulary(self, by):
+        if by not in ("type", "category", "description"):
+            raise ValueError(f"Can't group filings by {by!r}")
+        return {"type": self.types, "category": self.categories, "description": self.descriptions}[by]
+
+    # --- queries ---
+
+    def counts_by_year(self, by="type", start=None, end=None, company_number=None):
+        """
+        Counts filings per `by` value ("type", "category" or "description") per year.
+
+        Args:
+            by (str): Column to group by. Defaults to "type".
+            start (str, optional): Only count filings on or after this YYYY-MM-DD date.
+            end (str, optional): Only count filings on or before this YYYY-MM-DD date.
+            company_number (str, optional): Only count this company's filings.
+
+        Returns:
+            dict: Value mapped to a {year: count} dict.
+        """
+        vocabulary = self._vocabulary(by)
+        codes, dates, companies = self._columns(by, "date", "company")
+        years = self._years_of(dates)
+        mask = self._window_mask(dates, start, end)
+        company = self.companies.codes.get(company_number, -1) if company_number else None
+
+        counts = {}
+        if np is not None:
+            if company is not None:
+                mask &= companies == company
+            keys = codes[mask].astype(np.int64) * 10000 + years[mask]
+            unique, totals = np.unique(keys, return_counts=True)
+            pairs = zip((unique // 10000).tolist(), (unique % 10000).tolist(), totals.tolist())
+        else:
+            counter = Counter(
+                (code, year) for code, year, keep, row_company in zip(codes, years, mask, companies)
+                if keep and (company is None or row_company == company)
+            )
+            pairs = ((code, year, total) for (code, year), total in sorted(counter.items()))
+        for code, year, total in pairs:
+            counts.setdefault(vocabulary[code], {})[year or None] = total
+        return counts
+
+    def window_counts(self, start=None, end=None, by="type"):
+        """
+        Counts filings per `by` value within a date window.
+
+        Returns:
+            dict: Value mapped to the number of filings, most frequent first.
+        """
+        vocabulary = self._vocabulary(by)
+        codes, dates = self._columns(by, "date")
+        mask = self._window_mask(dates, start, end)
+        if np is not None:
+            totals = np.bincount(codes[mask], minlength=len(vocabulary)).tolist()
+        else:
+            totals = [0] * len(vocabulary)
+            for code, keep in zip(codes, mask):
+                if keep:
+                    totals[code] += 1
+        ranked = sorted(((total, code) for code, total in enumerate(totals) if total), reverse=True)
+        return {vocabulary[code]: total for total, code in ranked}
+
+    def latest(self, category="accounts"):
+        """
+        Returns:
+            dict: Company number mapped to the date of its latest filing in
+                  `category` (None if it has none).
+        """
+        latest = self._latest_days(category)
+        return {number: from_days(days) for number, days in zip(self.companies.values, latest)}
+
+    def _latest_days(self, category):
+        category_code = self.categories.codes.get(category, -1)
+        companies, dates, categories = self._columns("company", "date", "category")
+        if np is not None:
+            latest = np.full(len(self.companies), NO_DATE, dtype=np.int32)
+            mask = categories == category_code
+            np.maximum.at(latest, companies[mask], dates[mask])
+            return latest.tolist()
+        latest = [NO_DATE] * len(self.companies)
+        for company, days, code in zip(companies, dates, categories):
+            if code == category_code and days > latest[company]:
+                latest[company] = days
+        return latest
+
+    def overdue_accounts(self, as_of=None, max_age_days=456):
+        """
+        Finds companies whose latest accounts filing is older than
+        `max_age_days` (default 15 months: a year's accounts plus a grace
+        period), or that have filed no accounts at all. Companies whose
+        filings show them dissolved are skipped.
+
+        Args:
+            as_of (str, optional): YYYY-MM-DD date to measure from. Defaults to today.
+            max_age_days (int): Age beyond which accounts count as overdue.
+
+        Returns:
+            list: (company_number, latest accounts date or None, age in days or None)
+                  tuples, most overdue first.
+        """
+        today = to_days(as_of) if as_of else (datetime.date.today() - EPOCH).days
+        dissolved = {number for number, timeline in self.status_changes().items()
+                     if timeline and timeline[-1][1] == "dissolved"}
+        overdue = []
+        for number, days in zip(self.companies.values, self._latest_days("accounts")):
+            if number in dissolved:
+                continue
+            if days == NO_DATE:
+                overdue.append((number, None, None))
+            elif today - days > max_age_days:
+                overdue.append((number, from_days(days), today - days))
+        overdue.sort(key=lambda row: -1 if row[2] is None else -row[2])
+        return overdue
+
+    def status_changes(self, company_number=None):
+        """
+        Builds each company's status timeline from the states its filings imply
+        (see classify_status), keeping only the filings where the state changes.
+
+        Returns:
+            dict: Company number mapped to a list of (YYYY-MM-DD, status) tuples, oldest first.
+        """
+        # The state implied by each (category, description) pair, indexed by
+        # category * len(descriptions) + description.
+        width = len(self.descriptions)
+        status_of = array('b', (_STATUS_CODES[classify_status(category, description)]
+                                for category in self.categories.values for description in self.descriptions.values))
+        companies, dates, categories, descriptions = self._columns("company", "date", "category", "description")
+        only = self.companies.codes.get(company_number, -1) if company_number else None
+
+        if np is not None:
+            lookup = np.frombuffer(status_of, dtype=np.int8) if len(status_of) else np.zeros(1, np.int8)
+            states = lookup[categories * width + descriptions]
+            mask = (states > 0) & (dates != NO_DATE)
+            if only is not None:
+                mask &= companies == only
+            c, d, s = companies[mask], dates[mask], states[mask]
+            order = np.lexsort((d, c))
+            c, d, s = c[order], d[order], s[order]
+            keep = np.ones(len(c), dtype=bool)
+            keep[1:] = (c[1:] != c[:-1]) | (s[1:] != s[:-1])
+            rows = zip(c[keep].tolist(), d[keep].tolist(), s[keep].tolist())
+        else:
+            rows = []
+            previous = (None, None)
+            states = (status_of[category * width + description] for category, description in zip(categories, descriptions))
+            for company, days, state in sorted(
+                    (company, days, state) for company, days, state in zip(companies, dates, states)
+                    if state and days != NO_DATE and (only is None or company == only)):
+                if (company, state) != previous:
+                    rows.append((company, days, state))
+                previous = (company, state)
+
+        timelines = {}
+        for company, days, state in rows:
+            timelines.setdefault(self.companies[company], []).append((from_days(days), STATUSES[state]))
+        return timelines
+
+    def summary(self, as_of=None, max_age_days=456):
+        """
+        Returns:
+            dict: A JSON-serialisable portfolio report: filings per type and per
+                  category per year, overdue accounts and status timelines.
+        """
+        return {
+            "backend": self.backend,
+            "companies": len(self.companies),
+            "filings": len(self),
+            "filings_by_type_year": self.counts_by_year("type"),
+            "filings_by_category_year": self.counts_by_year("category"),
+            "overdue_accounts": [
+                {"company_number": number, "latest_accounts": latest, "days_since": age}
+                for number, latest, age in self.overdue_accounts(as_of, max_age_days)
+            ],
+            "status_changes": {
+                number: [{"date": date, "status": status} for date, status in timeline]
+                for number, timeline in self.status_changes().items()
+            },
+        }
+
+
+def format_filing_summary(table, company_number, as_of=None, max_years=12):
+    """
+    Builds the Filing Summary tab lines for one company: latest accounts and
+    whether they are overdue, the status timeline, and filings per category per
+    year as a small table.
+    """
+    if company_number not in table.companies.codes:
+        return ["No filing history found."]
+    counts = table.counts_by_year("category", company_number=company_number)
+    total = sum(sum(years.values()) for years in counts.values())
+    if not total:
+        return ["No filing history found."]
+
+    latest = table.latest("accounts").get(company_number)
+    overdue = {number for number, _, _ in table.overdue_accounts(as_of)}
+    lines = [f"Filings:        {total}"]
+    if latest:
+        lines.append(f"Last accounts:  {latest}" + ("   *** OVERDUE ***" if company_number in overdue else ""))
+    else:
+        lines.append("Last accounts:  none filed" + ("   *** OVERDUE ***" if company_number in overdue else ""))
+
+    lines += ["", "Status timeline:"]
+    timeline = table.status_changes(company_number).get(company_number, [])
+    lines += [f"  {date}  {status}" for date, status in timeline] or ["  No status changes in the filings."]
+
+    years = sorted({year for per_year in counts.values() for year in per_year if year}, reverse=True)[:max_years]
+    categories = sorted(counts, key=lambda category: -sum(counts[category].values()))
+    lines += ["", "Filings per year:", "  Year  " + "".join(f"{category[:12]:>13}" for category in categories)]
+    for year in years:
+        lines.append(f"  {year}  " + "".join(f"{counts[category].get(year, 0) or '.':>13}" for category in categories))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Filing-history analytics over batch_enrich JSON Lines output.")
+    parser.add_argument("input", help="batch_enrich .jsonl output ('-' for stdin).")
+    parser.add_argument("--as-of", help="Date to measure overdue accounts from (YYYY-MM-DD). Defaults to today.")
+    parser.add_argument("--max-age-days", type=int, default=456, help="Accounts older than this are overdue. Defaults to 456.")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    try:
+        table = FilingTable.from_bundles(json.loads(line) for line in source if line.strip())
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    json.dump(table.summary(args.as_of, args.max_age_days), sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+In-memory fuzzy name matching for lists the TUI already holds.
+
+FuzzyIndex keeps a trigram posting list per normalised name (normalised as
+in the offline CompanyIndex, so a trailing LTD or LIMITED, '&' and AND,
+punctuation and accents don't matter). A query is answered by
+counting shared trigrams over the posting lists of its own trigrams, which
+touches only entries that share something with it, so filtering tens of
+thousands of names on every keystroke stays well under a frame.
+
+Matches are ranked: names starting with the query first, then names where
+every query word starts a word, then the rest by trigram similarity, which
+also catches misspellings ("tesko" finds TESCO).
+"""
+from array import array
+from collections import Counter
+from itertools import chain
+
+from company_index import normalise_name
+
+# Share of a query's trigrams a name needs before it counts as a fuzzy match.
+MIN_SIMILARITY = 0.5
+
+
+def trigrams(key):
+    """
+    Returns the set of trigrams of a normalised key, padded like
+    company_index.trigrams but kept as strings, which is cheaper for an
+    in-memory index.
+    """
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIndex:
+    """
+    Trigram index over names, each carrying an arbitrary value.
+    """
+
+    def __init__(self, entries=None):
+        """
+        Args:
+            entries (iterable, optional): (name, value) pairs to index.
+        """
+        self.names = []
+        self.values = []
+        self._keys = []
+        self._sizes = array("H")
+        self._postings = {}
+        self._positions = {}  # identity -> position, for entries added with one
+        if entries is not None:
+            for name, value in entries:
+                self.add(name, value)
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, name, value=None, identity=None):
+        """
+        Indexes `name` with `value`.
+
+        Args:
+            name (str): The name to match against.
+            value: What search() returns for the entry. Defaults to the name.
+            identity (hashable, optional): Identifies the entity, e.g. a company
+                                           number. Adding it again only replaces
+                                           the stored value.
+
+        Returns:
+            int: The entry's position.
+        """
+        if identity is not None:
+            position = self._positions.get(identity)
+            if position is not None:
+                self.values[position] = name if value is None else value
+                return position
+        key = normalise_name(name)
+        codes = trigrams(key) if key else ()
+        position = len(self.values)
+        self.names.append(name)
+        self.values.append(name if value is None else value)
+        self._keys.append(" " + key)  # Leading space: " " + word finds word starts
+        self._sizes.append(min(len(codes), 0xFFFF))
+        for code in codes:
+            postings = self._postings.get(code)
+            if postings is None:
+                postings = self._postings[code] = array("I")
+            postings.append(position)
+        if identity is not None:
+            self._positions[identity] = position
+        return position
+
+    def positions(self, query, limit=None):
+        """
+        Returns the positions of the entries matching `query`, best first. An
+        empty query matches every entry, in the order they were added.
+        """
+        key = normalise_name(query)
+        if not key:
+            positions = range(len(self.values))
+            return list(positions if limit is None else positions[:limit])
+        if len(key) < 3:
+            # Too short to have trigrams of its own beyond the word start: scan
+            # for names with a word starting with it, names starting with it first.
+            start = " " + key
+            ranked = sorted(
+                (not entry.startswith(start), position)
+                for position, entry in enumerate(self._keys) if start in entry
+            )
+            return [position for _, position in ranked[:limit]]
+        codes = trigrams(key)
+        # Counter consumes the chained posting arrays in C.
+        shared = Counter(chain.from_iterable(self._postings.get(code, ()) for code in codes))
+        start = " " + key
+        words = [" " + word for word in key.split()]
+        needed = len(codes) * MIN_SIMILARITY
+        ranked = []
+        for position, count in shared.items():
+            if count < needed:
+                continue
+            entry = self._keys[position]
+            if entry.startswith(start):
+                rank = 0
+            elif all(word in entry for word in words):
+                rank = 1
+            else:
+                rank = 2
+            ranked.append((rank, -2.0 * count / (len(codes) + self._sizes[position]), position))
+        ranked.sort()
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [position for _, _, position in ranked]
+
+    def search(self, query, limit=None):
+        """
+        Returns the values of the entries matching `query`, best first.
+        """
+        return [self.values[position] for position in self.positions(query, limit)]
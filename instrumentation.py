@@ -0,0 +1,268 @@
+import re
+import threading
+
+# Latency histogram bucket upper bounds, in seconds. Chosen to resolve both
+# cache-speed responses and the multi-second tail of a struggling API.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Patterns that collapse concrete endpoints into templates, so that stats are
+# per endpoint type rather than per company.
+_ENDPOINT_TEMPLATES = [
+    (re.compile(r"^/company/[^/]+/filing-history/[^/]+"), "/company/{company_number}/filing-history/{transaction_id}"),
+    (re.compile(r"^/company/[^/]+/persons-with-significant-control/[^/]+/[^/]+"), "/company/{company_number}/persons-with-significant-control/{kind}/{psc_id}"),
+    (re.compile(r"^/company/[^/]+/([a-z-]+)"), r"/company/{company_number}/\1"),
+    (re.compile(r"^/company/[^/]+$"), "/company/{company_number}"),
+    (re.compile(r"^/officers/[^/]+/appointments"), "/officers/{officer_id}/appointments"),
+    (re.compile(r"^/document/[^/]+/content"), "/document/{document_id}/content"),
+    (re.compile(r"^/document/[^/]+"), "/document/{document_id}"),
+]
+
+
+def endpoint_template(endpoint):
+    """
+    Reduces an endpoint such as /company/00445790/filing-history?items_per_page=100
+    to its template, /company/{company_number}/filing-history.
+    """
+    path = endpoint.split("?", 1)[0]
+    if "://" in path:
+        path = "/" + path.split("://", 1)[1].split("/", 1)[-1]
+    for pattern, template in _ENDPOINT_TEMPLATES:
+        match = pattern.match(path)
+        if match:
+            return match.expand(template)
+    return path
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram. Percentiles are interpolated within the
+    bucket they fall into, which is accurate enough for spotting slow endpoints
+    while keeping recording O(1) and memory constant.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is the +Inf bucket
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """
+        Returns the approximate p-th percentile (0-100) in seconds, or 0 if empty.
+        """
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.max
+
+
+class EndpointStats:
+    """
+    Counters for one endpoint template.
+    """
+
+    __slots__ = ("calls", "errors", "latency", "bytes", "cache_hits", "cache_misses",
+                 "not_modified", "not_found", "retries", "rate_limited", "waits", "wait_seconds", "coalesced")
+
+    def __init__(self):
+        self.calls = 0  # HTTP requests sent, including retries
+        self.errors = 0  # Requests that ultimately failed (a 404 isn't a failure; see not_found)
+        self.latency = LatencyHistogram()
+        self.bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.not_modified = 0  # Stale cache entries revalidated with a 304
+        self.not_found = 0  # 404 responses: how the API says a company has no PSCs, charges...
+        self.retries = 0
+        self.rate_limited = 0  # 429 responses
+        self.waits = 0  # Requests held back by the rate limiter
+        self.wait_seconds = 0.0
+        self.coalesced = 0  # Calls that shared another caller's in-flight request instead of sending their own
+
+    def cache_hit_ratio(self):
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else 0.0
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "latency_p50": self.latency.percentile(50),
+            "latency_p95": self.latency.percentile(95),
+            "latency_p99": self.latency.percentile(99),
+            "latency_max": self.latency.max,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_ratio": self.cache_hit_ratio(),
+            "not_modified": self.not_modified,
+            "not_found": self.not_found,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "waits": self.waits,
+            "wait_seconds": self.wait_seconds,
+            "coalesced": self.coalesced,
+        }
+
+
+class RequestMetrics:
+    """
+    Thread-safe per-endpoint request metrics for a CompaniesHouseAPI client.
+
+    Endpoints are grouped by template (see endpoint_template). Use snapshot()
+    for a dict, to_prometheus() for the Prometheus text exposition format, or
+    format_table() for a plain-text summary.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _stats(self, endpoint):
+        template = endpoint_template(endpoint)
+        stats = self._endpoints.get(template)
+        if stats is None:
+            stats = self._endpoints[template] = EndpointStats()
+        return stats
+
+    def record_request(self, endpoint, seconds, status=None, size=0):
+        """Records one HTTP exchange (each retry attempt counts separately)."""
+        with self._lock:
+            stats = self._stats(endpoint)
+            stats.calls += 1
+            stats.latency.observe(seconds)
+            stats.bytes += size
+            if status == 304:
+                stats.not_modified += 1
+            elif status == 404:
+                stats.not_found += 1
+            elif status == 429:
+                stats.rate_limited += 1
+
+    def record_error(self, endpoint):
+        with self._lock:
+            self._stats(endpoint).errors += 1
+
+    def record_cache(self, endpoint, hit):
+        with self._lock:
+            stats = self._stats(endpoint)
+            if hit:
+                stats.cache_hits += 1
+            else:
+                stats.cache_misses += 1
+
+    def record_coalesced(self, endpoint):
+        """Records a call answered by an identical request already in flight."""
+        with self._lock:
+            self._stats(endpoint).coalesced += 1
+
+    def record_retry(self, endpoint):
+        with self._lock:
+            self._stats(endpoint).retries += 1
+
+    def record_wait(self, endpoint, seconds):
+        """Records time a request spent held back by the rate limiter or a backoff."""
+        if seconds <= 0:
+            return
+        with self._lock:
+            stats = self._stats(endpoint)
+            stats.waits += 1
+            stats.wait_seconds += seconds
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Endpoint template mapped to its counters and latency percentiles.
+        """
+        with self._lock:
+            return {template: stats.to_dict() for template, stats in sorted(self._endpoints.items())}
+
+    def totals(self):
+        """
+        Returns:
+            dict: Counters summed over all endpoints.
+        """
+        totals = {"calls": 0, "errors": 0, "bytes": 0, "cache_hits": 0, "cache_misses": 0,
+                  "not_modified": 0, "not_found": 0, "retries": 0, "rate_limited": 0, "waits": 0,
+                  "wait_seconds": 0.0, "coalesced": 0}
+        for stats in self.snapshot().values():
+            for key in totals:
+                totals[key] += stats[key]
+        return totals
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def to_prometheus(self, prefix="companies_house"):
+        """
+        Renders the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        counters = [
+            ("requests_total", "calls", "HTTP requests sent, including retries."),
+            ("errors_total", "errors", "Requests that ultimately failed."),
+            ("response_bytes_total", "bytes", "Response body bytes received."),
+            ("cache_hits_total", "cache_hits", "Responses served from the cache."),
+            ("cache_misses_total", "cache_misses", "Cache lookups that needed a request."),
+            ("not_modified_total", "not_modified", "Stale cache entries revalidated with HTTP 304."),
+            ("not_found_total", "not_found", "HTTP 404 responses (the resource doesn't exist); not counted as errors."),
+            ("retries_total", "retries", "Requests retried after a 429, 5xx or connection failure."),
+            ("rate_limited_total", "rate_limited", "HTTP 429 responses."),
+            ("rate_limit_wait_seconds_total", "wait_seconds", "Time spent waiting on the rate limiter or backoff."),
+            ("coalesced_total", "coalesced", "Calls that shared an identical request already in flight."),
+        ]
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            for name, attribute, help_text in counters:
+                lines.append(f"# HELP {prefix}_{name} {help_text}")
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for template, stats in endpoints:
+                    lines.append(f'{prefix}_{name}{{endpoint="{template}"}} {getattr(stats, attribute)}')
+
+            name = f"{prefix}_request_duration_seconds"
+            lines.append(f"# HELP {name} HTTP request latency.")
+            lines.append(f"# TYPE {name} histogram")
+            for template, stats in endpoints:
+                histogram = stats.latency
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{endpoint="{template}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{endpoint="{template}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{endpoint="{template}"}} {histogram.total}')
+                lines.append(f'{name}_count{{endpoint="{template}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def format_table(self):
+        """
+        Returns a plain-text table of per-endpoint stats, one line per endpoint.
+        """
+        lines = [f"{'Endpoint':<52} {'Calls':>6} {'Err':>4} {'p50ms':>7} {'p95ms':>7} {'p99ms':>7} {'KB':>8} {'Hit%':>5} {'Retry':>5} {'Wait s':>7} {'Shared':>6}"]
+        for template, stats in self.snapshot().items():
+            lines.append(
+                f"{template[:52]:<52} {stats['calls']:>6} {stats['errors']:>4} "
+                f"{stats['latency_p50'] * 1000:>7.0f} {stats['latency_p95'] * 1000:>7.0f} {stats['latency_p99'] * 1000:>7.0f} "
+                f"{stats['bytes'] / 1024:>8.1f} {stats['cache_hit_ratio'] * 100:>5.0f} {stats['retries']:>5} {stats['wait_seconds']:>7.1f} {stats['coalesced']:>6}"
+            )
+        return lines
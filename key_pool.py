@@ -0,0 +1,186 @@
+import os
+import re
+import threading
+import time
+
+from rate_limiter import RateLimiter
+
+
+def resolve_api_keys(api_key=None, api_keys=None):
+    """
+    Works out which API keys a client should use.
+
+    Args:
+        api_key (str, optional): A single key.
+        api_keys (list, optional): Several keys to pool.
+
+    Returns:
+        list: The keys, from `api_keys`, else `api_key`, else the
+              COMPANIES_HOUSE_API_KEYS environment variable (separated by
+              commas or whitespace), else COMPANIES_HOUSE_API_KEY.
+
+    Raises:
+        ValueError: If no key is provided or found.
+    """
+    keys = list(api_keys or ())
+    if not keys and api_key:
+        keys = [api_key]
+    if not keys:
+        keys = re.split(r"[\s,]+", os.getenv("COMPANIES_HOUSE_API_KEYS", ""))
+    if not any(keys):
+        keys = [os.getenv("COMPANIES_HOUSE_API_KEY")]
+    keys = [key for key in dict.fromkeys(keys) if key]
+    if not keys:
+        raise ValueError("API key not found. Please provide it or set the COMPANIES_HOUSE_API_KEY environment variable.")
+    return keys
+
+
+class PooledKey:
+    """
+    One API key with its own rate limiter, connection session and health.
+    """
+
+    def __init__(self, api_key, rate_limiter):
+        self.api_key = api_key
+        self.rate_limiter = rate_limiter
+        self.session = None  # Set by the client, which knows which HTTP library it uses
+        self.failures = 0  # Consecutive failed requests
+        self.sidelined_until = 0.0  # monotonic time
+        self.revoked = False  # Rejected with 401/403
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def label(self):
+        """The key with all but its last four characters masked, for logs and status output."""
+        return "..." + self.api_key[-4:]
+
+    def is_available(self, now):
+        return not self.revoked and self.sidelined_until <= now
+
+
+class KeyPool:
+    """
+    Spreads requests over several API keys, each rate limited separately.
+
+    Every request goes to the healthy key that can send soonest, and among
+    those to the one with the most quota left, so N keys give roughly N times
+    the throughput of one. A key is sidelined for a cooldown (doubling each
+    time, up to `max_cooldown`) after `failure_threshold` consecutive failed
+    requests, and for good once the API rejects it with 401 or 403. If every
+    key is sidelined, the one due back first is used anyway.
+
+    With a single key the pool behaves exactly like that key's RateLimiter.
+    """
+
+    def __init__(self, api_keys, rate_limiter=None, failure_threshold=3, cooldown=30.0, max_cooldown=600.0):
+        """
+        Args:
+            api_keys (list): The API keys.
+            rate_limiter (RateLimiter, optional): Limiter for the first key. The other
+                                                  keys get new limiters with the same
+                                                  settings. Defaults to 600 per 5 minutes.
+            failure_threshold (int): Consecutive failures before a key is sidelined.
+            cooldown (float): Seconds a key is first sidelined for.
+            max_cooldown (float): Upper bound on a key's cooldown in seconds.
+        """
+        template = rate_limiter or RateLimiter()
+        self.keys = [
+            PooledKey(key, template if i == 0 else RateLimiter(
+                limit=template.limit, window=template.window,
+                base_backoff=template.base_backoff, max_backoff=template.max_backoff,
+            ))
+            for i, key in enumerate(api_keys)
+        ]
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        self._cooldowns = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def reserve(self):
+        """
+        Picks a key for the next request and takes a token from its limiter
+        without blocking.
+
+        Returns:
+            tuple: (PooledKey, seconds to wait before sending)
+        """
+        with self._lock:
+            if len(self.keys) == 1:
+                key = self.keys[0]
+            else:
+                now = time.monotonic()
+                candidates = [key for key in self.keys if key.is_available(now)]
+                if candidates:
+                    key = min(candidates, key=lambda key: (key.rate_limiter.wait_time(), -key.rate_limiter.available()))
+                else:
+                    key = min(self.keys, key=lambda key: (key.revoked, key.sidelined_until))
+            key.requests += 1
+            return key, key.rate_limiter.reserve()
+
+    def healthy(self):
+        """Returns the number of keys not currently sidelined."""
+        now = time.monotonic()
+        return sum(1 for key in self.keys if key.is_available(now))
+
+    def record_success(self, key):
+        with self._lock:
+            key.failures = 0
+            self._cooldowns.pop(key.api_key, None)
+
+    def record_failure(self, key, status=None):
+        """
+        Counts a failed request (a connection error or a 5xx/401/403 response)
+        against `key`, sidelining it if it has failed too often.
+
+        Returns:
+            bool: True if the key was sidelined by this failure.
+        """
+        with self._lock:
+            key.errors += 1
+            if len(self.keys) == 1:
+                return False
+            if status in (401, 403):
+                key.revoked = True
+                return True
+            key.failures += 1
+            if key.failures < self.failure_threshold:
+                return False
+            cooldown = self._cooldowns.get(key.api_key, self.cooldown)
+            self._cooldowns[key.api_key] = min(self.max_cooldown, cooldown * 2)
+            key.sidelined_until = time.monotonic() + cooldown
+            key.failures = 0
+            return True
+
+    def quota_status(self):
+        """
+        Reports quota consumption across the pool.
+
+        Returns:
+            dict: With one key, its RateLimiter.quota_status(). With several, the
+                  counters summed over all keys plus a "keys" list with each key's
+                  own status and health.
+        """
+        statuses = [key.rate_limiter.quota_status() for key in self.keys]
+        if len(self.keys) == 1:
+            return statuses[0]
+        now = time.monotonic()
+        total = {
+            name: sum(status[name] for status in statuses)
+            for name in ("limit", "available", "requests", "retries", "rate_limited")
+        }
+        total["waited_seconds"] = round(sum(status["waited_seconds"] for status in statuses), 3)
+        total["healthy_keys"] = self.healthy()
+        total["keys"] = [
+            dict(status, key=key.label, errors=key.errors,
+                 state="revoked" if key.revoked else "sidelined" if not key.is_available(now) else "ok")
+            for key, status in zip(self.keys, statuses)
+        ]
+        return total
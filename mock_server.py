@@ -0,0 +1,926 @@
+"""
+Local stand-in for the Companies House API, for benchmarks and offline development.
+
+Serves deterministic synthetic data for the endpoints the client uses (company
+and officer search, profiles, filing history, PSCs, officers, charges,
+officer appointments and filing documents). Latency, page sizes, rate-limit headers and injected 429
+responses are all configurable, so client changes can be measured without
+spending real API quota.
+
+The data set can also change while it is served (see MockDataset.record_change
+and --change-rate), and the changes are published on stand-ins for the
+streaming API's /companies, /filings and /persons-with-significant-control
+streams, served from the same port.
+
+    python3 mock_server.py --port 8099 --latency 0.05 --error-rate 0.02
+    COMPANIES_HOUSE_API_URL=http://127.0.0.1:8099 COMPANIES_HOUSE_API_KEY=test python3 tui_search.py
+"""
+import argparse
+import collections
+import datetime
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+_WORDS = [
+    "ACORN", "ALPINE", "ANCHOR", "ARROW", "ATLAS", "BEACON", "BIRCH", "BRIDGE", "CASTLE", "CEDAR",
+    "CITADEL", "COBALT", "COMPASS", "CROWN", "DELTA", "EMBER", "FALCON", "FOUNDRY", "GRANITE", "HARBOUR",
+    "HAVEN", "HORIZON", "IRIS", "JUNIPER", "KESTREL", "LANTERN", "MAPLE", "MERIDIAN", "NORTHERN", "OAK",
+    "ORCHARD", "PHOENIX", "PINNACLE", "QUARRY", "RAVEN", "RIVERSIDE", "SAPPHIRE", "SUMMIT", "THISTLE", "VALLEY",
+]
+_TRADES = [
+    "CONSULTING", "HOLDINGS", "PROPERTIES", "LOGISTICS", "TECHNOLOGIES", "VENTURES", "ENGINEERING",
+    "TRADING", "CONSTRUCTION", "DESIGN", "SERVICES", "CAPITAL", "FOODS", "MEDIA", "ENERGY",
+]
+_FORENAMES = ["James", "Olivia", "Mohammed", "Amelia", "Oliver", "Isla", "George", "Ava", "Harry", "Mia",
+              "Noah", "Priya", "Jack", "Grace", "Leo", "Sophie", "Arthur", "Chloe", "Oscar", "Emily"]
+_SURNAMES = ["SMITH", "JONES", "TAYLOR", "BROWN", "WILLIAMS", "WILSON", "JOHNSON", "DAVIES", "PATEL", "ROBINSON",
+             "WRIGHT", "THOMPSON", "EVANS", "WALKER", "WHITE", "ROBERTS", "GREEN", "HALL", "KHAN", "CLARKE"]
+_TOWNS = [("London", "EC1A"), ("Manchester", "M1"), ("Leeds", "LS1"), ("Bristol", "BS1"), ("Cardiff", "CF10"),
+          ("Edinburgh", "EH1"), ("Glasgow", "G1"), ("Belfast", "BT1"), ("Birmingham", "B1"), ("Norwich", "NR1")]
+_SIC_CODES = ["62020", "68209", "70229", "41100", "47910", "56101", "69201", "82990", "96090", "43390"]
+
+# (type, category, description) of the filings a typical small company makes.
+_FILING_TYPES = [
+    ("CS01", "confirmation-statement", "confirmation-statement-with-no-updates"),
+    ("AA", "accounts", "accounts-with-accounts-type-micro-entity"),
+    ("AA", "accounts", "accounts-with-accounts-type-dormant"),
+    ("AA", "accounts", "accounts-with-accounts-type-total-exemption-full"),
+    ("AP01", "officers", "appoint-person-director-company-with-name-date"),
+    ("TM01", "officers", "termination-director-company-with-name-termination-date"),
+    ("CH01", "officers", "change-person-director-company-with-change-date"),
+    ("AD01", "address", "change-registered-office-address-company-with-date-old-address-new-address"),
+    ("SH01", "capital", "capital-allotment-shares"),
+    ("PSC01", "persons-with-significant-control", "notification-of-a-person-with-significant-control"),
+    ("MR01", "mortgage", "mortgage-create-with-deed-with-charge-number-charge-creation-date"),
+]
+# Filings that only a few companies ever make.
+_RARE_FILING_TYPES = [
+    ("GAZ1", "gazette", "gazette-notice-compulsory"),
+    ("DISS40", "gazette", "gazette-filings-brought-up-to-date"),
+    ("LIQ02", "insolvency", "liquidation-voluntary-statement-of-affairs"),
+]
+_CONTROL_BANDS = ["25-to-50-percent", "50-to-75-percent", "75-to-100-percent"]
+
+_TODAY = datetime.date(2024, 6, 1)  # Fixed so the data set is the same on every run
+
+# Streaming API paths served by the mock, mapped to the stream names used internally.
+STREAM_PATHS = {
+    "/companies": "companies",
+    "/filings": "filings",
+    "/persons-with-significant-control": "pscs",
+}
+
+
+_DOCUMENT_ID = re.compile(r"^M[NT]\d+$")
+
+
+def _rng(*key):
+    return random.Random(":".join(str(part) for part in key))
+
+
+def _days_ago(days):
+    return (_TODAY - datetime.timedelta(days=days)).isoformat()
+
+
+class MockDataset:
+    """
+    Deterministic synthetic registry of `company_count` companies and a pool of
+    officers shared between them.
+
+    Records are generated on demand from their identifiers, so the data set
+    costs no memory however large it is configured, yet the same request always
+    gets the same answer. Company officers and officer appointments are two
+    views of the same assignment, so crawling the network is consistent.
+    """
+
+    def __init__(self, company_count=100000, filings_per_company=120, officers_per_company=4,
+                 pscs_per_company=3, charges_per_company=2, search_results=60, seed=0, event_log_size=100000):
+        self.company_count = company_count
+        self.filings_per_company = filings_per_company
+        self.officers_per_company = officers_per_company
+        self.pscs_per_company = pscs_per_company
+        self.charges_per_company = charges_per_company
+        self.search_results = search_results
+        self.seed = seed
+        self.officer_pool = max(officers_per_company, company_count // 2)
+        self._officer_step = 7919  # Prime stride spreading a company's officers across the pool
+
+        # Changes made after start-up (see record_change), layered over the generated records.
+        self._lock = threading.Lock()
+        self._statuses = {}  # company index -> status
+        self._new_filings = {}  # company index -> filings, oldest first
+        self._new_pscs = {}  # company index -> PSCs notified, oldest first
+        self._ceased_pscs = {}  # company index -> {position: ceased_on}
+        self._change_count = 0
+        # Stream events as (timepoint, stream, event), oldest first; older ones are dropped.
+        self._events = collections.deque(maxlen=event_log_size)
+        self._timepoint = 0
+        self._published = threading.Condition(self._lock)
+
+    # --- identifiers ---
+
+    def company_number(self, index):
+        return f"{index:08d}"
+
+    def company_index(self, company_number):
+        """Returns the index of a company number in the data set, or None if it isn't in it."""
+        if not company_number.isdigit():
+            return None
+        index = int(company_number)
+        return index if 1 <= index <= self.company_count else None
+
+    def officer_id(self, index):
+        return f"MOCK{index:08d}"
+
+    def officer_index(self, officer_id):
+        match = re.fullmatch(r"MOCK(\d{8})", officer_id)
+        if not match:
+            return None
+        index = int(match.group(1))
+        return index if index < self.officer_pool else None
+
+    def appointments_link(self, officer_index):
+        return f"/officers/{self.officer_id(officer_index)}/appointments"
+
+    def _company_officers(self, index):
+        """Officer indices appointed to company `index`."""
+        return [(index + j * self._officer_step) % self.officer_pool for j in range(self.officers_per_company)]
+
+    def _officer_companies(self, officer_index):
+        """Company indices officer `officer_index` is appointed to, inverting _company_officers."""
+        indices = set()
+        for j in range(self.officers_per_company):
+            index = (officer_index - j * self._officer_step) % self.officer_pool
+            if index == 0:
+                index += self.officer_pool
+            while index <= self.company_count:
+                if officer_index in self._company_officers(index):
+                    indices.add(index)
+                index += self.officer_pool
+        return sorted(indices)
+
+    # --- records ---
+
+    def company_name(self, index):
+        rng = _rng(self.seed, "company", index)
+        return f"{rng.choice(_WORDS)} {rng.choice(_WORDS)} {rng.choice(_TRADES)} LIMITED"
+
+    def officer_name(self, officer_index):
+        rng = _rng(self.seed, "officer", officer_index)
+        return f"{rng.choice(_SURNAMES)}, {rng.choice(_FORENAMES)} {rng.choice(_FORENAMES)}"
+
+    def _address(self, rng):
+        town, postcode = rng.choice(_TOWNS)
+        return {
+            "address_line_1": f"{rng.randint(1, 250)} {rng.choice(_WORDS).title()} Street",
+            "locality": town,
+            "postal_code": f"{postcode} {rng.randint(1, 9)}{rng.choice('ABDEFGHJLNPQRSTUWXYZ')}{rng.choice('ABDEFGHJLNPQRSTUWXYZ')}",
+            "country": "United Kingdom",
+        }
+
+    def company_status(self, index):
+        if index in self._statuses:
+            return self._statuses[index]
+        return "dissolved" if _rng(self.seed, "status", index).random() < 0.1 else "active"
+
+    def company_profile(self, index):
+        rng = _rng(self.seed, "profile", index)
+        number = self.company_number(index)
+        created = rng.randint(400, 9000)
+        return {
+            "company_name": self.company_name(index),
+            "company_number": number,
+            "company_status": self.company_status(index),
+            "type": "ltd",
+            "jurisdiction": "england-wales",
+            "date_of_creation": _days_ago(created),
+            "registered_office_address": self._address(rng),
+            "sic_codes": rng.sample(_SIC_CODES, rng.randint(1, 2)),
+            "has_charges": self.charges_per_company > 0,
+            "accounts": {
+                "next_due": _days_ago(-rng.randint(10, 270)),
+                "last_accounts": {"made_up_to": _days_ago(rng.randint(60, 400)), "type": "micro-entity"},
+            },
+            "confirmation_statement": {"next_due": _days_ago(-rng.randint(10, 365))},
+            "links": {
+                "self": f"/company/{number}",
+                "filing_history": f"/company/{number}/filing-history",
+                "officers": f"/company/{number}/officers",
+                "persons_with_significant_control": f"/company/{number}/persons-with-significant-control",
+            },
+        }
+
+    def filing_item(self, index, position):
+        """Filing `position` of company `index`, newest first."""
+        rng = _rng(self.seed, "filing", index, position)
+        filing_type, category, description = rng.choice(_RARE_FILING_TYPES if rng.random() < 0.005 else _FILING_TYPES)
+        transaction_id = f"MT{zlib.crc32(f'{index}:{position}'.encode()):010d}"
+        number = self.company_number(index)
+        return {
+            "transaction_id": transaction_id,
+            "date": _days_ago(position * 30 + rng.randint(0, 29)),
+            "type": filing_type,
+            "category": category,
+            "description": description,
+            "pages": rng.randint(1, 30),
+            "barcode": f"X{rng.randint(1000000, 9999999)}",
+            "links": {
+                "self": f"/company/{number}/filing-history/{transaction_id}",
+                "document_metadata": f"/document/{transaction_id}",
+            },
+        }
+
+    def document(self, document_id):
+        """Bytes of a filing's document: a stand-in PDF of 20-200 KB, or None for unknown ids."""
+        if not _DOCUMENT_ID.match(document_id):
+            return None
+        rng = _rng(self.seed, "document", document_id)
+        return b"%PDF-1.4\n" + rng.randbytes(rng.randint(20, 200) * 1024) + b"\n%%EOF\n"
+
+    def document_metadata(self, document_id):
+        content = self.document(document_id)
+        if content is None:
+            return None
+        return {
+            "id": document_id,
+            "pages": len(content) // 8192 + 1,
+            "resources": {"application/pdf": {"content_length": len(content)}},
+            "links": {"self": f"/document/{document_id}", "document": f"/document/{document_id}/content"},
+        }
+
+    def psc(self, index, position):
+        new = self._new_pscs.get(index, ())
+        if position < len(new):
+            return new[-1 - position]
+        position -= len(new)
+        record = self._generated_psc(index, position)
+        ceased_on = self._ceased_pscs.get(index, {}).get(position)
+        if ceased_on:
+            record["ceased_on"] = ceased_on
+        return record
+
+    def _generated_psc(self, index, position):
+        rng = _rng(self.seed, "psc", index, position)
+        number = self.company_number(index)
+        band = rng.choice(_CONTROL_BANDS)
+        natures = [f"ownership-of-shares-{band}", f"voting-rights-{band}"]
+        if rng.random() < 0.3:
+            natures.append("right-to-appoint-and-remove-directors")
+        record = {
+            "natures_of_control": natures,
+            "notified_on": _days_ago(rng.randint(30, 3000)),
+            "address": self._address(rng),
+            "links": {"self": f"/company/{number}/persons-with-significant-control/individual/PSC{index}{position}"},
+        }
+        if rng.random() < 0.15:
+            record["ceased_on"] = _days_ago(rng.randint(0, 29))
+        if rng.random() < 0.25:
+            # A corporate PSC that is itself a company in the data set.
+            owner = rng.randint(1, self.company_count)
+            record.update({
+                "kind": "corporate-entity-person-with-significant-control",
+                "name": self.company_name(owner),
+                "identification": {
+                    "legal_form": "Private Limited Company",
+                    "registration_number": self.company_number(owner),
+                    "place_registered": "Companies House",
+                    "country_registered": "England",
+                },
+            })
+        else:
+            officer = self._company_officers(index)[position % self.officers_per_company] if self.officers_per_company else position
+            record.update({
+                "kind": "individual-person-with-significant-control",
+                "name": " ".join(self.officer_name(officer).split(", ")[::-1]).title(),
+                "nationality": "British",
+                "country_of_residence": "England",
+            })
+        return record
+
+    def company_officer(self, index, officer_index):
+        rng = _rng(self.seed, "appointment", index, officer_index)
+        item = {
+            "name": self.officer_name(officer_index),
+            "officer_role": "secretary" if rng.random() < 0.15 else "director",
+            "appointed_on": _days_ago(rng.randint(100, 5000)),
+            "nationality": "British",
+            "occupation": rng.choice(["Director", "Company Director", "Accountant", "Consultant", "Engineer"]),
+            "date_of_birth": {"month": rng.randint(1, 12), "year": rng.randint(1950, 1999)},
+            "links": {"officer": {"appointments": self.appointments_link(officer_index)}},
+        }
+        if rng.random() < 0.2:
+            item["resigned_on"] = _days_ago(rng.randint(1, 99))
+        return item
+
+    def charge(self, index, position):
+        rng = _rng(self.seed, "charge", index, position)
+        return {
+            "charge_number": position + 1,
+            "status": "outstanding" if rng.random() < 0.7 else "fully-satisfied",
+            "created_on": _days_ago(rng.randint(100, 4000)),
+            "classification": {"type": "charge-description", "description": "A registered charge"},
+            "persons_entitled": [{"name": f"{rng.choice(_WORDS)} BANK PLC"}],
+        }
+
+    # --- endpoint payloads ---
+
+    def _page(self, total, start_index, page_size, make_item, **fields):
+        items = [make_item(i) for i in range(start_index, min(total, start_index + page_size))]
+        return dict(fields, items=items, items_per_page=page_size, start_index=start_index)
+
+    def search_companies(self, query, start_index, page_size):
+        base = zlib.crc32(query.lower().encode())
+
+        def make_item(i):
+            index = (base + i * 104729) % self.company_count + 1
+            profile = self.company_profile(index)
+            address = profile["registered_office_address"]
+            return {
+                "title": profile["company_name"],
+                "company_number": profile["company_number"],
+                "company_status": profile["company_status"],
+                "company_type": profile["type"],
+                "date_of_creation": profile["date_of_creation"],
+                "address_snippet": f"{address['address_line_1']}, {address['locality']}, {address['postal_code']}",
+                "links": {"self": profile["links"]["self"]},
+            }
+
+        return self._page(self.search_results, start_index, page_size, make_item,
+                          kind="search#companies", total_results=self.search_results)
+
+    def search_officers(self, query, start_index, page_size):
+        base = zlib.crc32(query.lower().encode())
+
+        def make_item(i):
+            officer_index = (base + i * 7907) % self.officer_pool
+            rng = _rng(self.seed, "officer-details", officer_index)
+            return {
+                "title": " ".join(self.officer_name(officer_index).split(", ")[::-1]).title(),
+                "appointment_count": len(self._officer_companies(officer_index)),
+                "date_of_birth": {"month": rng.randint(1, 12), "year": rng.randint(1950, 1999)},
+                "address": self._address(rng),
+                "links": {"self": self.appointments_link(officer_index)},
+                "kind": "searchresults#officer",
+            }
+
+        return self._page(self.search_results, start_index, page_size, make_item,
+                          kind="search#officers", total_results=self.search_results)
+
+    def filing_history(self, index, start_index, page_size):
+        new = self._new_filings.get(index, ())
+        total = self.filings_per_company + len(new)
+
+        def make_item(i):
+            return new[-1 - i] if i < len(new) else self.filing_item(index, i - len(new))
+
+        return self._page(total, start_index, page_size, make_item,
+                          total_count=total, filing_history_status="filing-history-available")
+
+    def pscs(self, index, start_index, page_size):
+        total = self.pscs_per_company + len(self._new_pscs.get(index, ()))
+        return self._page(total, start_index, page_size, lambda i: self.psc(index, i), total_results=total)
+
+    # --- changes ---
+
+    def record_change(self, company_number=None, kind=None, rng=None):
+        """
+        Changes a company the way a filing at Companies House would, so clients
+        can be tested against a registry that moves: a new filing ("filing"), a
+        new or ceased PSC ("psc", with its PSC01/PSC07 filing), or a status
+        change ("status", with its gazette or liquidation filing).
+
+        Args:
+            company_number (str, optional): Company to change. Defaults to a random one.
+            kind (str, optional): "filing", "psc" or "status". Defaults to a random
+                                  kind, mostly filings.
+            rng (random.Random, optional): Source of randomness.
+
+        Returns:
+            dict: The change: "kind", "company_number" and the "filing" it added.
+        """
+        rng = rng or random
+        index = self.company_index(company_number) if company_number else rng.randint(1, self.company_count)
+        if index is None:
+            raise ValueError(f"Unknown company {company_number}")
+        kind = kind or rng.choices(("filing", "psc", "status"), weights=(80, 15, 5))[0]
+        today = datetime.date.today().isoformat()
+
+        with self._lock:
+            self._change_count += 1
+            if kind == "status":
+                status = "liquidation" if self.company_status(index) == "active" and rng.random() < 0.5 else "dissolved"
+                self._statuses[index] = status
+                filing = ("LIQ02", "insolvency", "liquidation-voluntary-statement-of-affairs") if status == "liquidation" \
+                    else ("GAZ2", "gazette", "gazette-dissolved-compulsory")
+            elif kind == "psc":
+                ceased = self._ceased_pscs.setdefault(index, {})
+                active = [position for position in range(self.pscs_per_company)
+                          if position not in ceased and "ceased_on" not in self._generated_psc(index, position)]
+                if active and rng.random() < 0.5:
+                    position = rng.choice(active)
+                    ceased[position] = today
+                    psc = dict(self._generated_psc(index, position), ceased_on=today)
+                    filing = ("PSC07", "persons-with-significant-control",
+                              "cessation-of-a-person-with-significant-control")
+                else:
+                    officer = rng.randrange(self.officer_pool)
+                    band = rng.choice(_CONTROL_BANDS)
+                    psc = {
+                        "kind": "individual-person-with-significant-control",
+                        "name": " ".join(self.officer_name(officer).split(", ")[::-1]).title(),
+                        "natures_of_control": [f"ownership-of-shares-{band}", f"voting-rights-{band}"],
+                        "notified_on": today,
+                        "nationality": "British",
+                        "country_of_residence": "England",
+                        "links": {"self": f"/company/{self.company_number(index)}/persons-with-significant-control"
+                                          f"/individual/PSCN{self._change_count}"},
+                    }
+                    self._new_pscs.setdefault(index, []).append(psc)
+                    filing = ("PSC01", "persons-with-significant-control",
+                              "notification-of-a-person-with-significant-control")
+            else:
+                filing = rng.choice(_FILING_TYPES)
+
+            filing_type, category, description = filing
+            transaction_id = f"MN{self._change_count:010d}"
+            number = self.company_number(index)
+            item = {
+                "transaction_id": transaction_id,
+                "date": today,
+                "type": filing_type,
+                "category": category,
+                "description": description,
+                "pages": rng.randint(1, 30),
+                "barcode": f"X{rng.randint(1000000, 9999999)}",
+                "links": {
+                    "self": f"/company/{number}/filing-history/{transaction_id}",
+                    "document_metadata": f"/document/{transaction_id}",
+                },
+            }
+            self._new_filings.setdefault(index, []).append(item)
+
+            self._publish("filings", "filing-history", item["links"]["self"], transaction_id, item)
+            if kind == "status":
+                self._publish("companies", "company-profile", f"/company/{number}", number, self.company_profile(index))
+            elif kind == "psc":
+                self._publish("pscs", "company-psc-individual", psc["links"]["self"],
+                              psc["links"]["self"].rsplit("/", 1)[-1], psc)
+            self._published.notify_all()
+        return {"kind": kind, "company_number": number, "filing": item}
+
+    def _publish(self, stream, resource_kind, resource_uri, resource_id, data):
+        # Called with self._lock held.
+        self._timepoint += 1
+        self._events.append((self._timepoint, stream, {
+            "resource_kind": resource_kind,
+            "resource_uri": resource_uri,
+            "resource_id": resource_id,
+            "data": data,
+            "event": {
+                "timepoint": self._timepoint,
+                "published_at": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+                "type": "changed",
+            },
+        }))
+
+    @property
+    def timepoint(self):
+        """The timepoint of the latest stream event."""
+        return self._timepoint
+
+    def stream_events(self, stream, timepoint, timeout):
+        """
+        Returns the events on `stream` at or after `timepoint`, waiting up to
+        `timeout` seconds for new events if there are none yet.
+
+        Returns:
+            tuple: (events, timepoint to ask for next)
+
+        Raises:
+            LookupError: If events from `timepoint` have already been dropped from the log.
+        """
+        with self._published:
+            if self._events and self._events[0][0] > 1 and timepoint < self._events[0][0]:
+                raise LookupError(f"Timepoint {timepoint} is no longer available")
+            if self._timepoint < timepoint:
+                self._published.wait(timeout)
+            events = [event for point, name, event in self._events if point >= timepoint and name == stream]
+            return events, max(timepoint, self._timepoint + 1)
+
+    def officers(self, index, start_index, page_size):
+        officer_indices = self._company_officers(index)
+        page = self._page(len(officer_indices), start_index, page_size,
+                          lambda i: self.company_officer(index, officer_indices[i]),
+                          total_results=len(officer_indices))
+        page["resigned_count"] = sum(1 for item in page["items"] if item.get("resigned_on"))
+        page["active_count"] = len(page["items"]) - page["resigned_count"]
+        return page
+
+    def charges(self, index, start_index, page_size):
+        return self._page(self.charges_per_company, start_index, page_size, lambda i: self.charge(index, i),
+                          total_count=self.charges_per_company)
+
+    def appointments(self, officer_index, start_index, page_size):
+        companies = self._officer_companies(officer_index)
+
+        def make_item(i):
+            index = companies[i]
+            item = self.company_officer(index, officer_index)
+            item["appointed_to"] = {
+                "company_number": self.company_number(index),
+                "company_name": self.company_name(index),
+                "company_status": self.company_status(index),
+            }
+            del item["links"]
+            return item
+
+        return self._page(len(companies), start_index, page_size, make_item,
+                          name=self.officer_name(officer_index), total_results=len(companies),
+                          kind="personal-appointment")
+
+
+class _RateLimitWindow:
+    """
+    Fixed-window request counters producing the X-Ratelimit-* headers, one
+    window per API key as on the real API.
+    """
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._windows = {}  # Authorization header -> [window start, count]
+
+    def take(self, key=None):
+        """
+        Counts one request made with `key`.
+
+        Returns:
+            tuple: (allowed, remaining, reset epoch seconds)
+        """
+        with self._lock:
+            now = time.time()
+            window = self._windows.setdefault(key, [now, 0])
+            if now - window[0] >= self.window:
+                window[0], window[1] = now, 0
+            window[1] += 1
+            remaining = max(0, self.limit - window[1])
+            return window[1] <= self.limit, remaining, window[0] + self.window
+
+    def window_header(self):
+        return f"{int(self.window // 60)}m" if self.window % 60 == 0 else f"{int(self.window)}s"
+
+
+_ROUTES = [
+    (re.compile(r"^/search/companies$"), "search_companies"),
+    (re.compile(r"^/search/officers$"), "search_officers"),
+    (re.compile(r"^/company/([^/]+)$"), "company_profile"),
+    (re.compile(r"^/company/([^/]+)/filing-history$"), "filing_history"),
+    (re.compile(r"^/company/([^/]+)/persons-with-significant-control$"), "pscs"),
+    (re.compile(r"^/company/([^/]+)/officers$"), "officers"),
+    (re.compile(r"^/company/([^/]+)/charges$"), "charges"),
+    (re.compile(r"^/officers/([^/]+)/appointments$"), "appointments"),
+    (re.compile(r"^/document/([^/]+)$"), "document_metadata"),
+]
+_DOCUMENT_CONTENT = re.compile(r"^/document/([^/]+)/content$")
+# Where document content is redirected to, like the real API's signed storage URLs. Needs no API key.
+_DOCUMENT_STORAGE = re.compile(r"^/document-storage/([^/]+)$")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+    disable_nagle_algorithm = True  # Otherwise delayed ACKs add ~40ms to every response
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        mock = self.server.mock
+        mock.count("requests")
+
+        url = urlsplit(self.path)
+        match = _DOCUMENT_STORAGE.match(url.path)
+        if match:
+            return self._document(match.group(1))
+
+        if not self.headers.get("Authorization"):
+            return self._send_json(401, {"error": "Invalid Authorization"})
+
+        if url.path in STREAM_PATHS:
+            return self._stream(STREAM_PATHS[url.path], parse_qs(url.query).get("timepoint", [None])[0])
+
+        delay = mock.sample_latency()
+        if delay:
+            time.sleep(delay)
+
+        allowed, remaining, reset = mock.rate_limit.take(self.headers.get("Authorization")) if mock.rate_limit else (True, None, None)
+        rate_headers = {}
+        if mock.rate_limit:
+            rate_headers = {
+                "X-Ratelimit-Limit": str(mock.rate_limit.limit),
+                "X-Ratelimit-Remain": str(remaining),
+                "X-Ratelimit-Reset": f"{reset:.3f}",
+                "X-Ratelimit-Window": mock.rate_limit.window_header(),
+            }
+        if not allowed:
+            mock.count("rate_limited")
+            return self._send_json(429, {"error": "Rate limit exceeded"}, rate_headers)
+        if mock.inject_429():
+            mock.count("injected_429")
+            rate_headers.update({"X-Ratelimit-Remain": "0", "X-Ratelimit-Reset": f"{time.time() + mock.retry_after:.3f}"})
+            return self._send_json(429, {"error": "Rate limit exceeded"}, rate_headers)
+
+        match = _DOCUMENT_CONTENT.match(url.path)
+        if match:
+            mock.count("documents")
+            return self._send_body(302, b"", dict(rate_headers, Location=f"/document-storage/{match.group(1)}"))
+
+        status, payload = mock.route(self.path)
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        if status != 200:
+            return self._send_body(status, body, rate_headers)
+
+        etag = f'"{zlib.crc32(body):08x}"'
+        rate_headers["ETag"] = etag
+        if self.headers.get("If-None-Match") == etag:
+            mock.count("not_modified")
+            return self._send_body(304, b"", rate_headers)
+        self._send_body(200, body, rate_headers)
+
+    def _stream(self, stream, timepoint):
+        """
+        Serves a streaming API connection: the stream's events as JSON lines
+        over a chunked response, with a blank line as a heartbeat whenever
+        there is nothing to send, until the client disconnects.
+        """
+        mock = self.server.mock
+        data = mock.dataset
+        try:
+            timepoint = data.timepoint + 1 if timepoint is None else int(timepoint)
+            data.stream_events(stream, timepoint, 0)
+        except ValueError:
+            return self._send_json(400, {"error": "Invalid timepoint"})
+        except LookupError as err:
+            return self._send_json(416, {"error": str(err)})
+
+        mock.count("streams")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.close_connection = True
+        started = time.monotonic()
+        try:
+            while not mock.stopping.is_set():
+                if mock.stream_timeout and time.monotonic() - started >= mock.stream_timeout:
+                    break  # Drop the connection, as the real service occasionally does
+                try:
+                    events, timepoint = data.stream_events(stream, timepoint, mock.heartbeat)
+                except LookupError:
+                    break
+                body = b"".join(json.dumps(event, separators=(",", ":")).encode() + b"\n" for event in events) or b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(body), body))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _document(self, document_id):
+        """
+        Serves a document's bytes in chunks, honouring a "bytes=N-" Range header.
+        """
+        content = self.server.mock.dataset.document(document_id)
+        if content is None:
+            return self._send_json(404, {"error": "Document not found"})
+        start, status = 0, 200
+        match = re.match(r"^bytes=(\d+)-$", self.headers.get("Range", ""))
+        if match:
+            start, status = int(match.group(1)), 206
+            if start >= len(content):
+                return self._send_body(416, b"", {"Content-Range": f"bytes */{len(content)}"})
+        self.send_response(status)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(content) - start))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}")
+        self.end_headers()
+        try:
+            for offset in range(start, len(content), 16384):
+                self.wfile.write(content[offset:offset + 16384])
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send_json(self, status, payload, headers=None):
+        self._send_body(status, json.dumps(payload).encode(), headers)
+
+    def _send_body(self, status, body, headers=None):
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+class MockCompaniesHouseServer:
+    """
+    Threaded HTTP server speaking enough of the Companies House API for the
+    clients in this repo. Use it as a context manager, or call start()/stop():
+
+        with MockCompaniesHouseServer(latency=0.02) as server:
+            client = CompaniesHouseAPI(api_key="test", base_url=server.url)
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, dataset=None, latency=0.0, jitter=0.5,
+                 slow_rate=0.0, slow_latency=1.0, error_rate=0.0, retry_after=0.5,
+                 rate_limit=None, window=300, max_page_size=100, seed=0, change_rate=0.0, heartbeat=5.0,
+                 stream_timeout=None):
+        """
+        Args:
+            host (str): Interface to listen on. Defaults to localhost.
+            port (int): Port to listen on. Defaults to a free port.
+            dataset (MockDataset, optional): The data to serve. Defaults to MockDataset().
+            latency (float): Mean response latency in seconds. Defaults to 0.
+            jitter (float): Latency varies uniformly by this fraction either side of the mean.
+            slow_rate (float): Fraction of responses delayed by `slow_latency` instead,
+                               to give the latency distribution a tail.
+            slow_latency (float): Latency of the slow responses, in seconds.
+            error_rate (float): Fraction of requests answered with an injected 429.
+            retry_after (float): Seconds until the reported rate-limit reset on an injected 429.
+            rate_limit (int, optional): Requests allowed per API key per window before real 429s.
+                                        Defaults to unlimited (no X-Ratelimit headers).
+            window (float): Rate-limit window in seconds. Defaults to 300.
+            max_page_size (int): Largest items_per_page honoured. Defaults to 100.
+            seed (int): Seed for latency and error injection.
+            change_rate (float): Random changes made to the data set per second
+                                 (see MockDataset.record_change). Defaults to none.
+            heartbeat (float): Seconds between heartbeats on idle stream connections.
+            stream_timeout (float, optional): Seconds after which stream connections
+                                              are dropped, to exercise reconnects.
+        """
+        self.dataset = dataset or MockDataset()
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.rate_limit = _RateLimitWindow(rate_limit, window) if rate_limit else None
+        self.max_page_size = max_page_size
+        self.change_rate = change_rate
+        self.heartbeat = heartbeat
+        self.stream_timeout = stream_timeout
+        self.stats = {"requests": 0, "rate_limited": 0, "injected_429": 0, "not_modified": 0, "streams": 0,
+                      "documents": 0}
+        self.stopping = threading.Event()
+
+        self._random = random.Random(seed)
+        self._change_random = random.Random(f"{seed}:changes")
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        """Serves requests on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-companies-house", daemon=True)
+        self._thread.start()
+        self._start_changes()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        self._start_changes()
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self.stopping.set()
+
+    def _start_changes(self):
+        if self.change_rate > 0:
+            threading.Thread(target=self._make_changes, name="mock-changes", daemon=True).start()
+
+    def _make_changes(self):
+        while not self.stopping.wait(self._change_random.expovariate(self.change_rate)):
+            self.dataset.record_change(rng=self._change_random)
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def sample_latency(self):
+        with self._lock:
+            if self.slow_rate and self._random.random() < self.slow_rate:
+                return self.slow_latency
+            if not self.latency:
+                return 0.0
+            return self.latency * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def inject_429(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def route(self, path):
+        """
+        Returns:
+            tuple: (HTTP status, JSON payload) for a request path.
+        """
+        url = urlsplit(path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            start_index = max(0, int(params.get("start_index", 0)))
+            page_size = min(self.max_page_size, max(1, int(params.get("items_per_page", 35))))
+        except ValueError:
+            return 400, {"error": "Invalid paging parameters"}
+
+        for pattern, name in _ROUTES:
+            match = pattern.match(url.path)
+            if not match:
+                continue
+            data = self.dataset
+            if name in ("search_companies", "search_officers"):
+                return 200, getattr(data, name)(params.get("q", ""), start_index, page_size)
+            if name == "appointments":
+                officer_index = data.officer_index(match.group(1))
+                if officer_index is None:
+                    break
+                return 200, data.appointments(officer_index, start_index, page_size)
+            if name == "document_metadata":
+                metadata = data.document_metadata(match.group(1))
+                if metadata is None:
+                    break
+                return 200, metadata
+            index = data.company_index(match.group(1))
+            if index is None:
+                break
+            if name == "company_profile":
+                return 200, data.company_profile(index)
+            return 200, getattr(data, name)(index, start_index, page_size)
+        return 404, {"errors": [{"error": "not-found", "type": "ch:service"}]}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Serve a local mock of the Companies House API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean response latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Latency jitter as a fraction of the mean.")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of responses that are slow.")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="Latency of slow responses in seconds.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 429.")
+    parser.add_argument("--rate-limit", type=int, help="Requests per window before 429s. Defaults to unlimited.")
+    parser.add_argument("--window", type=float, default=300, help="Rate-limit window in seconds.")
+    parser.add_argument("--companies", type=int, default=100000, help="Companies in the data set.")
+    parser.add_argument("--filings", type=int, default=120, help="Filings per company.")
+    parser.add_argument("--change-rate", type=float, default=0.0,
+                        help="Random changes (new filings, PSCs, statuses) per second, published on the streams.")
+    parser.add_argument("--heartbeat", type=float, default=5.0, help="Seconds between stream heartbeats.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    dataset = MockDataset(company_count=args.companies, filings_per_company=args.filings)
+    server = MockCompaniesHouseServer(
+        args.host, args.port, dataset, latency=args.latency, jitter=args.jitter,
+        slow_rate=args.slow_rate, slow_latency=args.slow_latency, error_rate=args.error_rate,
+        rate_limit=args.rate_limit, window=args.window, change_rate=args.change_rate, heartbeat=args.heartbeat,
+    )
+    print(f"Mock Companies House API on {server.url} (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
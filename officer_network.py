@@ -0,0 +1,355 @@
+"""
+Officer <-> company network explorer.
+
+Starting from one or more officers or companies, NetworkCrawler expands the
+appointment graph breadth-first: an officer's appointments lead to companies,
+and a company's officers lead to further officers. Each level is fetched in
+parallel on the client's worker pool, no node is ever fetched twice, and the
+crawl stops at the configured depth or request budget, whichever comes first.
+
+    python3 officer_network.py --officer /officers/abc123/appointments --depth 2 -o network.graphml
+"""
+import argparse
+import json
+import math
+import re
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from concurrent.futures import as_completed
+from itertools import islice
+
+from companies_house_api import CompaniesHouseAPI
+
+_OFFICER_ID = re.compile(r"/officers/([^/]+)/appointments")
+
+
+def officer_id_from_link(appointments_link):
+    """
+    Extracts the officer ID from an appointments link such as
+    /officers/{officer_id}/appointments. Returns None if it doesn't match.
+    """
+    match = _OFFICER_ID.search(appointments_link or "")
+    return match.group(1) if match else None
+
+
+def company_node(company_number):
+    return f"company:{company_number}"
+
+
+def officer_node(officer_id):
+    return f"officer:{officer_id}"
+
+
+class OfficerNetwork:
+    """
+    In-memory graph of officers and companies linked by appointments.
+
+    Nodes are keyed "company:{number}" / "officer:{id}" so each entity appears
+    once however many times it is reached; adjacency sets give constant-time
+    neighbour lookups in both directions.
+    """
+
+    def __init__(self):
+        self.nodes = {}  # node id -> attributes
+        self.adjacency = defaultdict(set)  # node id -> neighbouring node ids
+        self.edges = {}  # (officer node, company node) -> list of appointment attributes
+
+    def _add_node(self, node_id, kind, **attributes):
+        node = self.nodes.get(node_id)
+        if node is None:
+            node = self.nodes[node_id] = {"id": node_id, "kind": kind}
+        # Later sightings may carry details (e.g. a name) the first one lacked.
+        node.update({key: value for key, value in attributes.items() if value})
+        return node_id
+
+    def add_company(self, company_number, name=None, status=None):
+        return self._add_node(company_node(company_number), "company",
+                              company_number=company_number, name=name, status=status)
+
+    def add_officer(self, officer_id, name=None):
+        return self._add_node(officer_node(officer_id), "officer", officer_id=officer_id, name=name)
+
+    def add_appointment(self, officer, company, role=None, appointed_on=None, resigned_on=None):
+        """
+        Links an officer node to a company node. The same officer can hold
+        several roles in one company, so each distinct appointment is kept.
+        """
+        appointment = {"role": role, "appointed_on": appointed_on, "resigned_on": resigned_on}
+        appointments = self.edges.setdefault((officer, company), [])
+        if appointment not in appointments:
+            appointments.append(appointment)
+        self.adjacency[officer].add(company)
+        self.adjacency[company].add(officer)
+
+    def neighbours(self, node_id):
+        return self.adjacency.get(node_id, set())
+
+    def companies(self):
+        return [node for node in self.nodes.values() if node["kind"] == "company"]
+
+    def officers(self):
+        return [node for node in self.nodes.values() if node["kind"] == "officer"]
+
+    def to_json(self):
+        """
+        Returns the graph as a JSON-serialisable dict of nodes and edges.
+        """
+        return {
+            "nodes": list(self.nodes.values()),
+            "edges": [
+                dict(appointment, source=officer, target=company)
+                for (officer, company), appointments in self.edges.items()
+                for appointment in appointments
+            ],
+        }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def write_graphml(self, path):
+        """
+        Writes the graph as GraphML, readable by Gephi, yEd, networkx and friends.
+        """
+        ns = "http://graphml.graphdrawing.org/xmlns"
+        root = ET.Element("graphml", xmlns=ns)
+        node_keys = ["kind", "name", "company_number", "officer_id", "status"]
+        edge_keys = ["role", "appointed_on", "resigned_on"]
+        for key in node_keys:
+            ET.SubElement(root, "key", {"id": key, "for": "node", "attr.name": key, "attr.type": "string"})
+        for key in edge_keys:
+            ET.SubElement(root, "key", {"id": key, "for": "edge", "attr.name": key, "attr.type": "string"})
+
+        graph = ET.SubElement(root, "graph", id="officer-network", edgedefault="undirected")
+        for node_id, attributes in self.nodes.items():
+            node = ET.SubElement(graph, "node", id=node_id)
+            for key in node_keys:
+                if attributes.get(key):
+                    ET.SubElement(node, "data", key=key).text = str(attributes[key])
+        for i, ((officer, company), appointments) in enumerate(self.edges.items()):
+            for j, appointment in enumerate(appointments):
+                edge = ET.SubElement(graph, "edge", id=f"e{i}.{j}", source=officer, target=company)
+                for key in edge_keys:
+                    if appointment.get(key):
+                        ET.SubElement(edge, "data", key=key).text = str(appointment[key])
+
+        ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+
+class NetworkCrawler:
+    """
+    Breadth-first crawler that builds an OfficerNetwork.
+
+    Each level of the search is fetched in parallel on the client's worker
+    pool. Every node is fetched at most once per crawler (memoised across
+    calls to crawl()), and at most `max_requests` fetches are made in total.
+    A node with more links than one page holds has its further pages fetched
+    too, each counted against the same budget.
+    """
+
+    def __init__(self, client, max_depth=2, max_requests=200, include_resigned=True):
+        """
+        Args:
+            client (CompaniesHouseAPI): The API client to fetch with.
+            max_depth (int): Hops to expand from the seeds. Defaults to 2.
+            max_requests (int): Request budget for the crawler. Defaults to 200.
+            include_resigned (bool): Follow resigned appointments too. Defaults to True.
+        """
+        self.client = client
+        self.max_depth = max_depth
+        self.max_requests = max_requests
+        self.include_resigned = include_resigned
+        self.network = OfficerNetwork()
+        self.requests_made = 0
+        self.truncated = False  # True if the budget ran out before the crawl finished
+        self._budget_lock = threading.Lock()  # Further pages are counted from worker threads
+        self._fetched = set()
+        self._appointment_links = {}  # officer node -> appointments link
+
+    def _fetch(self, node_id):
+        """
+        Runs on a worker thread: fetches the raw response for one node and the
+        items of all its pages, as far as the budget allows.
+
+        Returns:
+            tuple: (first page's response, list of items)
+        """
+        if node_id.startswith("officer:"):
+            link = self._appointment_links[node_id]
+            response = self.client.get_officer_appointments(link)
+            page_size = 50
+            rest = lambda start_index: self.client.iter_officer_appointments(link, page_size, start_index=start_index)
+        else:
+            number = self.network.nodes[node_id]["company_number"]
+            response = self.client.get_company_officers(number)
+            page_size = 100
+            rest = lambda start_index: self.client.iter_company_officers(number, page_size, start_index=start_index)
+        items = list((response or {}).get("items") or [])
+        total = (response or {}).get("total_results") or 0
+        if items and total > len(items):
+            pages = self._reserve(math.ceil((total - len(items)) / page_size))
+            items += islice(rest(len(items)), pages * page_size)
+        return response, items
+
+    def _reserve(self, pages):
+        """Takes up to `pages` requests from the budget and returns how many it got."""
+        with self._budget_lock:
+            granted = max(0, min(pages, self.max_requests - self.requests_made))
+            self.requests_made += granted
+            if granted < pages:
+                self.truncated = True
+            return granted
+
+    def _apply_officer(self, node_id, response, items):
+        if not response:
+            return []
+        if response.get("name"):
+            self.network.add_officer(officer_id_from_link(self._appointment_links[node_id]), response["name"])
+
+        discovered = []
+        for appointment in items:
+            if appointment.get("resigned_on") and not self.include_resigned:
+                continue
+            appointed_to = appointment.get("appointed_to", {})
+            number = appointed_to.get("company_number")
+            if not number:
+                continue
+            company = self.network.add_company(number, appointed_to.get("company_name"), appointed_to.get("company_status"))
+            self.network.add_appointment(node_id, company, appointment.get("officer_role"),
+                                         appointment.get("appointed_on"), appointment.get("resigned_on"))
+            discovered.append(company)
+        return discovered
+
+    def _apply_company(self, node_id, response, items):
+        if not response:
+            return []
+
+        discovered = []
+        for officer in items:
+            if officer.get("resigned_on") and not self.include_resigned:
+                continue
+            link = officer.get("links", {}).get("officer", {}).get("appointments")
+            officer_id = officer_id_from_link(link)
+            if not officer_id:
+                continue
+            node = self.network.add_officer(officer_id, officer.get("name"))
+            self._appointment_links[node] = link
+            self.network.add_appointment(node, node_id, officer.get("officer_role"),
+                                         officer.get("appointed_on"), officer.get("resigned_on"))
+            discovered.append(node)
+        return discovered
+
+    def _apply(self, node_id, response, items):
+        """Adds a fetched node's neighbours to the network and returns their ids."""
+        if node_id.startswith("officer:"):
+            return self._apply_officer(node_id, response, items)
+        return self._apply_company(node_id, response, items)
+
+    def add_officer_seed(self, appointments_link, name=None):
+        node = self.network.add_officer(officer_id_from_link(appointments_link), name)
+        self._appointment_links[node] = appointments_link
+        return node
+
+    def add_company_seed(self, company_number, name=None):
+        return self.network.add_company(company_number, name)
+
+    def crawl(self, seeds):
+        """
+        Expands the network from `seeds` (node ids from add_officer_seed /
+        add_company_seed) up to max_depth hops.
+
+        Returns:
+            OfficerNetwork: The network built so far.
+        """
+        frontier = [seed for seed in seeds if seed not in self._fetched]
+        for _ in range(self.max_depth):
+            if not frontier:
+                break
+            frontier = frontier[:self._reserve(len(frontier))]
+            if not frontier:
+                break
+
+            self._fetched.update(frontier)
+            futures = {self.client.executor.submit(self._fetch, node): node for node in frontier}
+
+            # Responses are merged into the graph on this thread, so the graph
+            # itself never needs locking.
+            next_frontier = []
+            for future in as_completed(futures):
+                try:
+                    discovered = self._apply(futures[future], *future.result())
+                except Exception:
+                    continue  # One failed node shouldn't abort the crawl
+                next_frontier.extend(node for node in discovered if node not in self._fetched)
+            frontier = list(dict.fromkeys(next_frontier))  # De-duplicate, keeping discovery order
+        return self.network
+
+
+def format_network(network, root, truncated=False):
+    """
+    Builds the Network tab lines: the companies around `root` and, for each,
+    the other officers connected to it, with officers who sit on more than
+    one of those companies called out.
+    """
+    if root not in network.nodes:
+        return ["No network data found."]
+    companies = sorted(network.neighbours(root), key=lambda node: network.nodes[node].get("name", ""))
+    officers = [node for node in network.nodes if node.startswith("officer:") and node != root]
+    lines = [
+        f"{len(companies)} companies, {len(officers)} connected officers, {len(network.nodes)} nodes in total",
+    ]
+    if truncated:
+        lines.append("(Request budget reached - network is incomplete)")
+    lines.append("")
+
+    for company in companies:
+        attributes = network.nodes[company]
+        lines.append(f"{attributes.get('name', 'N/A')} ({attributes.get('company_number')})")
+        for officer in sorted(network.neighbours(company) - {root}, key=lambda node: network.nodes[node].get("name", "")):
+            shared = len(network.neighbours(officer) & set(companies))
+            note = f"  [also in {shared - 1} other]" if shared > 1 else ""
+            roles = ", ".join(sorted({a["role"] or "?" for a in network.edges.get((officer, company), [])}))
+            lines.append(f"  - {network.nodes[officer].get('name', 'N/A')} ({roles}){note}")
+        lines.append("")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl the officer/company network around officers or companies.")
+    parser.add_argument("--officer", action="append", default=[], help="Officer appointments link (repeatable).")
+    parser.add_argument("--company", action="append", default=[], help="Company number (repeatable).")
+    parser.add_argument("--depth", type=int, default=2, help="Hops to expand. Defaults to 2.")
+    parser.add_argument("--max-requests", type=int, default=200, help="Request budget. Defaults to 200.")
+    parser.add_argument("--active-only", action="store_true", help="Don't follow resigned appointments.")
+    parser.add_argument("-o", "--output", required=True, help="Output file (.graphml or .json).")
+    args = parser.parse_args(argv)
+
+    if not args.officer and not args.company:
+        parser.error("give at least one --officer or --company")
+
+    try:
+        client = CompaniesHouseAPI()
+    except ValueError as e:
+        print(f"API Key Error: {e}", file=sys.stderr)
+        return 2
+    try:
+        crawler = NetworkCrawler(client, args.depth, args.max_requests, include_resigned=not args.active_only)
+        seeds = [crawler.add_officer_seed(link) for link in args.officer]
+        seeds += [crawler.add_company_seed(number) for number in args.company]
+        network = crawler.crawl(seeds)
+    finally:
+        client.close()
+
+    if args.output.endswith(".json"):
+        network.write_json(args.output)
+    else:
+        network.write_graphml(args.output)
+    print(f"{len(network.nodes)} nodes, {len(network.edges)} links, {crawler.requests_made} requests"
+          f"{' (budget reached)' if crawler.truncated else ''} -> {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
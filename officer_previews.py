@@ -0,0 +1,193 @@
+"""
+Appointment previews and likely duplicates for officer search results.
+
+An officer search result only gives a name and an appointment count, so telling
+one "John Smith" from another means opening each in turn. AppointmentPreviews
+fetches the appointment list of every officer in a result set at once, on the
+client's worker pool and through its rate limiter, and summarises each as it
+arrives: active directorships, the most recently joined company and how many
+appointments were resigned. These are the same requests (and cache entries)
+opening an officer makes, so the officer opens instantly afterwards.
+
+Companies House often holds several officer records for one person.
+group_duplicates() puts records with the same name and either the same date of
+birth or the same address together.
+"""
+import logging
+import threading
+
+from company_index import normalise_name
+
+logger = logging.getLogger(__name__)
+
+# Dropped from names before comparing them.
+_HONORIFICS = {"MR", "MRS", "MS", "MISS", "DR", "SIR", "DAME", "LORD", "LADY", "PROF", "REV"}
+
+
+def name_key(name):
+    """
+    Returns a key under which differently written forms of an officer's name
+    ("SMITH, John" and "Mr John Smith") agree.
+    """
+    return " ".join(sorted(word for word in normalise_name(name, drop_suffix=False).split()
+                           if word not in _HONORIFICS))
+
+
+def birth_key(officer):
+    """(year, month) of an officer's date of birth, or None if it isn't given."""
+    dob = officer.get('date_of_birth') or {}
+    return (dob.get('year'), dob.get('month')) if dob.get('year') else None
+
+
+def address_key(officer):
+    """Postcode and first address line of an officer's address, or None if there is no postcode."""
+    address = officer.get('address') or {}
+    postcode = "".join((address.get('postal_code') or "").upper().split())
+    if not postcode:
+        return None
+    return postcode, normalise_name(address.get('address_line_1') or address.get('premises'), drop_suffix=False)
+
+
+def group_duplicates(officers):
+    """
+    Groups officer search results that are likely the same person: the same
+    name and either the same month and year of birth or the same address.
+
+    Args:
+        officers (list): Officer search result items.
+
+    Returns:
+        list: Lists of positions in `officers`, one per group, in order of each
+              group's first appearance; positions within a group keep their order.
+    """
+    parent = list(range(len(officers)))
+
+    def find(position):
+        while parent[position] != position:
+            parent[position] = parent[parent[position]]
+            position = parent[position]
+        return position
+
+    first_seen = {}  # (name, birth or address) -> first position with it
+    for position, officer in enumerate(officers):
+        name = name_key(officer.get('title'))
+        if not name:
+            continue
+        for key in (("birth", birth_key(officer)), ("address", address_key(officer))):
+            if key[1] is None:
+                continue
+            other = first_seen.setdefault((name,) + key, position)
+            if other != position:
+                root, other_root = find(position), find(other)
+                parent[max(root, other_root)] = min(root, other_root)
+
+    groups = {}
+    for position in range(len(officers)):
+        groups.setdefault(find(position), []).append(position)
+    return list(groups.values())
+
+
+def summarise_appointments(appointments):
+    """
+    Summarises an officer's appointment list (one page of it, as returned by
+    get_officer_appointments).
+
+    Returns:
+        dict: `active_directorships`, `resigned`, `latest_company` and
+              `latest_appointed_on` (the company joined most recently) and
+              `complete` (False if the officer has more appointments than the page holds).
+    """
+    items = list((appointments or {}).get('items') or [])
+    active = resigned = 0
+    latest = None
+    for item in items:
+        if item.get('resigned_on'):
+            resigned += 1
+        elif "director" in (item.get('officer_role') or ""):
+            active += 1
+        if item.get('appointed_on') and (latest is None or item.get('appointed_on') > latest.get('appointed_on')):
+            latest = item
+    total = (appointments or {}).get('total_results') or len(items)
+    return {
+        "active_directorships": active,
+        "resigned": resigned,
+        "latest_company": (latest.get('appointed_to') or {}).get('company_name') if latest else None,
+        "latest_appointed_on": latest.get('appointed_on') if latest else None,
+        "complete": total <= len(items),
+    }
+
+
+def format_preview(preview):
+    """One line describing a preview (see summarise_appointments)."""
+    more = "" if preview["complete"] else "+"
+    parts = [f"{preview['active_directorships']}{more} active directorship"
+             + ("" if preview['active_directorships'] == 1 else "s")]
+    if preview["latest_company"]:
+        parts.append(f"latest {preview['latest_company']} ({preview['latest_appointed_on']})")
+    parts.append(f"{preview['resigned']}{more} resigned")
+    return ", ".join(parts)
+
+
+class AppointmentPreviews:
+    """
+    Fetches and summarises the appointment lists of a set of officers in the
+    background. Previews can be read (and shown) while the rest are still loading.
+    """
+
+    def __init__(self, client):
+        """
+        Args:
+            client (CompaniesHouseAPI): Client whose worker pool, rate limiter and cache are used.
+        """
+        self.client = client
+        self._lock = threading.RLock()  # A fetch that already finished runs _loaded inside load()
+        self._previews = {}  # appointments link -> summary dict, or None if the fetch failed
+        self._futures = {}  # appointments link -> Future, while queued or loading
+
+    def load(self, appointments_links):
+        """Starts fetching the appointments of every link not already loaded or loading."""
+        with self._lock:
+            for link in dict.fromkeys(appointments_links):
+                if not link or link in self._previews or link in self._futures:
+                    continue
+                future = self._futures[link] = self.client.executor.submit(self.client.get_officer_appointments, link)
+                future.add_done_callback(lambda future, link=link: self._loaded(link, future))
+
+    def _loaded(self, link, future):
+        preview = None
+        if not future.cancelled():
+            try:
+                appointments = future.result()
+                preview = summarise_appointments(appointments) if appointments is not None else None
+            except Exception:
+                logger.debug("Loading the appointments of %s failed", link, exc_info=True)
+        with self._lock:
+            self._futures.pop(link, None)
+            if not future.cancelled():
+                self._previews[link] = preview
+
+    def get(self, link):
+        """The preview of `link`, or None if it is still loading or failed (see loading())."""
+        return self._previews.get(link)
+
+    def loading(self, link):
+        return link in self._futures
+
+    @property
+    def pending(self):
+        """Number of officers whose appointments are still queued or loading."""
+        return len(self._futures)
+
+    def describe(self, link):
+        """Preview text for `link`: its summary, "loading..." or "" if it failed."""
+        preview = self._previews.get(link)
+        if preview is not None:
+            return format_preview(preview)
+        return "loading..." if link in self._futures else ""
+
+    def cancel(self):
+        """Drops fetches that haven't started yet."""
+        with self._lock:
+            futures = list(self._futures.values())
+        for future in futures:
+            future.cancel()
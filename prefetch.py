@@ -0,0 +1,139 @@
+"""
+Speculative prefetching of companies the user is likely to open next.
+
+While a result list is on screen the client is otherwise idle. Prefetcher uses
+that time to fetch, in the background, what opening a company would fetch
+(its profile, PSCs and the first page of filing history) for the highlighted
+row, its neighbours and the top results, so the response cache already holds
+them when the user presses Enter.
+
+Prefetching only ever spends a share of the API quota: it pauses whenever
+fewer than (1 - budget) of the rate limiter's tokens are left, keeping the
+rest for requests the user actually asked for. Work for rows the user has
+moved away from is dropped before it is sent.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def company_fetchers(client):
+    """
+    Returns the requests opening a company in the TUI makes, as callables
+    taking a company number, in the order worth prefetching them.
+    """
+    def first_filing_page(company_number):
+        # Reads the same page (and cache entry) the Filing History tab starts with.
+        return next(iter(client.iter_filing_history(company_number)), None)
+
+    return [client.get_company_profile, first_filing_page, client.get_persons_with_significant_control]
+
+
+class Prefetcher:
+    """
+    Keeps a background queue of keys (e.g. company numbers) to warm the cache for.
+
+    Each call to prefetch() replaces the queue with a new list, most likely
+    first. Queued keys that are no longer wanted are dropped, and a key being
+    fetched that is no longer wanted stops before its next request. Keys warmed
+    in the last `rewarm_after` seconds are skipped.
+    """
+
+    def __init__(self, client, fetchers=None, budget=0.25, max_workers=2, rewarm_after=300.0):
+        """
+        Args:
+            client (CompaniesHouseAPI): Client whose cache is warmed.
+            fetchers (list, optional): Callables run for each key, in order.
+                                       Defaults to company_fetchers(client).
+            budget (float): Share of the API quota prefetching may use, from 0
+                            (disabled) to 1. Defaults to 0.25.
+            max_workers (int): Keys fetched at the same time. Defaults to 2.
+            rewarm_after (float): Seconds before a warmed key is fetched again.
+        """
+        self.client = client
+        self.fetchers = fetchers if fetchers is not None else company_fetchers(client)
+        self.budget = budget
+        self.rewarm_after = rewarm_after
+        # "unavailable" counts keys a fetch returned None for (a 404 or a failed request), so nothing was cached.
+        self.stats = {"warmed": 0, "unavailable": 0, "cancelled": 0, "over_budget": 0, "failed": 0}
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.RLock()  # Cancelling a future runs _finished on this thread
+        self._tasks = {}  # key -> (Future, Event set to stop it)
+        self._warmed = {}  # key -> monotonic time it was warmed
+
+    @property
+    def enabled(self):
+        return self.budget > 0 and self.client.cache is not None
+
+    def within_budget(self):
+        """True while more than (1 - budget) of the quota is left."""
+        quota = self.client.quota_status()
+        return quota["available"] > quota["limit"] * (1 - self.budget)
+
+    def prefetch(self, keys):
+        """
+        Makes `keys` (most likely first) the keys to warm, dropping any others.
+        """
+        if not self.enabled:
+            return
+        keys = list(dict.fromkeys(key for key in keys if key))
+        wanted = set(keys)
+        now = time.monotonic()
+        with self._lock:
+            for key, (future, stop) in list(self._tasks.items()):
+                # Queued work is always withdrawn and requeued below in the new order.
+                if key not in wanted or not future.running():
+                    del self._tasks[key]
+                    stop.set()
+                    if future.cancel() and key not in wanted:
+                        self._count("cancelled")
+            for key in keys:
+                if key in self._tasks or now - self._warmed.get(key, -self.rewarm_after) < self.rewarm_after:
+                    continue
+                stop = threading.Event()
+                future = self._executor.submit(self._warm, key, stop)
+                self._tasks[key] = (future, stop)
+                future.add_done_callback(lambda future, key=key: self._finished(key, future))
+
+    def cancel(self):
+        """Drops all queued work and stops keys being fetched at their next request."""
+        self.prefetch([])
+
+    def close(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finished(self, key, future):
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None and task[0] is future:
+                del self._tasks[key]
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _warm(self, key, stop):
+        complete = True
+        try:
+            for fetch in self.fetchers:
+                if stop.is_set():
+                    self._count("cancelled")
+                    return
+                if not self.within_budget():
+                    self._count("over_budget")
+                    return
+                if fetch(key) is None:
+                    complete = False
+        except Exception:
+            logger.debug("Prefetching %s failed", key, exc_info=True)
+            self._count("failed")
+            return
+        with self._lock:
+            # Not retried before rewarm_after either way, so a missing section doesn't cost a request per keypress.
+            self._warmed[key] = time.monotonic()
+            self.stats["warmed" if complete else "unavailable"] += 1
@@ -0,0 +1,402 @@
+"""
+Bulk PSC (person with significant control) analysis and beneficial-ownership rollup.
+
+PSCTable holds the PSCs of many companies in columnar form. Each distinct
+natures_of_control string is interned once into an integer code whose voting
+and share ranges are parsed a single time. Voting and share ranges for every
+PSC are then computed in one pass over the codes, with NumPy when it is
+installed.
+
+OwnershipResolver follows corporate PSCs ("relevant legal entities") that
+are themselves UK companies up the chain. It fetches their PSCs level by level
+in parallel, and multiplies the holdings along each path to get each company's
+ultimate beneficial owners. Rollups are memoised per company, so a parent
+shared by many companies in a portfolio is only resolved once.
+
+    python3 psc_engine.py 00445790 SC123456
+"""
+import argparse
+import json
+import re
+import sys
+import threading
+from array import array
+from concurrent.futures import as_completed
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency; the array-backed fallback is used instead.
+    np = None
+
+# Percentage bands as they appear in natures_of_control strings.
+CONTROL_RANGES = {
+    "75-to-100-percent": (75, 100),
+    "50-to-75-percent": (50, 75),
+    "25-to-50-percent": (25, 50),
+    "10-to-25-percent": (10, 25),
+}
+
+CORPORATE_KINDS = ("corporate-entity-person-with-significant-control",
+                   "corporate-entity-beneficial-owner")
+
+# Places of registration that mean a corporate PSC is on the UK register.
+_UK_REGISTERS = re.compile(r"companies house|england|wales|scotland|northern ireland|united kingdom|\buk\b", re.I)
+_COMPANY_NUMBER = re.compile(r"^(?:[A-Z]{2}\d{6}|\d{8})$")
+
+
+def parse_nature(nature):
+    """
+    Parses one natures_of_control string.
+
+    Returns:
+        tuple: (voting_lower, voting_upper, shares_lower, shares_upper, appoints_directors)
+    """
+    voting = shares = (0, 0)
+    for phrase, (lower, upper) in CONTROL_RANGES.items():
+        if phrase in nature:
+            if "voting-rights" in nature:
+                voting = (max(voting[0], lower), max(voting[1], upper))
+            elif "ownership-of-shares" in nature:
+                shares = (max(shares[0], lower), max(shares[1], upper))
+    return voting + shares + (int("right-to-appoint-and-remove" in nature),)
+
+
+class NatureCodes:
+    """
+    Interns natures_of_control strings into integer codes, with each code's
+    parsed ranges held in parallel arrays indexed by code.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+        self.voting_lower = array('b')
+        self.voting_upper = array('b')
+        self.shares_lower = array('b')
+        self.shares_upper = array('b')
+        self.appoints = array('b')
+        self._lock = threading.Lock()
+
+    def code(self, nature):
+        code = self.codes.get(nature)
+        if code is None:
+            with self._lock:  # New codes must be appended to every column together
+                code = self.codes.get(nature)
+                if code is None:
+                    voting_lower, voting_upper, shares_lower, shares_upper, appoints = parse_nature(nature)
+                    self.voting_lower.append(voting_lower)
+                    self.voting_upper.append(voting_upper)
+                    self.shares_lower.append(shares_lower)
+                    self.shares_upper.append(shares_upper)
+                    self.appoints.append(appoints)
+                    self.values.append(sys.intern(nature))
+                    code = self.codes[nature] = len(self.values) - 1
+        return code
+
+    def ranges(self, natures):
+        """
+        Returns ((voting_lower, voting_upper), (shares_lower, shares_upper)) for
+        one PSC's natures, the widest band of each kind winning.
+        """
+        voting_lower = voting_upper = shares_lower = shares_upper = 0
+        for nature in natures:
+            code = self.code(nature)
+            voting_lower = max(voting_lower, self.voting_lower[code])
+            voting_upper = max(voting_upper, self.voting_upper[code])
+            shares_lower = max(shares_lower, self.shares_lower[code])
+            shares_upper = max(shares_upper, self.shares_upper[code])
+        return (voting_lower, voting_upper), (shares_lower, shares_upper)
+
+
+# Shared by everything in the process, so each nature string is parsed only once.
+NATURES = NatureCodes()
+
+
+def normalise_registration_number(psc):
+    """
+    Returns the UK company number of a corporate PSC, or None if it isn't a
+    company on the UK register (or its registration number is unusable).
+    """
+    identification = psc.get('identification') or {}
+    number = psc.get('registration_number') or identification.get('registration_number')
+    if not number:
+        return None
+    place = " ".join(filter(None, (identification.get('place_registered'), identification.get('country_registered'))))
+    if place and not _UK_REGISTERS.search(place):
+        return None
+    number = re.sub(r"[\s.-]", "", str(number)).upper()
+    if number.isdigit():
+        number = number.zfill(8)
+    return number if _COMPANY_NUMBER.match(number) else None
+
+
+class PSCTable:
+    """
+    PSCs of many companies as parallel columns, one row per PSC.
+
+    Natures are stored CSR-style: the codes of row i are
+    nature_codes[nature_start[i]:nature_start[i + 1]].
+    """
+
+    def __init__(self, natures=NATURES):
+        self.natures = natures
+        self.companies = {}  # company number -> list of row indices
+        self.company = []
+        self.name = []
+        self.kind = []
+        self.parent = []  # UK company number of a corporate PSC, else None
+        self.active = array('b')
+        self.nature_start = array('i', [0])
+        self.nature_codes = array('i')
+
+    def __len__(self):
+        return len(self.active)
+
+    def __contains__(self, company_number):
+        return company_number in self.companies
+
+    def extend(self, company_number, pscs):
+        """
+        Adds a company's PSCs (JSON dicts or records.PSC items, or a PSC list
+        response). A company with no PSCs is still recorded as seen.
+        """
+        if pscs is not None and not isinstance(pscs, (list, tuple)):
+            pscs = pscs.get('items')
+        rows = self.companies.setdefault(company_number, [])
+        for psc in pscs or ():
+            rows.append(len(self.active))
+            self.company.append(company_number)
+            self.name.append(psc.get('name') or "Unknown")
+            self.kind.append(sys.intern(psc.get('kind') or ""))
+            self.parent.append(normalise_registration_number(psc) if psc.get('kind') in CORPORATE_KINDS else None)
+            self.active.append(0 if psc.get('ceased_on') else 1)
+            self.nature_codes.extend(self.natures.code(nature) for nature in psc.get('natures_of_control') or ())
+            self.nature_start.append(len(self.nature_codes))
+
+    def ranges(self):
+        """
+        Computes voting and share ranges for every PSC at once.
+
+        Returns:
+            tuple: Four sequences indexed by row: voting_lower, voting_upper,
+                   shares_lower, shares_upper (percentages).
+        """
+        n = len(self)
+        natures = self.natures
+        if np is not None and n:
+            starts = np.frombuffer(self.nature_start, dtype=np.int32)
+            codes = np.frombuffer(self.nature_codes, dtype=np.int32) if len(self.nature_codes) else np.zeros(0, np.int32)
+            rows = np.repeat(np.arange(n), np.diff(starts))
+            results = []
+            for column in (natures.voting_lower, natures.voting_upper, natures.shares_lower, natures.shares_upper):
+                out = np.zeros(n, dtype=np.int8)
+                if len(codes):
+                    np.maximum.at(out, rows, np.frombuffer(column, dtype=np.int8)[codes])
+                results.append(out.tolist())
+            return tuple(results)
+
+        columns = (natures.voting_lower, natures.voting_upper, natures.shares_lower, natures.shares_upper)
+        results = tuple(array('b', bytes(n)) for _ in columns)
+        starts, codes = self.nature_start, self.nature_codes
+        for row in range(n):
+            for code in codes[starts[row]:starts[row + 1]]:
+                for out, column in zip(results, columns):
+                    if column[code] > out[row]:
+                        out[row] = column[code]
+        return results
+
+    def appoints_directors(self, row):
+        codes = self.nature_codes[self.nature_start[row]:self.nature_start[row + 1]]
+        return any(self.natures.appoints[code] for code in codes)
+
+
+class UltimateOwner:
+    """
+    One ultimate beneficial owner of a company, with its indirect holding
+    (the product of the holdings along the chain) as a percentage range.
+    """
+
+    __slots__ = ("name", "kind", "shares_lower", "shares_upper", "voting_lower", "voting_upper",
+                 "path", "resolved")
+
+    def __init__(self, name, kind, shares_lower, shares_upper, voting_lower, voting_upper, path, resolved=True):
+        self.name = name
+        self.kind = kind
+        self.shares_lower = shares_lower
+        self.shares_upper = shares_upper
+        self.voting_lower = voting_lower
+        self.voting_upper = voting_upper
+        self.path = path  # Company numbers from the company up to the owner's holding
+        self.resolved = resolved  # False for corporate owners the chain couldn't be followed past
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class OwnershipResolver:
+    """
+    Resolves ultimate beneficial owners by following corporate PSCs up the
+    ownership chain.
+
+    PSC lists are fetched breadth-first (one level of parents at a time, in
+    parallel on the client's worker pool), so a whole portfolio's chains cost
+    one round of requests per level rather than one per company per level.
+    """
+
+    def __init__(self, client=None, table=None, max_depth=6):
+        """
+        Args:
+            client (CompaniesHouseAPI, optional): Client used to fetch PSCs not yet
+                                                  in the table. Without one, only
+                                                  the table is used.
+            table (PSCTable, optional): PSCs already known, e.g. from a batch run.
+            max_depth (int): Maximum corporate links followed. Defaults to 6.
+        """
+        self.client = client
+        self.table = table if table is not None else PSCTable()
+        self.max_depth = max_depth
+        self._ranges = None
+        self._rollups = {}
+
+    def fetch(self, company_numbers):
+        """
+        Makes sure the PSCs of `company_numbers` and of every UK corporate PSC
+        above them (up to max_depth levels) are in the table.
+        """
+        level = list(dict.fromkeys(company_numbers))
+        seen = set(level)
+        for _ in range(self.max_depth + 1):
+            if not level:
+                break
+            missing = [number for number in level if number not in self.table]
+            if missing and self.client is not None:
+                futures = {self.client.executor.submit(self.client.get_persons_with_significant_control, number): number
+                           for number in missing}
+                for future in as_completed(futures):
+                    try:
+                        response = future.result()
+                    except Exception:
+                        response = None
+                    self.table.extend(futures[future], response)
+            parents = (self.table.parent[row] for number in level
+                       for row in self.table.companies.get(number, ()) if self.table.active[row])
+            level = [number for number in dict.fromkeys(parents) if number and number not in seen]
+            seen.update(level)
+        self._ranges = None
+
+    def ultimate_owners(self, company_number):
+        """
+        Returns a company's ultimate owners, fetching the chain first if a client
+        is configured.
+
+        Returns:
+            list: UltimateOwner objects, largest share holding first.
+        """
+        if company_number not in self.table:
+            self.fetch([company_number])
+        return self._rollup(company_number, ())[0]
+
+    def resolve_all(self, company_numbers):
+        """
+        Resolves a whole portfolio, fetching every level of every chain in bulk first.
+
+        Returns:
+            dict: Company number mapped to its list of UltimateOwner objects.
+        """
+        self.fetch(company_numbers)
+        return {number: self._rollup(number, ())[0] for number in company_numbers}
+
+    def _rollup(self, company_number, chain):
+        """
+        Returns (owners, cut): the company's ultimate owners, and whether a
+        cycle back into `chain` was cut short on the way. Results without a cut
+        don't depend on the chain, so they are memoised.
+        """
+        cached = self._rollups.get(company_number)
+        if cached is not None:
+            return cached, False
+        if self._ranges is None:
+            self._ranges = self.table.ranges()
+        voting_lower, voting_upper, shares_lower, shares_upper = self._ranges
+
+        owners = {}
+        cut = False
+        table = self.table
+        chain = chain + (company_number,)
+        for row in table.companies.get(company_number, ()):
+            if not table.active[row]:
+                continue
+            holding = (shares_lower[row], shares_upper[row], voting_lower[row], voting_upper[row])
+            parent = table.parent[row]
+            if parent in chain:
+                cut = True
+            if not parent or parent in chain or not table.companies.get(parent):
+                # An individual, or a corporate owner whose own owners aren't known.
+                self._merge(owners, UltimateOwner(table.name[row], table.kind[row], *holding, path=[company_number],
+                                                  resolved=table.kind[row] not in CORPORATE_KINDS))
+                continue
+            parent_owners, parent_cut = self._rollup(parent, chain)
+            cut = cut or parent_cut
+            for owner in parent_owners:
+                self._merge(owners, UltimateOwner(
+                    owner.name, owner.kind,
+                    holding[0] * owner.shares_lower // 100, holding[1] * owner.shares_upper // 100,
+                    holding[2] * owner.voting_lower // 100, holding[3] * owner.voting_upper // 100,
+                    path=[company_number] + owner.path, resolved=owner.resolved,
+                ))
+
+        result = sorted(owners.values(), key=lambda owner: (-owner.shares_upper, -owner.voting_upper, owner.name))
+        if not cut:
+            self._rollups[company_number] = result
+        return result, cut
+
+    @staticmethod
+    def _merge(owners, owner):
+        """Adds up an owner reached by several paths."""
+        key = (owner.name, owner.kind)
+        existing = owners.get(key)
+        if existing is None:
+            owners[key] = owner
+            return
+        existing.shares_lower = min(100, existing.shares_lower + owner.shares_lower)
+        existing.shares_upper = min(100, existing.shares_upper + owner.shares_upper)
+        existing.voting_lower = min(100, existing.voting_lower + owner.voting_lower)
+        existing.voting_upper = min(100, existing.voting_upper + owner.voting_upper)
+        existing.resolved = existing.resolved and owner.resolved
+
+
+def format_ultimate_owners(owners):
+    """Builds the Owners tab lines for a company's ultimate owners."""
+    if not owners:
+        return ["No active PSCs found, so no ultimate owners could be determined."]
+    lines = []
+    for owner in owners:
+        lines.append(f"- {owner.name}" + ("" if owner.resolved else "  (chain not followed further)"))
+        lines.append(f"  Shares:  {owner.shares_lower}-{owner.shares_upper}%   Voting: {owner.voting_lower}-{owner.voting_upper}%")
+        if len(owner.path) > 1:
+            lines.append(f"  Via:     {' -> '.join(owner.path)}")
+        lines.append("")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resolve the ultimate beneficial owners of companies.")
+    parser.add_argument("company_numbers", nargs="+", help="Company numbers to resolve.")
+    parser.add_argument("--max-depth", type=int, default=6, help="Corporate links to follow. Defaults to 6.")
+    args = parser.parse_args(argv)
+
+    from companies_house_api import CompaniesHouseAPI
+
+    client = CompaniesHouseAPI()
+    try:
+        resolver = OwnershipResolver(client, max_depth=args.max_depth)
+        results = resolver.resolve_all(args.company_numbers)
+    finally:
+        client.close()
+    json.dump({number: [owner.to_dict() for owner in owners] for number, owners in results.items()}, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+
+
+# Companies House allows 600 requests per rolling 5 minute window per API key.
+DEFAULT_LIMIT = 600
+DEFAULT_WINDOW = 5 * 60
+
+
+def _parse_window(value):
+    """
+    Parses an X-Ratelimit-Window value such as "5m" into seconds.
+    """
+    units = {"s": 1, "m": 60, "h": 3600}
+    value = value.strip()
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+class RateLimiter:
+    """
+    Token bucket that paces requests to stay within the API's rate limit.
+
+    The bucket refills continuously at `limit / window` tokens per second and is
+    corrected from the X-Ratelimit-* headers the API returns, so several
+    processes sharing a key still back off once the server reports it is
+    exhausted. Callers that arrive while the bucket is empty are handed a wait
+    time in the order they arrived, which keeps a batch job running at the
+    maximum sustainable rate instead of bursting into 429s.
+    """
+
+    def __init__(self, limit=DEFAULT_LIMIT, window=DEFAULT_WINDOW, base_backoff=1.0, max_backoff=60.0):
+        """
+        Args:
+            limit (int): Requests allowed per window. Defaults to 600.
+            window (float): Window length in seconds. Defaults to 300.
+            base_backoff (float): First retry delay in seconds, doubled on each attempt.
+            max_backoff (float): Upper bound on a single retry delay in seconds.
+        """
+        self.limit = limit
+        self.window = window
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._tokens = float(limit)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0  # monotonic time before which the server refuses requests
+
+        self.server_remaining = None
+        self.server_reset_at = None  # epoch seconds, as reported by the server
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.waited_seconds = 0.0
+
+    @property
+    def rate(self):
+        return self.limit / self.window
+
+    def _refill(self, now):
+        elapsed = now - self._updated_at
+        self._tokens = min(float(self.limit), self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def available(self):
+        """
+        Returns the number of tokens currently in the bucket.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, self._tokens)
+
+    def wait_time(self):
+        """
+        Returns how many seconds a request made now would have to wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            return max(wait, self._blocked_until - now)
+
+    def reserve(self):
+        """
+        Takes a token without blocking.
+
+        Returns:
+            float: Seconds the caller must wait before sending its request (0 if it may go now).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            self.requests += 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            wait = max(wait, self._blocked_until - now)
+            self.waited_seconds += wait
+            return wait
+
+    def acquire(self):
+        """
+        Takes a token, sleeping until the request is allowed to go out.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def update_from_headers(self, headers):
+        """
+        Reconciles the bucket with the X-Ratelimit-Limit/-Window/-Remain/-Reset
+        headers of a response.
+        """
+        try:
+            limit = headers.get("X-Ratelimit-Limit")
+            window = headers.get("X-Ratelimit-Window")
+            remain = headers.get("X-Ratelimit-Remain")
+            reset = headers.get("X-Ratelimit-Reset")
+            limit = int(limit) if limit else None
+            window = _parse_window(window) if window else None
+            remain = int(remain) if remain else None
+            reset = float(reset) if reset else None
+        except ValueError:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if limit:
+                self.limit = limit
+            if window:
+                self.window = window
+            if remain is not None:
+                self.server_remaining = remain
+                # The server's count is authoritative if it is lower than ours,
+                # e.g. when another process is using the same key.
+                self._tokens = min(self._tokens, float(remain))
+            if reset is not None:
+                self.server_reset_at = reset
+                if remain == 0:
+                    self._blocked_until = max(self._blocked_until, now + max(0.0, reset - time.time()))
+
+    def backoff_delay(self, attempt, response=None):
+        """
+        Returns how long to wait before retry number `attempt` (starting at 0).
+
+        Uses full-jitter exponential backoff, but never less than the server's
+        Retry-After or the time until its rate-limit window resets after a 429.
+        """
+        delay = random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+        with self._lock:
+            self.retries += 1
+            if response is not None and response.status_code == 429:
+                self.rate_limited += 1
+                retry_after = response.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                elif self.server_reset_at is not None:
+                    delay = max(delay, self.server_reset_at - time.time())
+                # Nothing else should go out until the window has reset either.
+                self._tokens = min(self._tokens, 0.0)
+                self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            self.waited_seconds += delay
+        return delay
+
+    def quota_status(self):
+        """
+        Reports quota consumption for this key.
+
+        Returns:
+            dict: The configured limit and window, the tokens left locally, the
+                  server's last reported remaining quota and reset time, and
+                  counters for requests made, retries, 429 responses and total
+                  seconds spent waiting.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "limit": self.limit,
+                "window_seconds": self.window,
+                "available": max(0, int(self._tokens)),
+                "server_remaining": self.server_remaining,
+                "server_reset_at": self.server_reset_at,
+                "requests": self.requests,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
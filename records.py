@@ -0,0 +1,331 @@
+"""
+Compact typed records for API responses, and the JSON codec used to decode them.
+
+The API's JSON dicts carry every field the API knows about, each in a per-object
+hash table. The record classes here keep only the fields this project reads,
+in `__slots__`, with enumerated values (statuses, types, roles, natures of
+control...) interned so thousands of records share one copy of each. A
+filing item takes about a quarter of the memory of its dict, and a company
+profile about a fifth.
+
+Records are built from the decoded JSON only when a client created with
+`records=True` returns them; the iter_* methods build them one item at a time
+as pages are consumed. They offer `get()` and `[]` for the field names they
+share with the JSON, so code written against the dicts mostly keeps working.
+
+If orjson is installed it is used to decode responses (and to serialise the
+response cache); otherwise the standard json module is.
+"""
+import json
+import sys
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, only a faster decoder.
+    orjson = None
+
+
+def loads(data):
+    """
+    Decodes a JSON document (bytes or str) with the fastest available decoder.
+
+    Raises:
+        ValueError: If the document isn't valid JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj):
+    """
+    Encodes `obj` as compact JSON text with the fastest available encoder.
+    Records are encoded as their JSON (see Record.to_json).
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), default=json_default)
+
+
+def json_default(obj):
+    """
+    `default` hook for json.dumps: encodes records and record pages in the
+    shape of the JSON they were built from.
+    """
+    if isinstance(obj, (Record, RecordPage)):
+        return obj.to_json()
+    if isinstance(obj, tuple):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _interned_tuple(values):
+    return tuple(_intern(value) for value in values or ())
+
+
+def _path(data, path):
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+class Record:
+    """
+    Base class for the typed records.
+
+    Subclasses list their fields in FIELDS as (attribute, JSON path, converter)
+    tuples; `__slots__` is derived from the attribute names.
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init__(self, **values):
+        for name, _, _ in self.FIELDS:
+            setattr(self, name, values.get(name))
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Builds a record from a decoded API object. Returns None for None, and
+        passes existing records through unchanged.
+        """
+        if data is None or isinstance(data, cls):
+            return data
+        record = cls.__new__(cls)
+        for name, path, convert in cls.FIELDS:
+            value = _path(data, path)
+            if value is not None and convert is not None:
+                value = convert(value)
+            setattr(record, name, value)
+        return record
+
+    def get(self, key, default=None):
+        """dict-style access to a field, returning `default` if it is missing or None."""
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def to_dict(self):
+        """Returns the record's non-empty fields as a plain dict (nested records included)."""
+        result = {}
+        for name, _, _ in self.FIELDS:
+            value = getattr(self, name)
+            if isinstance(value, Record):
+                value = value.to_dict()
+            elif isinstance(value, tuple):
+                value = list(value)
+            if value is not None:
+                result[name] = value
+        return result
+
+    def to_json(self):
+        """
+        Returns the record as the API's JSON would have it, with each field back
+        at its JSON path (links.document_metadata rather than document_metadata).
+        Fields records don't keep are left out.
+        """
+        result = {}
+        for name, path, _ in self.FIELDS:
+            value = getattr(self, name)
+            if isinstance(value, Record):
+                value = value.to_json()
+            elif isinstance(value, tuple):
+                value = list(value)
+            if value is None:
+                continue
+            target = result
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+        return result
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name, _, _ in self.FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name, _, _ in self.FIELDS[:3])
+        return f"{type(self).__name__}({fields}, ...)"
+
+
+def _fields(*specs):
+    """Expands ("name", "a.b", converter) shorthand into (name, path tuple, converter)."""
+    fields = []
+    for spec in specs:
+        name, path, convert = (spec + (None, None))[:3] if isinstance(spec, tuple) else (spec, None, None)
+        fields.append((name, tuple((path or name).split(".")), convert))
+    return tuple(fields)
+
+
+class Address(Record):
+    FIELDS = _fields("premises", "address_line_1", "address_line_2", ("locality", None, _intern),
+                     ("region", None, _intern), "postal_code", ("country", None, _intern))
+    __slots__ = tuple(name for name, _, _ in FIELDS)
+
+    def __str__(self):
+        return ", ".join(value for value in (self.premises, self.address_line_1, self.address_line_2,
+                                             self.locality, self.region, self.postal_code) if value)
+
+
+class CompanyProfile(Record):
+    FIELDS = _fields(
+        "company_number",
+        "company_name",
+        ("company_status", None, _intern),
+        ("company_status_detail", None, _intern),
+        ("type", None, _intern),
+        ("jurisdiction", None, _intern),
+        "date_of_creation",
+        "date_of_cessation",
+        ("registered_office_address", None, Address.from_json),
+        ("sic_codes", None, _interned_tuple),
+        "has_charges",
+        "has_insolvency_history",
+        ("accounts_next_due", "accounts.next_due"),
+        ("last_accounts_made_up_to", "accounts.last_accounts.made_up_to"),
+        ("confirmation_statement_next_due", "confirmation_statement.next_due"),
+        ("source", None, _intern),
+    )
+    __slots__ = tuple(name for name, _, _ in FIELDS)
+
+
+class FilingItem(Record):
+    FIELDS = _fields(
+        "transaction_id",
+        "date",
+        ("type", None, _intern),
+        ("category", None, _intern),
+        ("subcategory", None, _intern),
+        ("description", None, _intern),
+        "description_values",
+        "pages",
+        "barcode",
+        ("document_metadata", "links.document_metadata"),
+    )
+    __slots__ = tuple(name for name, _, _ in FIELDS)
+
+    @property
+    def links(self):
+        """The links object as in the JSON, for code written against the dicts."""
+        return {"document_metadata": self.document_metadata} if self.document_metadata else None
+
+    def get(self, key, default=None):
+        if key == "links":
+            return self.links or default
+        return super().get(key, default)
+
+
+class PSC(Record):
+    FIELDS = _fields(
+        "name",
+        ("kind", None, _intern),
+        ("natures_of_control", None, _interned_tuple),
+        "notified_on",
+        "ceased_on",
+        ("nationality", None, _intern),
+        ("country_of_residence", None, _intern),
+        ("address", None, Address.from_json),
+        ("registration_number", "identification.registration_number"),
+        ("self_link", "links.self"),
+    )
+    __slots__ = tuple(name for name, _, _ in FIELDS)
+
+    @property
+    def active(self):
+        return not self.ceased_on
+
+
+class OfficerAppointment(Record):
+    FIELDS = _fields(
+        "name",
+        ("officer_role", None, _intern),
+        "appointed_on",
+        "resigned_on",
+        ("company_number", "appointed_to.company_number"),
+        ("company_name", "appointed_to.company_name"),
+        ("company_status", "appointed_to.company_status", _intern),
+        ("occupation", None, _intern),
+        ("nationality", None, _intern),
+    )
+    __slots__ = tuple(name for name, _, _ in FIELDS)
+
+    @property
+    def appointed_to(self):
+        """The appointed_to object as in the JSON, for code written against the dicts."""
+        return {"company_number": self.company_number, "company_name": self.company_name,
+                "company_status": self.company_status}
+
+    def get(self, key, default=None):
+        if key == "appointed_to":
+            return self.appointed_to
+        return super().get(key, default)
+
+
+class RecordPage:
+    """
+    One page of a list endpoint with its items converted to records. Like the
+    JSON it replaces, it supports get('items'), get('total_count') and so on.
+    """
+
+    __slots__ = ("items", "total_count", "start_index", "items_per_page", "name")
+
+    def __init__(self, items, total_count=None, start_index=0, items_per_page=None, name=None):
+        self.items = items
+        self.total_count = total_count
+        self.start_index = start_index
+        self.items_per_page = items_per_page
+        self.name = name
+
+    @classmethod
+    def from_json(cls, data, record_class):
+        if data is None:
+            return None
+        return cls(
+            [record_class.from_json(item) for item in data.get("items") or ()],
+            data.get("total_count", data.get("total_results")),
+            data.get("start_index", 0),
+            data.get("items_per_page"),
+            data.get("name"),
+        )
+
+    def to_json(self):
+        """Returns the page as the API's JSON would have it (see Record.to_json)."""
+        data = {"items": [item.to_json() if isinstance(item, Record) else item for item in self.items],
+                "start_index": self.start_index}
+        for key in ("total_count", "items_per_page", "name"):
+            if getattr(self, key) is not None:
+                data[key] = getattr(self, key)
+        return data
+
+    def get(self, key, default=None):
+        if key == "total_results":
+            key = "total_count"
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
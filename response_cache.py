@@ -0,0 +1,282 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from records import dumps, loads
+
+
+# Default time-to-live (in seconds) per endpoint type. The first pattern that
+# matches the endpoint wins; anything unmatched falls back to DEFAULT_TTL.
+DEFAULT_TTL_RULES = [
+    (r"^/search/", 10 * 60),                                  # Search results
+    (r"^/company/[^/?]+$", 6 * 60 * 60),                      # Company profiles
+    (r"^/company/[^/]+/persons-with-significant-control", 6 * 60 * 60),
+    (r"^/company/[^/]+/(officers|charges)", 6 * 60 * 60),
+    (r"^/company/[^/]+/filing-history", 60 * 60),
+    (r"^/officers/[^/]+/appointments", 60 * 60),
+]
+DEFAULT_TTL = 60 * 60
+
+
+class CacheEntry:
+    """
+    A cached API response together with its validator and expiry time.
+    """
+
+    __slots__ = ("data", "etag", "expires_at")
+
+    def __init__(self, data, etag=None, expires_at=0.0):
+        self.data = data
+        self.etag = etag
+        self.expires_at = expires_at
+
+    def is_fresh(self, now=None):
+        """
+        Returns True while the entry is within its time-to-live.
+        """
+        return (now or time.time()) < self.expires_at
+
+
+class MemoryCache:
+    """
+    In-memory LRU cache tier holding at most `max_entries` responses.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Persistent cache tier backed by a SQLite database, so responses survive
+    between processes. Holds at most `max_entries` rows, evicting the least
+    recently used ones first.
+
+    Reads don't write: access times are kept in memory and stored with the
+    next write, before an eviction, or once enough have piled up.
+    """
+
+    ACCESS_FLUSH_SIZE = 256
+
+    def __init__(self, path, max_entries=50000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " etag TEXT,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self._writes_since_evict = 0
+        self._accessed = {}  # key -> last access time not yet stored
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, etag, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= self.ACCESS_FLUSH_SIZE:
+                self._flush_accessed()
+                self._conn.commit()
+        return CacheEntry(loads(row[0]), row[1], row[2])
+
+    def set(self, key, entry):
+        payload = dumps(entry.data)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, data, etag, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, entry.etag, entry.expires_at, time.time()),
+            )
+            self._accessed.pop(key, None)
+            self._flush_accessed()
+            self._writes_since_evict += 1
+            # Counting rows on every write is wasteful; check every few hundred writes.
+            if self._writes_since_evict >= 256:
+                self._evict()
+            self._conn.commit()
+
+    def _flush_accessed(self):
+        if self._accessed:
+            self._conn.executemany("UPDATE responses SET accessed_at = ? WHERE key = ?",
+                                   ((accessed_at, key) for key, accessed_at in self._accessed.items()))
+            self._accessed = {}
+
+    def _evict(self):
+        self._flush_accessed()
+        self._writes_since_evict = 0
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def invalidate_prefix(self, prefix):
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key LIKE ? ESCAPE '\\'", (escaped + "%",))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._accessed = {}
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._conn.commit()
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Layered response cache used by CompaniesHouseAPI._make_request.
+
+    Lookups go through the tiers in order (typically a MemoryCache in front of a
+    SQLiteCache); a hit in a slower tier is promoted into the faster ones.
+    Entries are kept past their expiry so that stale responses can still be
+    revalidated with If-None-Match.
+    """
+
+    def __init__(self, tiers=None, ttl_rules=None, default_ttl=DEFAULT_TTL):
+        """
+        Args:
+            tiers (list, optional): Cache tiers, fastest first. Defaults to a single MemoryCache.
+            ttl_rules (list, optional): (regex, seconds) pairs matched against the endpoint.
+                                        Defaults to DEFAULT_TTL_RULES.
+            default_ttl (int): TTL in seconds for endpoints matching no rule.
+        """
+        self.tiers = tiers if tiers is not None else [MemoryCache()]
+        self.ttl_rules = [(re.compile(pattern), ttl) for pattern, ttl in (ttl_rules or DEFAULT_TTL_RULES)]
+        self.default_ttl = default_ttl
+
+    @classmethod
+    def default(cls, path=None, memory_entries=1024, disk_entries=50000):
+        """
+        Builds the standard two-tier cache: an in-memory LRU in front of a SQLite
+        store under the user's cache directory.
+        """
+        return cls(tiers=[MemoryCache(memory_entries), SQLiteCache(path or cls.default_path(), disk_entries)])
+
+    @staticmethod
+    def default_path():
+        cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        return os.path.join(cache_home, "companycheck", "responses.sqlite3")
+
+    def ttl_for(self, endpoint):
+        """
+        Returns the time-to-live in seconds for responses from `endpoint`.
+        """
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(endpoint):
+                return ttl
+        return self.default_ttl
+
+    def get(self, endpoint):
+        """
+        Returns the CacheEntry for `endpoint` (fresh or stale), or None on a miss.
+        """
+        for i, tier in enumerate(self.tiers):
+            entry = tier.get(endpoint)
+            if entry is not None:
+                for faster in self.tiers[:i]:
+                    faster.set(endpoint, entry)
+                return entry
+        return None
+
+    def set(self, endpoint, data, etag=None, ttl=None):
+        """
+        Stores a response in every tier and returns the new CacheEntry.
+        """
+        ttl = self.ttl_for(endpoint) if ttl is None else ttl
+        entry = CacheEntry(data, etag, time.time() + ttl)
+        for tier in self.tiers:
+            tier.set(endpoint, entry)
+        return entry
+
+    def refresh(self, endpoint, entry):
+        """
+        Extends the lifetime of an entry the server confirmed is unchanged (HTTP 304).
+        """
+        return self.set(endpoint, entry.data, entry.etag)
+
+    def delete(self, endpoint):
+        for tier in self.tiers:
+            tier.delete(endpoint)
+
+    def invalidate_prefix(self, prefix):
+        """
+        Drops every cached response whose endpoint starts with `prefix`.
+        """
+        for tier in self.tiers:
+            tier.invalidate_prefix(prefix)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def close(self):
+        for tier in self.tiers:
+            if hasattr(tier, "close"):
+                tier.close()
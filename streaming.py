@@ -0,0 +1,424 @@
+"""
+Consumer for the Companies House streaming API.
+
+The streaming API (https://stream.companieshouse.gov.uk) pushes every change
+to company profiles, filing history, officers, PSCs and charges as JSON lines
+over long-lived chunked HTTP responses, each event tagged with a `timepoint`
+a client can reconnect from. StreamConsumer keeps one connection per stream,
+parses events as the chunks arrive, applies them to the client's response
+cache and checkpoints the last timepoint handled, so a restarted consumer
+resumes where it stopped and cached lookups stay current without polling.
+
+Streams use a separate stream key (COMPANIES_HOUSE_STREAM_KEY), sent the same
+way as an API key.
+
+    python3 streaming.py companies filings --checkpoint stream.json -o events.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+import requests
+
+from rate_limiter import RateLimiter
+from records import loads
+
+logger = logging.getLogger(__name__)
+
+STREAM_URL = "https://stream.companieshouse.gov.uk"
+
+# Stream names mapped to their paths.
+STREAMS = {
+    "companies": "/companies",
+    "filings": "/filings",
+    "officers": "/officers",
+    "pscs": "/persons-with-significant-control",
+    "charges": "/charges",
+    "insolvency": "/insolvency-cases",
+}
+
+# Cached list endpoints made stale by an event on a resource below them.
+_RESOURCE_LISTS = [
+    (re.compile(r"^/company/([^/]+)/filing-history/"), "/company/{}/filing-history"),
+    (re.compile(r"^/company/([^/]+)/appointments/"), "/company/{}/officers"),
+    (re.compile(r"^/company/([^/]+)/persons-with-significant-control/"), "/company/{}/persons-with-significant-control"),
+    (re.compile(r"^/company/([^/]+)/charges/"), "/company/{}/charges"),
+    (re.compile(r"^/company/([^/]+)/insolvency"), "/company/{}/insolvency"),
+]
+_COMPANY_PROFILE = re.compile(r"^/company/[^/]+$")
+
+
+class StreamEvent:
+    """
+    One event from a stream: the changed resource and the event metadata.
+    """
+
+    __slots__ = ("stream", "resource_kind", "resource_uri", "resource_id", "data", "timepoint", "published_at", "type")
+
+    def __init__(self, stream, resource_kind, resource_uri, resource_id, data, timepoint, published_at, type):
+        self.stream = stream
+        self.resource_kind = resource_kind
+        self.resource_uri = resource_uri
+        self.resource_id = resource_id
+        self.data = data
+        self.timepoint = timepoint
+        self.published_at = published_at
+        self.type = type  # "changed" or "deleted"
+
+    @classmethod
+    def from_json(cls, stream, payload):
+        event = payload.get("event") or {}
+        return cls(stream, payload.get("resource_kind"), payload.get("resource_uri"), payload.get("resource_id"),
+                   payload.get("data"), event.get("timepoint"), event.get("published_at"), event.get("type"))
+
+    @property
+    def company_number(self):
+        """The company the event is about, taken from its resource URI."""
+        match = re.match(r"^/company/([^/]+)", self.resource_uri or "")
+        return match.group(1) if match else None
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def parse_events(chunks, stream=None):
+    """
+    Decodes a stream's body incrementally.
+
+    Args:
+        chunks (iterable): Byte chunks as they arrive; a chunk may hold several
+                           events or part of one.
+        stream (str, optional): Stream name recorded on each event.
+
+    Yields:
+        StreamEvent: Each complete event. Blank heartbeat lines are skipped,
+                     and lines that aren't valid JSON are logged and skipped.
+    """
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield StreamEvent.from_json(stream, loads(line))
+            except (ValueError, AttributeError) as err:
+                logger.warning("Skipping malformed %s stream event: %s", stream, err)
+    if buffer.strip():
+        logger.debug("Discarding incomplete %s stream event at end of connection", stream)
+
+
+class TimepointCheckpoint:
+    """
+    The last timepoint handled on each stream, saved as a small JSON file.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.timepoints = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.timepoints = {name: int(value) for name, value in json.load(f).items()}
+            except (OSError, ValueError) as err:
+                logger.warning("Ignoring unreadable checkpoint %s: %s", path, err)
+
+    def get(self, stream):
+        with self._lock:
+            return self.timepoints.get(stream)
+
+    def set(self, stream, timepoint):
+        with self._lock:
+            self.timepoints[stream] = timepoint
+
+    def discard(self, stream):
+        with self._lock:
+            self.timepoints.pop(stream, None)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            payload = json.dumps(self.timepoints)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(temporary, self.path)
+
+
+class StreamConsumer:
+    """
+    Follows one or more streams on background threads and applies their
+    events to a response cache.
+
+    Company profile events replace the cached profile outright. Events on
+    resources listed under a company (filings, officers, PSCs, charges) drop
+    the company's cached lists for that resource, so the next lookup fetches
+    them again. Deleted resources are dropped from the cache.
+
+    Each connection is read as it arrives and reconnected with jittered
+    exponential backoff when it drops, resuming from the last timepoint
+    handled. If the service no longer has that timepoint, the stream is
+    followed from the present and the cache entries it covers are dropped.
+    """
+
+    def __init__(self, streams=("companies", "filings", "pscs"), stream_key=None, stream_url=None, cache=None,
+                 checkpoint=None, on_event=None, checkpoint_every=5.0, read_timeout=90.0):
+        """
+        Args:
+            streams (iterable): Stream names from STREAMS to follow.
+            stream_key (str, optional): Streaming API key. Defaults to the
+                                        COMPANIES_HOUSE_STREAM_KEY environment variable.
+            stream_url (str, optional): Streaming API root. Defaults to the
+                                        COMPANIES_HOUSE_STREAM_URL environment
+                                        variable, else the live service.
+            cache (ResponseCache, optional): Cache the events are applied to.
+            checkpoint (TimepointCheckpoint, optional): Where timepoints are kept.
+                                                        Defaults to not keeping them.
+            on_event (callable, optional): Called with each StreamEvent after it is applied.
+            checkpoint_every (float): Seconds between checkpoint saves. Defaults to 5.
+            read_timeout (float): Seconds without data (not even a heartbeat) after
+                                  which a connection is considered dead. Defaults to 90.
+
+        Raises:
+            ValueError: If a stream name is unknown or no stream key is found.
+        """
+        unknown = [name for name in streams if name not in STREAMS]
+        if unknown:
+            raise ValueError(f"Unknown stream(s): {', '.join(unknown)}. Choose from {', '.join(STREAMS)}.")
+        self.stream_key = stream_key or os.getenv("COMPANIES_HOUSE_STREAM_KEY")
+        if not self.stream_key:
+            raise ValueError("Stream key not found. Please provide it or set the COMPANIES_HOUSE_STREAM_KEY environment variable.")
+        self.streams = list(dict.fromkeys(streams))
+        self.stream_url = (stream_url or os.getenv("COMPANIES_HOUSE_STREAM_URL") or STREAM_URL).rstrip("/")
+        self.cache = cache
+        self.checkpoint = checkpoint or TimepointCheckpoint()
+        self.on_event = on_event
+        self.checkpoint_every = checkpoint_every
+        self.read_timeout = read_timeout
+        self.stats = {name: {"events": 0, "connections": 0, "errors": 0} for name in self.streams}
+
+        self._backoff = RateLimiter(base_backoff=1.0, max_backoff=60.0)
+        self._stop = threading.Event()
+        self._threads = []
+        self._responses = {}
+        self._lock = threading.Lock()
+        self._saved_at = time.monotonic()
+
+    def start(self):
+        """Starts following the streams on background threads."""
+        self._stop.clear()
+        for name in self.streams:
+            thread = threading.Thread(target=self.follow, args=(name,), name=f"stream-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5.0):
+        """Disconnects, waits for the threads to finish and saves the checkpoint."""
+        self._stop.set()
+        with self._lock:
+            responses = list(self._responses.values())
+        for response in responses:
+            response.close()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.checkpoint.save()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def wait(self):
+        """Blocks until stop() is called from another thread (or Ctrl-C)."""
+        while not self._stop.wait(1.0):
+            pass
+
+    def follow(self, stream):
+        """
+        Follows one stream until stop() is called, reconnecting as needed.
+        """
+        session = requests.Session()
+        session.auth = (self.stream_key, "")
+        attempt = 0
+        try:
+            while not self._stop.is_set():
+                try:
+                    if self._read(session, stream):
+                        attempt = 0
+                    if self._stop.is_set():
+                        break
+                    delay = self._backoff.backoff_delay(attempt)
+                except requests.exceptions.HTTPError as err:
+                    self.stats[stream]["errors"] += 1
+                    if err.response is not None and err.response.status_code == 416:
+                        logger.warning("Timepoint for the %s stream has expired; following it from now", stream)
+                        self._resync(stream)
+                        continue
+                    delay = self._backoff.backoff_delay(attempt, err.response)
+                    logger.warning("%s stream refused: %s; reconnecting in %.1fs", stream, err, delay)
+                except AttributeError:
+                    # stop() closed the response while it was being read.
+                    if not self._stop.is_set():
+                        raise
+                    break
+                except (requests.exceptions.RequestException, OSError) as err:
+                    if self._stop.is_set():
+                        break
+                    self.stats[stream]["errors"] += 1
+                    delay = self._backoff.backoff_delay(attempt)
+                    logger.info("%s stream disconnected (%s); reconnecting in %.1fs", stream, err, delay)
+                attempt += 1
+                self._stop.wait(delay)
+        finally:
+            session.close()
+
+    def _read(self, session, stream):
+        """
+        Reads one connection until it ends.
+
+        Returns:
+            bool: True if any data (an event or heartbeat) arrived, which resets the backoff.
+        """
+        timepoint = self.checkpoint.get(stream)
+        params = {"timepoint": timepoint} if timepoint is not None else {}
+        response = session.get(f"{self.stream_url}{STREAMS[stream]}", params=params, stream=True,
+                               timeout=(10, self.read_timeout))
+        with self._lock:
+            self._responses[stream] = response
+        try:
+            response.raise_for_status()
+            self.stats[stream]["connections"] += 1
+            logger.info("Connected to the %s stream from timepoint %s", stream, timepoint)
+            received = False
+
+            def chunks():
+                nonlocal received
+                for chunk in response.iter_content(chunk_size=None):
+                    received = True
+                    yield chunk
+
+            for event in parse_events(chunks(), stream):
+                if event.timepoint is not None and timepoint is not None and event.timepoint < timepoint:
+                    continue  # Already handled before a reconnect
+                self.apply(event)
+                if event.timepoint is not None:
+                    # Resume from the next event: the service replays from the timepoint given, inclusive.
+                    timepoint = event.timepoint + 1
+                    self.checkpoint.set(stream, timepoint)
+                self.stats[stream]["events"] += 1
+                if self.on_event is not None:
+                    self.on_event(event)
+                self._maybe_save()
+            return received
+        finally:
+            with self._lock:
+                self._responses.pop(stream, None)
+            response.close()
+
+    def _maybe_save(self):
+        now = time.monotonic()
+        if now - self._saved_at >= self.checkpoint_every:
+            self._saved_at = now
+            self.checkpoint.save()
+
+    def _resync(self, stream):
+        """
+        Forgets a stream's expired timepoint. Changes made in the gap will never
+        be delivered, so cached company data can no longer be trusted and is dropped.
+        """
+        self.checkpoint.discard(stream)
+        if self.cache is not None:
+            self.cache.invalidate_prefix("/company/")
+
+    def apply(self, event):
+        """
+        Applies one event to the cache.
+        """
+        if self.cache is None or not event.resource_uri:
+            return
+        uri = event.resource_uri
+        if _COMPANY_PROFILE.match(uri):
+            if event.type == "deleted" or event.data is None:
+                self.cache.delete(uri)
+            else:
+                self.cache.set(uri, event.data)
+            return
+        self.cache.delete(uri)
+        for pattern, template in _RESOURCE_LISTS:
+            match = pattern.match(uri)
+            if match:
+                self.cache.invalidate_prefix(template.format(match.group(1)))
+                break
+        appointments = ((event.data or {}).get("links") or {}).get("officer", {}).get("appointments")
+        if appointments:
+            self.cache.invalidate_prefix(appointments)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Follow Companies House streams and keep the response cache current.")
+    parser.add_argument("streams", nargs="*", default=["companies", "filings", "pscs"],
+                        help=f"Streams to follow ({', '.join(STREAMS)}). Defaults to companies, filings and pscs.")
+    parser.add_argument("--checkpoint", help="Timepoint checkpoint file. Defaults to "
+                                             "~/.cache/companycheck/stream-timepoints.json.")
+    parser.add_argument("-o", "--output", help="Also append each event to this JSON Lines file ('-' for stdout).")
+    parser.add_argument("--no-cache", action="store_true", help="Don't apply events to the response cache.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log connections and reconnects to stderr.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    from response_cache import ResponseCache
+
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    checkpoint = TimepointCheckpoint(args.checkpoint or os.path.join(cache_home, "companycheck", "stream-timepoints.json"))
+    cache = None if args.no_cache else ResponseCache.default()
+    output = None
+    if args.output:
+        output = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+
+    def emit(event):
+        if output is not None:
+            output.write(json.dumps(event.to_dict()) + "\n")
+            output.flush()
+
+    try:
+        consumer = StreamConsumer(args.streams, cache=cache, checkpoint=checkpoint, on_event=emit)
+    except ValueError as e:
+        print(f"Stream Error: {e}", file=sys.stderr)
+        return 2
+    consumer.start()
+    try:
+        consumer.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        consumer.stop()
+        if cache is not None:
+            cache.close()
+        if output is not None and output is not sys.stdout:
+            output.close()
+    for name, stats in consumer.stats.items():
+        print(f"{name}: {stats['events']} events, {stats['connections']} connections, {stats['errors']} errors",
+              file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
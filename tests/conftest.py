@@ -0,0 +1,51 @@
+"""
+Shared fixtures: a MockCompaniesHouseServer per test and clients pointed at it.
+
+The modules live at the repository root rather than in a package, so the root
+is put on sys.path here.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from companies_house_api import CompaniesHouseAPI  # noqa: E402
+from mock_server import MockCompaniesHouseServer, MockDataset  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+
+
+@pytest.fixture
+def server_options():
+    """Keyword arguments for the test's MockCompaniesHouseServer; override to change them."""
+    return {}
+
+
+@pytest.fixture
+def server(server_options):
+    options = dict({"dataset": MockDataset(company_count=1000)}, **server_options)
+    with MockCompaniesHouseServer(**options) as server:
+        yield server
+
+
+@pytest.fixture
+def make_client(server):
+    """Returns a factory for clients of the test's server, closed when the test ends."""
+    clients = []
+
+    def make_client(**kwargs):
+        # A bucket that refills in milliseconds, so a 429 doesn't stall the test for the real quota's pace.
+        kwargs.setdefault("rate_limiter", RateLimiter(limit=1000, window=1, base_backoff=0.01, max_backoff=0.05))
+        client = CompaniesHouseAPI(api_key="test", base_url=server.url, **kwargs)
+        clients.append(client)
+        return client
+
+    yield make_client
+    for client in clients:
+        client.close()
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client()
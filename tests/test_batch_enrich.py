@@ -0,0 +1,75 @@
+import json
+import os
+
+import pytest
+
+from batch_enrich import NOT_AVAILABLE, ResultWriter, enrich_company, load_checkpoint, main, run_batch
+
+NUMBERS = ["00000001", "00000002", "00000003"]
+
+
+def run(client, tmp_path, numbers=NUMBERS, **kwargs):
+    output, checkpoint = str(tmp_path / "out.jsonl"), str(tmp_path / "out.jsonl.checkpoint")
+    writer = ResultWriter(output, checkpoint, "jsonl")
+    try:
+        counts = run_batch(client, iter(numbers), writer, load_checkpoint(checkpoint), workers=2, **kwargs)
+    finally:
+        writer.close()
+    with open(output, encoding="utf-8") as f:
+        return counts, [json.loads(line) for line in f], load_checkpoint(checkpoint)
+
+
+def test_writes_and_checkpoints_every_company(client, tmp_path):
+    (written, skipped, failed), rows, done = run(client, tmp_path)
+
+    assert (written, skipped, failed) == (3, 0, 0)
+    assert sorted(row["company_number"] for row in rows) == NUMBERS
+    assert done == set(NUMBERS)
+
+
+def test_rerun_skips_checkpointed_companies(client, tmp_path):
+    run(client, tmp_path)
+    (written, skipped, _), rows, _ = run(client, tmp_path)
+
+    assert (written, skipped) == (0, 3)
+    assert len(rows) == 3
+
+
+def test_records_mode_writes_the_same_json(make_client, tmp_path):
+    os.makedirs(tmp_path / "plain")
+    os.makedirs(tmp_path / "records")
+    _, (plain,), _ = run(make_client(), tmp_path / "plain", numbers=NUMBERS[:1], full_history=True)
+    _, (records,), _ = run(make_client(records=True), tmp_path / "records", numbers=NUMBERS[:1], full_history=True)
+
+    assert records["profile"]["company_name"] == plain["profile"]["company_name"]
+    assert records["profile"]["accounts"]["next_due"] == plain["profile"]["accounts"]["next_due"]
+    assert len(records["filing_history"]["items"]) == len(plain["filing_history"]["items"]) == 120
+    assert [item["links"]["document_metadata"] for item in records["filing_history"]["items"]] == \
+        [item["links"]["document_metadata"] for item in plain["filing_history"]["items"]]
+
+
+@pytest.mark.parametrize("server_options", [{"error_rate": 1.0, "retry_after": 0.01}])
+def test_failed_companies_are_not_written_or_checkpointed(make_client, tmp_path):
+    (written, _, failed), rows, done = run(make_client(max_retries=0), tmp_path)
+
+    assert (written, failed) == (0, 3)
+    assert rows == [] and done == set()
+
+
+def test_missing_sections_are_not_failures(client):
+    bundle = enrich_company(client, "00999999")
+
+    assert set(bundle["errors"].values()) == {NOT_AVAILABLE}
+
+
+def test_stdout_runs_are_not_checkpointed_by_default(server, tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("COMPANIES_HOUSE_API_URL", server.url)
+    monkeypatch.setenv("COMPANIES_HOUSE_API_KEY", "test")
+    monkeypatch.delenv("COMPANIES_HOUSE_API_KEYS", raising=False)
+    monkeypatch.chdir(tmp_path)
+    numbers = tmp_path / "numbers.txt"
+    numbers.write_text("\n".join(NUMBERS) + "\n")
+
+    assert main([str(numbers), "--no-cache"]) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 3
+    assert not [name for name in os.listdir(tmp_path) if "checkpoint" in name]
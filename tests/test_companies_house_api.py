@@ -0,0 +1,154 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from companies_house_api import RequestFailed
+
+NUMBER = "00000001"
+MISSING = "00999999"
+
+
+# --- Retries and backoff ---
+
+@pytest.mark.parametrize("server_options", [{"error_rate": 0.5, "retry_after": 0.01, "seed": 3}])
+def test_429s_are_retried_until_the_request_succeeds(server, make_client):
+    client = make_client(max_retries=20)
+    profiles = [client.get_company_profile(f"{index:08d}") for index in range(1, 11)]
+
+    assert all(profile is not None for profile in profiles)
+    assert server.stats["injected_429"] > 0
+    assert client.metrics.totals()["retries"] == server.stats["injected_429"]
+    assert client.metrics.totals()["rate_limited"] == server.stats["injected_429"]
+
+
+@pytest.mark.parametrize("server_options", [{"error_rate": 1.0, "retry_after": 0.01}])
+def test_exhausted_retries_fail(server, make_client):
+    client = make_client(max_retries=2)
+
+    assert client.get_company_profile(NUMBER) is None
+    assert server.stats["requests"] == 3
+    with pytest.raises(RequestFailed) as failure:
+        client.get_company_profile(NUMBER, raise_errors=True)
+    assert failure.value.status_code == 429
+    assert client.metrics.totals()["errors"] == 2
+
+
+@pytest.mark.parametrize("server_options", [{"error_rate": 1.0, "retry_after": 0.3}])
+def test_backoff_waits_for_the_rate_limit_reset(make_client):
+    client = make_client(max_retries=1)
+    started = time.monotonic()
+    client.get_company_profile(NUMBER)
+
+    assert time.monotonic() - started >= 0.25
+
+
+def test_404_is_not_an_error(server, client):
+    assert client.get_company_profile(MISSING, raise_errors=True) is None
+    totals = client.metrics.totals()
+    assert (totals["errors"], totals["not_found"]) == (0, 1)
+
+
+@pytest.mark.parametrize("server_options", [{"error_rate": 1.0, "retry_after": 0.01}])
+def test_bundle_records_failed_sections(make_client):
+    bundle = make_client(max_retries=0).get_company_bundle(NUMBER)
+
+    assert set(bundle["errors"]) == {"profile", "filing_history", "pscs"}
+    assert bundle["profile"] is None
+
+
+def test_bundle_has_no_errors_for_missing_sections(client):
+    bundle = client.get_company_bundle(MISSING, include_charges=True)
+
+    assert bundle["errors"] == {}
+    assert bundle["profile"] is None and bundle["charges"] is None
+
+
+# --- Pagination ---
+
+def test_filing_history_is_read_across_pages(server, client):
+    dataset = server.dataset
+    filings = list(client.iter_filing_history(NUMBER))
+
+    assert [filing["transaction_id"] for filing in filings] == [
+        dataset.filing_item(1, position)["transaction_id"] for position in range(dataset.filings_per_company)]
+
+
+def test_page_size_sets_the_number_of_requests(server, client):
+    requests = server.stats["requests"]
+    assert len(list(client.iter_filing_history(NUMBER, page_size=50))) == 120
+    assert server.stats["requests"] - requests == 3
+
+
+def test_pages_can_start_part_way(client):
+    filings = list(client.iter_filing_history(NUMBER, start_index=100))
+
+    assert len(filings) == 20
+    assert filings[0] == client.get_filing_history(NUMBER, items_per_page=100, start_index=100)["items"][0]
+
+
+def test_prefetched_pages_match(client):
+    assert list(client.iter_search_companies("acorn", page_size=25, prefetch=True)) == \
+        list(client.iter_search_companies("acorn", page_size=25))
+
+
+def test_records_pages_are_read_across_pages(make_client):
+    filings = list(make_client(records=True).iter_filing_history(NUMBER))
+
+    assert len(filings) == 120
+    assert filings[0].get("links")["document_metadata"] == f"/document/{filings[0].transaction_id}"
+
+
+# --- Single-flight requests ---
+
+@pytest.mark.parametrize("server_options", [{"latency": 0.2, "jitter": 0}])
+def test_concurrent_identical_requests_share_one_call(server, client):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        profiles = list(pool.map(lambda _: client.get_company_profile(NUMBER), range(8)))
+
+    assert server.stats["requests"] == 1
+    assert all(profile == profiles[0] for profile in profiles)
+    assert client.metrics.totals()["coalesced"] == 7
+
+
+@pytest.mark.parametrize("server_options", [{"error_rate": 1.0, "retry_after": 0.2}])
+def test_shared_failure_reaches_every_caller(server, make_client):
+    client = make_client(max_retries=0)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(client.get_company_profile, NUMBER, raise_errors=True) for _ in range(4)]
+    for future in futures:
+        with pytest.raises(RequestFailed):
+            future.result()
+    assert server.stats["requests"] < 4
+
+
+def test_interrupted_leader_leaves_waiters_to_retry(client):
+    calls = []
+
+    def fetch(endpoint, cached):
+        calls.append(endpoint)
+        time.sleep(0.2)
+        if len(calls) == 1:
+            raise KeyboardInterrupt
+        return {"company_number": NUMBER}
+
+    client._fetch = fetch
+    results = []
+
+    def leader():
+        with pytest.raises(KeyboardInterrupt):
+            client.get_company_profile(NUMBER)
+
+    threads = [threading.Thread(target=leader)]
+    threads += [threading.Thread(target=lambda: results.append(client.get_company_profile(NUMBER))) for _ in range(3)]
+    threads[0].start()
+    time.sleep(0.05)
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [{"company_number": NUMBER}] * 3
+    assert len(calls) == 2
+    assert client._flights == {}
@@ -0,0 +1,73 @@
+import pytest
+
+import company_index
+from company_index import CompanyIndex, build_index
+
+COMPANIES = [
+    ("ABBEY ROAD HOLDINGS LIMITED", "00000001"),
+    ("ABBEY ROAD STUDIOS LIMITED", "00000002"),
+    ("NORTHERN BAKERY LTD", "00000003"),
+    ("SOUTHERN BAKERIES LIMITED", "00000004"),
+]
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = str(tmp_path / "companies.idx")
+    build_index(((name, number, "active", "ltd", "", "", "", "", "", "2020-01-01", "", "")
+                 for name, number in COMPANIES), path)
+    return path
+
+
+@pytest.fixture(params=["numpy", "stdlib"])
+def index(request, index_path, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(company_index, "np", None)
+    elif company_index.np is None:
+        pytest.skip("NumPy is not installed")
+    with CompanyIndex(index_path) as index:
+        yield index
+
+
+def titles(results):
+    return [item["title"] for item in results["items"]]
+
+
+def test_prefix_matches_come_first(index):
+    results = index.search_companies("abbey road")
+
+    assert titles(results) == ["ABBEY ROAD HOLDINGS LIMITED", "ABBEY ROAD STUDIOS LIMITED"]
+    assert results["prefix_matches"] == 2
+
+
+def test_similar_names_are_not_prefix_matches(index):
+    results = index.search_companies("bakeries")
+
+    assert "SOUTHERN BAKERIES LIMITED" in titles(results)
+    assert results["prefix_matches"] == 0
+
+
+def test_truncated_results_have_no_total(index):
+    results = index.search_companies("abbey", limit=1)
+
+    assert len(results["items"]) == 1 and results["total_results"] is None
+
+
+def test_lookup_by_number(index):
+    assert index.record(index.find_number("00000003"))["company_name"] == "NORTHERN BAKERY LTD"
+    assert index.find_number("12345678") is None
+
+
+def test_client_answers_prefix_matches_locally(server, make_client, index):
+    client = make_client(local_index=index)
+    requests = server.stats["requests"]
+
+    assert client.search_companies("abbey")["source"] == "local_index"
+    assert server.stats["requests"] == requests
+
+
+def test_client_asks_the_api_when_the_index_only_has_similar_names(server, make_client, index):
+    client = make_client(local_index=index)
+
+    assert client.search_companies("bakeries").get("source") != "local_index"
+    assert server.stats["requests"] == 1
@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from document_downloader import DocumentDownloader
+
+NUMBER = "00000001"
+
+
+@pytest.fixture
+def filing(server):
+    return server.dataset.filing_item(1, 0)
+
+
+@pytest.fixture
+def make_downloader(tmp_path):
+    downloaders = []
+
+    def make_downloader(client, **kwargs):
+        downloader = DocumentDownloader(client, str(tmp_path), **kwargs)
+        downloaders.append(downloader)
+        return downloader
+
+    yield make_downloader
+    for downloader in downloaders:
+        downloader.close()
+
+
+def test_downloads_a_document(server, client, make_downloader, filing):
+    result = make_downloader(client).download(NUMBER, filing)
+
+    content = server.dataset.document(filing["transaction_id"])
+    assert (result["status"], result["bytes"]) == ("downloaded", len(content))
+    with open(result["path"], "rb") as f:
+        assert f.read() == content
+
+
+def test_document_on_disk_is_not_fetched_again(server, client, make_downloader, filing):
+    downloader = make_downloader(client)
+    downloader.download(NUMBER, filing)
+    requests = server.stats["requests"]
+
+    assert downloader.download(NUMBER, filing)["status"] == "present"
+    assert server.stats["requests"] == requests
+
+
+def test_interrupted_download_resumes(server, client, make_downloader, filing):
+    downloader = make_downloader(client)
+    content = server.dataset.document(filing["transaction_id"])
+    path = downloader.path_for(NUMBER, filing)
+    os.makedirs(os.path.dirname(path))
+    with open(path + ".part", "wb") as f:
+        f.write(content[:5000])
+
+    result = downloader.download(NUMBER, filing)
+    assert (result["status"], result["bytes"]) == ("resumed", len(content) - 5000)
+    with open(path, "rb") as f:
+        assert f.read() == content
+    assert not os.path.exists(path + ".part")
+
+
+def test_complete_partial_file_is_kept(server, client, make_downloader, filing):
+    downloader = make_downloader(client)
+    path = downloader.path_for(NUMBER, filing)
+    os.makedirs(os.path.dirname(path))
+    with open(path + ".part", "wb") as f:
+        f.write(server.dataset.document(filing["transaction_id"]))
+
+    assert downloader.download(NUMBER, filing)["status"] == "resumed"
+    assert os.path.exists(path)
+
+
+def test_oversized_partial_file_is_downloaded_again(server, client, make_downloader, filing):
+    downloader = make_downloader(client)
+    content = server.dataset.document(filing["transaction_id"])
+    path = downloader.path_for(NUMBER, filing)
+    os.makedirs(os.path.dirname(path))
+    with open(path + ".part", "wb") as f:
+        f.write(b"x" * (len(content) + 10))
+
+    assert downloader.download(NUMBER, filing)["status"] == "downloaded"
+    with open(path, "rb") as f:
+        assert f.read() == content
+
+
+def test_missing_document_is_unavailable(client, make_downloader, filing):
+    filing = dict(filing, links={"document_metadata": "/document/missing"})
+
+    assert make_downloader(client).download(NUMBER, filing)["status"] == "unavailable"
+
+
+@pytest.mark.parametrize("records", [False, True])
+def test_download_company_fetches_the_chosen_categories(server, make_client, make_downloader, records):
+    downloader = make_downloader(make_client(records=records))
+    results = downloader.download_company(NUMBER)
+
+    filings = [server.dataset.filing_item(1, position) for position in range(server.dataset.filings_per_company)]
+    expected = [filing["transaction_id"] for filing in filings if filing["category"] in downloader.categories]
+    assert expected
+    assert [result["transaction_id"] for result in results] == expected
+    assert {result["status"] for result in results} == {"downloaded"}
@@ -0,0 +1,80 @@
+import time
+
+from response_cache import CacheEntry, MemoryCache, ResponseCache, SQLiteCache
+
+NUMBER = "00000001"
+
+
+def test_fresh_response_is_served_from_the_cache(server, make_client):
+    client = make_client(cache=ResponseCache())
+    first = client.get_company_profile(NUMBER)
+    requests = server.stats["requests"]
+
+    assert client.get_company_profile(NUMBER) == first
+    assert server.stats["requests"] == requests
+
+
+def test_expired_response_is_revalidated_with_its_etag(server, make_client):
+    client = make_client(cache=ResponseCache(ttl_rules=[(r"^/company/", 0)]))
+    first = client.get_company_profile(NUMBER)
+    assert client.cache.get(f"/company/{NUMBER}").etag
+
+    assert client.get_company_profile(NUMBER) == first
+    assert server.stats["not_modified"] == 1
+    assert client.metrics.totals()["not_modified"] == 1
+
+
+def test_fresh_flag_revalidates_a_fresh_entry(server, make_client):
+    client = make_client(cache=ResponseCache())
+    client.get_company_profile(NUMBER)
+
+    client.get_company_profile(NUMBER, fresh=True)
+    assert server.stats["not_modified"] == 1
+
+
+def test_not_modified_extends_the_entry_lifetime(make_client):
+    client = make_client(cache=ResponseCache(ttl_rules=[(r"^/company/", 0)]))
+    client.get_company_profile(NUMBER)
+    client.cache.ttl_rules = []  # Revalidations now get the default TTL
+
+    client.get_company_profile(NUMBER)
+    assert client.cache.get(f"/company/{NUMBER}").is_fresh()
+
+
+def test_slower_tier_hits_are_promoted(tmp_path):
+    memory = MemoryCache()
+    disk = SQLiteCache(str(tmp_path / "responses.sqlite3"))
+    cache = ResponseCache(tiers=[memory, disk])
+    disk.set("/company/1", CacheEntry({"company_number": "1"}, '"etag"', time.time() + 60))
+
+    assert cache.get("/company/1").data == {"company_number": "1"}
+    assert memory.get("/company/1").etag == '"etag"'
+    cache.close()
+
+
+def test_sqlite_cache_persists_between_instances(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    cache = SQLiteCache(path)
+    cache.set("/company/1", CacheEntry({"company_number": "1"}, '"etag"', time.time() + 60))
+    cache.get("/company/1")
+    cache.close()
+
+    reopened = SQLiteCache(path)
+    entry = reopened.get("/company/1")
+    assert (entry.data, entry.etag) == ({"company_number": "1"}, '"etag"')
+    reopened.close()
+
+
+def test_sqlite_cache_evicts_least_recently_read(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "responses.sqlite3"), max_entries=3)
+    for key in ("a", "b", "c"):
+        cache.set(key, CacheEntry({}, None, time.time() + 60))
+        time.sleep(0.01)
+    cache.get("a")  # Only remembered in memory until the next write
+
+    cache.set("d", CacheEntry({}, None, time.time() + 60))
+    cache.close()  # Evicts down to max_entries
+
+    reopened = SQLiteCache(cache.path)
+    assert [key for key in "abcd" if reopened.get(key) is not None] == ["a", "c", "d"]
+    reopened.close()
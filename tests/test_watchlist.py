@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from companies_house_api import RequestFailed
+from watchlist import Watchlist, WatchlistStore, diff_pscs, psc_digest
+
+NUMBER = "00000001"
+
+
+@pytest.fixture
+def watchlist(client, tmp_path):
+    watchlist = Watchlist(client, WatchlistStore(str(tmp_path / "watchlist.sqlite3")))
+    watchlist.add([NUMBER])
+    yield watchlist
+    watchlist.close()
+
+
+def kinds(events):
+    return sorted(event.kind for event in events)
+
+
+def test_first_check_only_records_a_baseline(watchlist):
+    assert watchlist.poll_all() == []
+    state = watchlist.store.get(NUMBER)
+    assert state.baselined
+    assert state.last_transaction_id is not None
+    assert state.psc_digest is not None
+
+
+def test_unchanged_company_reports_nothing(watchlist):
+    watchlist.poll_all()
+    assert watchlist.poll_all() == []
+
+
+def test_new_filing_is_reported_once(server, watchlist):
+    watchlist.poll_all()
+    change = server.dataset.record_change(NUMBER, "filing")
+
+    events = watchlist.poll_all()
+    assert [event.detail["transaction_id"] for event in events if event.kind == "new_filing"] == [
+        change["filing"]["transaction_id"]]
+    assert watchlist.poll_all() == []
+
+
+def test_status_change_is_reported(server, watchlist):
+    watchlist.poll_all()
+    server.dataset.record_change(NUMBER, "status")
+
+    events = watchlist.poll_all()
+    assert "status_change" in kinds(events)
+    status = next(event for event in events if event.kind == "status_change")
+    assert status.detail["from"] == "active"
+
+
+def test_psc_change_is_reported(server, watchlist):
+    watchlist.poll_all()
+    server.dataset.record_change(NUMBER, "psc")
+
+    assert kinds(watchlist.poll_all()) == ["new_filing", "psc_change"]
+
+
+def test_company_without_filings_is_baselined(watchlist, client):
+    client.get_filing_history = lambda *args, **kwargs: None  # A 404: nothing filed yet
+
+    watchlist.poll_all()
+    state = watchlist.store.get(NUMBER)
+    assert state.baselined and state.last_transaction_id is None
+
+
+def test_failed_check_is_repeated_without_losing_the_change(server, watchlist, client):
+    watchlist.poll_all()
+    server.dataset.record_change(NUMBER, "psc")
+    get_pscs = client.get_persons_with_significant_control
+
+    def failing(*args, **kwargs):
+        raise RequestFailed(f"/company/{NUMBER}/persons-with-significant-control", "timed out")
+
+    client.get_persons_with_significant_control = failing
+    assert watchlist.poll_all() == []
+    state = watchlist.store.get(NUMBER)
+    assert state.next_check_at <= time.time() + watchlist.retry_delay
+
+    client.get_persons_with_significant_control = get_pscs
+    assert kinds(watchlist.poll_all()) == ["new_filing", "psc_change"]
+
+
+def test_failed_first_psc_fetch_takes_no_baseline(watchlist, client):
+    def failing(*args, **kwargs):
+        raise RequestFailed(f"/company/{NUMBER}/persons-with-significant-control", "timed out")
+
+    client.get_persons_with_significant_control = failing
+    watchlist.poll_all()
+
+    assert watchlist.store.get(NUMBER).psc_digest is None
+
+
+def test_diff_pscs():
+    old = psc_digest({"items": [{"name": "Alice"}, {"name": "Bob"}]})
+    new = psc_digest({"items": [{"name": "Alice"}, {"name": "Bob", "ceased_on": "2024-01-01"}, {"name": "Carol"}]})
+
+    assert diff_pscs(old, new) == {"added": ["Carol"], "removed": [], "ceased": ["Bob"], "changed": []}
@@ -1,7 +1,45 @@
 
+import bisect
 import curses
+import logging
+import os
+import sys
 import textwrap
+import time
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
 from companies_house_api import CompaniesHouseAPI
+from company_index import CompanyIndex, default_index_path, normalise_name
+from document_downloader import DocumentDownloader, format_result
+from filing_analytics import FilingTable, format_filing_summary
+from fuzzy_match import FuzzyIndex
+from officer_network import NetworkCrawler, format_network
+from officer_previews import AppointmentPreviews, group_duplicates
+from prefetch import Prefetcher
+from psc_engine import NATURES, OwnershipResolver, format_ultimate_owners
+from response_cache import ResponseCache
+
+logger = logging.getLogger(__name__)
+
+# Jobs that themselves fan out onto the client's worker pool (e.g. network crawls)
+# run here, so they can never tie up the pool they are waiting on.
+background_jobs = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tui-background")
+
+# Filing histories are walked here for as long as their tab is open, each
+# prefetching its next page on the client's pool, so they get a pool of their own.
+history_streams = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tui-history")
+
+# Document downloads can run for minutes and outlive the company they were started
+# from, so they queue here rather than hold up the Owners and Network tabs.
+document_jobs = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tui-documents")
+
+# Every company and officer search result seen this session, for instant local
+# matches while a new search is still on its way.
+seen_companies = FuzzyIndex()
+seen_officers = FuzzyIndex()
+
+# Search results prefetched as soon as a company search returns.
+PREFETCH_TOP_RESULTS = 3
 
 def draw_frame(stdscr, title, help_text):
     # ... (this function remains the same)
@@ -24,7 +62,7 @@ def draw_frame(stdscr, title, help_text):
     stdscr.addstr(0, 2, f" {title} ", curses.color_pair(1))
 
     stdscr.attron(curses.color_pair(3))
-    stdscr.addstr(h - 1, 1, help_text.ljust(w - 2))
+    stdscr.addstr(h - 1, 1, help_text[:w - 2].ljust(w - 2))
     stdscr.attroff(curses.color_pair(3))
 
     stdscr.refresh( )
@@ -46,155 +84,696 @@ def show_status_message(stdscr, message):
     stdscr.addstr(y, x, message)
     stdscr.refresh()
 
-def select_from_list(stdscr, items, title):
-    """Scrollable list selection TUI component. Returns selected item or navigation signal."""
-    help_text = "↑/↓ Navigate | ↵ Select | q New Search"
+def select_from_list(stdscr, items, title, on_highlight=None, neighbours=2, describe=None):
+    """
+    Scrollable list selection TUI component. Returns selected item or navigation signal.
+
+    Items are strings or (label, value) tuples, in which case the value of the
+    chosen item is returned. '/' filters the list as you type, best matches
+    first (see fuzzy_match.FuzzyIndex).
+
+    If `on_highlight` is given, it is called whenever the highlighted row
+    changes, with the values of that row and of up to `neighbours` rows either
+    side, nearest first (e.g. to prefetch them).
+
+    If `describe` is given, each row's label is followed by describe(value),
+    which is read again every time the list is drawn; the list is redrawn
+    several times a second, so text that is filled in in the background (e.g.
+    previews) appears as it arrives.
+    """
+    help_text = "↑/↓ Navigate | ↵ Select | / Filter | q New Search"
+    filter_help = "Type to filter | ↑/↓ Navigate | ↵ Done | Esc Clear"
     content_win = draw_frame(stdscr, title, help_text)
     if content_win is None:
         return None # Terminal too small
     h, w = content_win.getmaxyx()
+    labels = [item[0] if isinstance(item, tuple) else item for item in items]
+    index = None # Built on first use of the filter
+    shown = range(len(items)) # Positions of the items listed, in display order
+    query = ""
+    editing = False
     current_row = 0
     scroll_pos = 0
+    highlighted = None
     
-    while True:
-        content_win.clear()
-        
-        # Calculate viewport
-        visible_items = items[scroll_pos : scroll_pos + h]
+    if describe is not None:
+        stdscr.timeout(250)
+    try:
+        while True:
+            if on_highlight is not None and shown and (current_row, shown[current_row]) != highlighted:
+                highlighted = (current_row, shown[current_row])
+                rows_nearby = [current_row]
+                for distance in range(1, neighbours + 1):
+                    rows_nearby += [current_row + distance, current_row - distance]
+                on_highlight([
+                    item[1] if isinstance(item, tuple) else item
+                    for item in (items[shown[row]] for row in rows_nearby if 0 <= row < len(shown))
+                ])
+
+            content_win.erase() # Not clear(): redrawing for new descriptions mustn't flicker
+            top = 1 if editing or query else 0 # First row holds the filter when there is one
+            rows = max(1, h - top)
+            if top:
+                status = f"/{query}" + ("_" if editing else "") + f"  ({len(shown)} of {len(items)})"
+                content_win.addstr(0, 2, status[:w - 3], curses.color_pair(1))
+
+            # Calculate viewport
+            visible_items = shown[scroll_pos : scroll_pos + rows]
         
-        for idx, item in enumerate(visible_items):
-            actual_idx = scroll_pos + idx
-            truncated_item = item[:w-3]
-
-            if actual_idx == current_row:
-                content_win.attron(curses.color_pair(2))
-                content_win.addstr(idx, 2, truncated_item)
-                content_win.attroff(curses.color_pair(2))
+            for idx, position in enumerate(visible_items):
+                actual_idx = scroll_pos + idx
+                label = labels[position]
+                if describe is not None:
+                    item = items[position]
+                    description = describe(item[1] if isinstance(item, tuple) else item)
+                    if description:
+                        label = f"{label} | {description}"
+                truncated_item = label[:w-3]
+
+                if actual_idx == current_row:
+                    content_win.attron(curses.color_pair(2))
+                    content_win.addstr(top + idx, 2, truncated_item)
+                    content_win.attroff(curses.color_pair(2))
+                else:
+                    content_win.addstr(top + idx, 2, truncated_item)
+            content_win.refresh()
+
+            key = stdscr.getch()
+            if editing and key == 27: # Esc: drop the filter
+                editing, query = False, ""
+            elif editing and (key in (curses.KEY_BACKSPACE, 127, 8) or 32 <= key < 127):
+                query = query[:-1] if key in (curses.KEY_BACKSPACE, 127, 8) else query + chr(key)
+            elif editing and (key == curses.KEY_ENTER or key in [10, 13]):
+                editing = False
+                content_win = draw_frame(stdscr, title, help_text)
+                if content_win is None:
+                    return None
+                continue
+            elif key == ord('/'):
+                editing = True
+                if index is None:
+                    index = FuzzyIndex((label, position) for position, label in enumerate(labels))
+                content_win = draw_frame(stdscr, title, filter_help)
+                if content_win is None:
+                    return None
+                continue
+            elif key == ord('q'): return "BACK_TO_NEW_SEARCH"
+            elif key == curses.KEY_RESIZE:
+                content_win = draw_frame(stdscr, title, filter_help if editing else help_text)
+                if content_win is None:
+                    return None
+                h, w = content_win.getmaxyx()
+                rows = max(1, h - top)
+                if current_row >= scroll_pos + rows:
+                    scroll_pos = current_row - rows + 1
+                continue
+            elif key == curses.KEY_UP:
+                if current_row > 0:
+                    current_row -= 1
+                    if current_row < scroll_pos:
+                        scroll_pos = current_row
+                continue
+            elif key == curses.KEY_DOWN:
+                if current_row < len(shown) - 1:
+                    current_row += 1
+                    if current_row >= scroll_pos + rows:
+                        scroll_pos = current_row - rows + 1
+                continue
+            elif key == curses.KEY_ENTER or key in [10, 13]:
+                if shown:
+                    item = items[shown[current_row]]
+                    return item[1] if isinstance(item, tuple) else item
+                continue
+            else:
+                continue
+
+            # The filter changed: re-rank and go back to the top of the list.
+            if not editing:
+                content_win = draw_frame(stdscr, title, help_text)
+                if content_win is None:
+                    return None
+            shown = index.positions(query) if query else range(len(items))
+            current_row = scroll_pos = 0
+    finally:
+        if describe is not None:
+            stdscr.timeout(-1)
+
+class LiveSearch:
+    """
+    Runs a search for the query as it is being typed, off the UI thread.
+
+    Keystrokes are debounced, only one request is in flight at a time, and
+    results that arrive for an outdated query are discarded. Completed result
+    sets are kept per query, so when a longer query extends a prefix whose
+    results were complete it is answered by filtering locally, without a
+    network round-trip. Otherwise, while the search runs, the best matches
+    among the results seen so far (`seen`) are shown.
+    """
+
+    def __init__(self, search_fn, executor, debounce=0.25, min_length=2, seen=None, identify=None, local_limit=50):
+        self.search_fn = search_fn
+        self.executor = executor
+        self.debounce = debounce
+        self.min_length = min_length
+        self.seen = seen # FuzzyIndex of result items
+        self.identify = identify # item -> key identifying the entity, for de-duplicating `seen`
+        self.local_limit = local_limit
+
+        self.query = ""
+        self.results = None # Latest results shown to the user
+        self.results_query = None # Query the shown results belong to
+        self._prefix_cache = {}
+        self._due_at = None
+        self._pending = None
+        self._pending_query = None
+
+    @staticmethod
+    def _matches(item, query_words):
+        title_words = normalise_name(item.get('title', ''), drop_suffix=False).split()
+        return all(any(word.startswith(q) for word in title_words) for q in query_words)
+
+    def _from_prefix_cache(self, query):
+        """Returns (results, complete) built from the longest cached prefix of `query`."""
+        for length in range(len(query), self.min_length - 1, -1):
+            cached = self._prefix_cache.get(query[:length])
+            if cached is None:
+                continue
+            if length == len(query):
+                return cached, True
+            words = normalise_name(query, drop_suffix=False).split()
+            items = [item for item in cached.get('items', []) if self._matches(item, words)]
+            # Only a full API result set can answer a longer query. The local index
+            # ranks fuzzy matches, so its results for a prefix needn't hold the
+            # best ones for the longer query, and its total is unknown when cut off.
+            total = cached.get('total_results')
+            complete = (cached.get('source') != "local_index" and total is not None
+                        and total <= len(cached.get('items', [])))
+            return dict(cached, items=items, total_results=len(items) if complete else None), complete
+        return None, False
+
+    def update(self, query):
+        """Records a new query; the search itself runs from poll() once the input settles."""
+        if query == self.query:
+            return
+        self.query = query
+        self._due_at = None
+        if len(query.strip()) < self.min_length:
+            self.results, self.results_query = None, None
+            return
+        results, complete = self._from_prefix_cache(query.strip().lower())
+        if results is None and self.seen:
+            items = self.seen.search(query, limit=self.local_limit)
+            if items:
+                results = {'items': items, 'total_results': len(items)}
+        if results is not None:
+            self.results, self.results_query = results, query
+        if not complete:
+            self._due_at = time.monotonic() + self.debounce
+
+    @property
+    def settled(self):
+        """True when the shown results belong to the current query and no search for it is still running."""
+        return self._due_at is None and self._pending is None and self.results_query == self.query
+
+    def poll(self):
+        """Collects finished searches and starts due ones. Returns True if the results changed."""
+        changed = False
+        if self._pending is not None and self._pending.done():
+            future, query = self._pending, self._pending_query
+            self._pending, self._pending_query = None, None
+            try:
+                results = future.result()
+            except Exception:
+                results = None
+            if results is not None:
+                self._prefix_cache[query.strip().lower()] = results
+                if self.seen is not None:
+                    for item in results.get('items', []):
+                        identity = self.identify(item) if self.identify else None
+                        self.seen.add(item.get('title', ''), item, identity)
+            if query == self.query: # Otherwise stale: the user has typed on since
+                self.results, self.results_query = results, query
+                changed = True
+
+        if self._due_at is not None and self._pending is None and time.monotonic() >= self._due_at:
+            self._due_at = None
+            self._pending_query = self.query
+            self._pending = self.executor.submit(self.search_fn, self.query)
+        return changed
+
+    def cancel(self):
+        if self._pending is not None:
+            self._pending.cancel()
+        self._pending = None
+        self._due_at = None
+
+
+def live_search_prompt(stdscr, title, prompt, live_search, format_item):
+    """
+    Search box that shows results while the user types. The UI stays responsive
+    while searches run in the background.
+
+    Returns:
+        tuple: (query, results) once Enter is pressed and the results for the
+               final query are in, or (None, None) if the user pressed Esc.
+    """
+    help_text = "Type to search | ↵ Show Results | Esc Back"
+    input_win = draw_frame(stdscr, title, help_text)
+    if input_win is None:
+        stdscr.getch() # Wait for user to acknowledge "Terminal too small"
+        return None, None
+    h, w = input_win.getmaxyx()
+
+    query = ""
+    submitted = False
+    curses.curs_set(1)
+    stdscr.timeout(50)
+    try:
+        while True:
+            live_search.poll()
+            if submitted and len(query.strip()) >= live_search.min_length and live_search.settled:
+                return query, live_search.results
+
+            input_win.erase()
+            input_win.addstr(1, 2, prompt)
+            results = live_search.results
+            if submitted:
+                status = "Searching..."
+            elif results is None:
+                status = ""
             else:
-                content_win.addstr(idx, 2, truncated_item)
-        content_win.refresh()
-
-        key = stdscr.getch()
-        if key == ord('q'): return "BACK_TO_NEW_SEARCH"
-        elif key == curses.KEY_UP:
-            if current_row > 0:
-                current_row -= 1
-                if current_row < scroll_pos:
-                    scroll_pos = current_row
-        elif key == curses.KEY_DOWN:
-            if current_row < len(items) - 1:
-                current_row += 1
-                if current_row >= scroll_pos + h:
-                    scroll_pos = current_row - h + 1
-        elif key == curses.KEY_ENTER or key in [10, 13]:
-            return items[current_row]
-
-def display_tabbed_viewer(stdscr, tab_data, title):
-    """A text viewer with a correctly implemented horizontal tabbed interface. Returns navigation signal."""
-    help_text = "←/→ Switch Tabs | ↑/↓ Scroll | b Back to List | q New Search"
+                total = results.get('total_results')
+                status = f"{len(results.get('items', []))}+ results" if total is None else f"{total} results"
+                if not live_search.settled:
+                    status += " (updating...)"
+            input_win.addstr(5, 2, status[:w - 4], curses.color_pair(1))
+            if results:
+                for idx, item in enumerate(results.get('items', [])[:max(0, h - 7)]):
+                    input_win.addstr(6 + idx, 4, format_item(item)[:w - 6])
+            input_win.addstr(3, 2, query[-(w - 5):])
+            input_win.refresh()
+
+            try:
+                key = stdscr.get_wch()
+            except curses.error:
+                continue # Timed out: go round again to collect results
+
+            if key == '\x1b':
+                live_search.cancel()
+                return None, None
+            elif key in ('\n', '\r') or key == curses.KEY_ENTER:
+                if not query.strip():
+                    return query, None
+                submitted = True
+                if len(query.strip()) < live_search.min_length:
+                    live_search.min_length = 1
+                    live_search.update("")
+                    live_search.update(query)
+            elif key in (curses.KEY_BACKSPACE, '\b', '\x7f'):
+                query = query[:-1]
+                live_search.update(query)
+            elif key == curses.KEY_RESIZE:
+                input_win = draw_frame(stdscr, title, help_text)
+                if input_win is None:
+                    return None, None
+                h, w = input_win.getmaxyx()
+            elif isinstance(key, str) and key.isprintable() and len(query) < 60:
+                query += key
+                live_search.update(query)
+    finally:
+        stdscr.timeout(-1)
+        curses.curs_set(0)
+
+
+class TabDocument:
+    """
+    Content of one viewer tab, kept as a list of logical lines.
+
+    Lines are only wrapped when they scroll into view, and the result is cached
+    per terminal width, so a tab with thousands of records opens instantly and a
+    resize only re-wraps what is on screen. A background loader may keep
+    appending lines while the tab is displayed (see `loading`).
+    """
+
+    def __init__(self, lines=None, loading=False):
+        self.lines = list(lines or [])
+        self.loading = loading
+        self.cancelled = False
+        self._layouts = {}
+
+    @classmethod
+    def from_content(cls, content):
+        """Wraps a string, a list of lines or an existing TabDocument."""
+        if isinstance(content, TabDocument):
+            return content
+        if isinstance(content, str):
+            return cls(content.split('\n'))
+        return cls(content)
+
+    def extend(self, lines):
+        self.lines.extend(lines)
+
+    def finish(self):
+        self.loading = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _layout(self, width):
+        layout = self._layouts.get(width)
+        if layout is None:
+            if len(self._layouts) >= 4: # Only keep layouts for the last few widths
+                self._layouts.pop(next(iter(self._layouts)))
+            layout = self._layouts[width] = {"starts": array('I', [0]), "rows": {}}
+        return layout
+
+    def _wrap(self, layout, width, index):
+        line = self.lines[index]
+        if len(line) <= width:
+            return [line]
+        rows = layout["rows"].get(index)
+        if rows is None:
+            if len(layout["rows"]) > 2048:
+                layout["rows"].clear()
+            rows = textwrap.wrap(line, width, replace_whitespace=False, drop_whitespace=False) or ['']
+            layout["rows"][index] = rows
+        return rows
+
+    def ensure_rows(self, width, count):
+        """Wraps lines until at least `count` rows exist. Returns the number of rows known so far."""
+        layout = self._layout(width)
+        starts = layout["starts"]
+        while starts[-1] < count and len(starts) <= len(self.lines):
+            index = len(starts) - 1
+            line = self.lines[index]
+            starts.append(starts[-1] + (1 if len(line) <= width else len(self._wrap(layout, width, index))))
+        return starts[-1]
+
+    def rows(self, width, top, count):
+        """Returns the wrapped rows top..top+count-1 (fewer at the end of the document)."""
+        self.ensure_rows(width, top + count)
+        layout = self._layout(width)
+        starts = layout["starts"]
+        index = bisect.bisect_right(starts, top) - 1
+        rows = []
+        while len(rows) < count and index < len(starts) - 1:
+            line_rows = self._wrap(layout, width, index)
+            skip = top - starts[index] if not rows else 0
+            rows.extend(line_rows[skip:])
+            index += 1
+        return rows[:count]
+
+
+def display_tabbed_viewer(stdscr, tab_data, title, actions=None):
+    """
+    A text viewer with a correctly implemented horizontal tabbed interface. Returns navigation signal.
+
+    Tab contents may be strings, lists of lines, TabDocuments or Futures resolving
+    to any of those. Tabs whose data is still loading show an indicator and render
+    as soon as it arrives; Esc cancels any outstanding loads and goes back to the list.
+    Only the rows in view are wrapped and drawn.
+
+    `actions` maps a key to (help label, callable). Pressing the key calls it
+    for a (tab name, content) pair, which is opened as a new tab (or switched to,
+    if a tab of that name is already open).
+    """
+    actions = actions or {}
+    help_text = "←/→ Switch Tabs | ↑/↓ PgUp/PgDn Scroll | " + "".join(
+        f"{key} {label} | " for key, (label, _) in actions.items()
+    ) + "b Back to List | Esc Cancel | q New Search"
     content_win = draw_frame(stdscr, title, help_text)
     if content_win is None:
+        cancel_pending_tabs(tab_data)
         return None # Terminal too small
     h, w = content_win.getmaxyx()
     
     tab_names = list(tab_data.keys())
     current_tab = 0
-    pads = {}
-    pad_pos = {}
-
-    for tab_name, content in tab_data.items():
-        lines = content.split('\n')
-        wrapped_lines = []
-        for line in lines:
-            wrapped_lines.extend(textwrap.wrap(line, w - 4, replace_whitespace=False, drop_whitespace=False))
-        
-        pad = curses.newpad(max(1, len(wrapped_lines)), w)
-        pad.keypad(True)
-        for i, line in enumerate(wrapped_lines):
-            pad.addstr(i, 0, line)
-        pads[tab_name] = pad
-        pad_pos[tab_name] = 0
+    documents = {}
+    scroll_pos = {tab_name: 0 for tab_name in tab_names}
+    spinner = "|/-\\"
+    tick = 0
+    margin = 10 # Rows wrapped ahead of the viewport so scrolling stays smooth
 
-    while True:
-        content_win.clear()
-        
-        x_pos = 2
-        for i, name in enumerate(tab_names):
-            if i == current_tab:
-                content_win.attron(curses.color_pair(2))
-                content_win.addstr(0, x_pos, f" {name} ")
-                content_win.attroff(curses.color_pair(2))
+    stdscr.timeout(100) # Wake up regularly to pick up tabs that finished loading
+    try:
+        while True:
+            for tab_name in tab_names:
+                if tab_name not in documents:
+                    content = resolve_tab_content(tab_data[tab_name])
+                    if content is not None:
+                        documents[tab_name] = TabDocument.from_content(content)
+
+            view_h, wrap_w = h - 2, w - 4
+            content_win.erase()
+            
+            x_pos = 2
+            for i, name in enumerate(tab_names):
+                document = documents.get(name)
+                loaded = document is not None and not document.loading
+                label = f" {name} " if loaded else f" {name} {spinner[tick % len(spinner)]} "
+                if i == current_tab:
+                    content_win.attron(curses.color_pair(2))
+                    content_win.addstr(0, x_pos, label)
+                    content_win.attroff(curses.color_pair(2))
+                else:
+                    content_win.attron(curses.color_pair(4))
+                    content_win.addstr(0, x_pos, label)
+                    content_win.attroff(curses.color_pair(4))
+                x_pos += len(label) + 2
+            
+            content_win.addstr(1, 1, "=" * (w - 2), curses.color_pair(1))
+
+            current_name = tab_names[current_tab]
+            document = documents.get(current_name)
+            if document is None or not document.lines:
+                content_win.addstr(3, 2, "Loading...")
+                known_rows = 0
             else:
-                content_win.attron(curses.color_pair(4))
-                content_win.addstr(0, x_pos, f" {name} ")
-                content_win.attroff(curses.color_pair(4))
-            x_pos += len(name) + 4
-        
-        content_win.addstr(1, 1, "=" * (w - 2), curses.color_pair(1))
-        content_win.refresh()
+                top = scroll_pos[current_name]
+                known_rows = document.ensure_rows(wrap_w, top + view_h + margin)
+                for i, row in enumerate(document.rows(wrap_w, top, view_h)):
+                    content_win.addstr(2 + i, 2, row)
+            content_win.refresh()
 
-        current_pad = pads[tab_names[current_tab]]
-        max_scroll = max(0, current_pad.getmaxyx()[0] - (h - 2))
+            key = stdscr.getch()
 
-        current_pad.refresh(pad_pos[tab_names[current_tab]], 0, 4, 3, h, w-1) 
+            if key == -1:
+                tick += 1
+                continue
+            elif key == ord('q'):
+                cancel_pending_tabs(tab_data)
+                return "BACK_TO_NEW_SEARCH"
+            elif key == ord('b') or key == 27: # 27 = Esc
+                cancel_pending_tabs(tab_data)
+                return "BACK_TO_LIST"
+            elif key == curses.KEY_RESIZE:
+                content_win = draw_frame(stdscr, title, help_text)
+                if content_win is None:
+                    cancel_pending_tabs(tab_data)
+                    return None
+                h, w = content_win.getmaxyx()
+            elif key == curses.KEY_LEFT:
+                current_tab = (current_tab - 1 + len(tab_names)) % len(tab_names)
+                scroll_pos[tab_names[current_tab]] = 0
+            elif key == curses.KEY_RIGHT:
+                current_tab = (current_tab + 1) % len(tab_names)
+                scroll_pos[tab_names[current_tab]] = 0
+            elif 0 <= key < 256 and chr(key) in actions:
+                tab_name, content = actions[chr(key)][1]()
+                if tab_name not in tab_data:
+                    tab_data[tab_name] = content
+                    tab_names.append(tab_name)
+                    scroll_pos[tab_name] = 0
+                current_tab = tab_names.index(tab_name)
+            elif document is not None:
+                top = scroll_pos[current_name]
+                if key == curses.KEY_UP:
+                    top -= 1
+                elif key == curses.KEY_PPAGE:
+                    top -= view_h
+                elif key == curses.KEY_HOME:
+                    top = 0
+                elif key == curses.KEY_DOWN:
+                    top += 1
+                elif key == curses.KEY_NPAGE:
+                    top += view_h
+                elif key == curses.KEY_END:
+                    top = document.ensure_rows(wrap_w, float('inf'))
+                if top > scroll_pos[current_name]:
+                    known_rows = document.ensure_rows(wrap_w, top + view_h)
+                    top = min(top, max(0, known_rows - view_h))
+                scroll_pos[current_name] = max(0, top)
+    finally:
+        stdscr.timeout(-1)
 
-        key = stdscr.getch()
+def resolve_tab_content(value):
+    """Returns a tab's content, or None while its Future is still loading."""
+    if not isinstance(value, Future):
+        return value
+    if not value.done():
+        return None
+    if value.cancelled():
+        return "Loading was cancelled."
+    try:
+        return value.result()
+    except Exception as e:
+        return f"Failed to load: {e}"
 
-        if key == ord('q'): return "BACK_TO_NEW_SEARCH"
-        elif key == ord('b'): return "BACK_TO_LIST"
-        elif key == curses.KEY_LEFT:
-            current_tab = (current_tab - 1 + len(tab_names)) % len(tab_names)
-            pad_pos[tab_names[current_tab]] = 0
-        elif key == curses.KEY_RIGHT:
-            current_tab = (current_tab + 1) % len(tab_names)
-            pad_pos[tab_names[current_tab]] = 0
-        elif key == curses.KEY_UP:
-            pad_pos[tab_names[current_tab]] = max(0, pad_pos[tab_names[current_tab]] - 1)
-        elif key == curses.KEY_DOWN:
-            pad_pos[tab_names[current_tab]] = min(max_scroll, pad_pos[tab_names[current_tab]] + 1)
+def cancel_pending_tabs(tab_data):
+    """Cancels tab loads that haven't finished; results of running requests are discarded."""
+    for value in tab_data.values():
+        if isinstance(value, Future):
+            value.cancel()
+        elif isinstance(value, TabDocument):
+            value.cancel()
 
 def parse_control_percentages(natures):
-    # ... (this function remains the same) ...
-    voting_lower, voting_upper = 0, 0
-    shares_lower, shares_upper = 0, 0
-
-    control_ranges = {
-        "75-to-100-percent": (75, 100),
-        "50-to-75-percent": (50, 75),
-        "25-to-50-percent": (25, 50),
-        "10-to-25-percent": (10, 25)
-    }
-
-    for nature in natures:
-        for key_phrase, (lower, upper) in control_ranges.items():
-            if key_phrase in nature:
-                if "voting-rights" in nature:
-                    if lower > voting_lower: voting_lower = lower
-                    if upper > voting_upper: voting_upper = upper
-                elif "ownership-of-shares" in nature:
-                    if lower > shares_lower: shares_lower = lower
-                    if upper > shares_upper: shares_upper = upper
-    
-    return (voting_lower, voting_upper), (shares_lower, shares_upper)
+    """
+    Returns ((voting_lower, voting_upper), (shares_lower, shares_upper)) for a
+    PSC's natures of control. Each distinct nature string is parsed once and
+    cached (see psc_engine.NatureCodes).
+    """
+    return NATURES.ranges(natures)
 
 
-def company_search_flow(stdscr, client):
-    help_text = "↵ Enter | Ctrl+C to Cancel/Exit"
-    input_win = draw_frame(stdscr, "Search Companies", help_text)
-    if input_win is None:
-        stdscr.getch() # Wait for user to acknowledge "Terminal too small"
-        return # Exit to main menu
+def format_company_profile(profile):
+    """Builds the Profile tab lines for a company."""
+    if not profile:
+        return ["No profile data found."]
+    address = profile.get('registered_office_address', {})
+    return [
+        f"Name:     {profile.get('company_name')}",
+        f"Status:   {profile.get('company_status')}",
+        f"Address:  {address.get('address_line_1')}, {address.get('postal_code')}",
+        f"Type:     {profile.get('type')}",
+        f"Jurisdiction: {profile.get('jurisdiction')}",
+    ]
 
-    input_win.addstr(1, 2, "Enter company name to search: ")
-    curses.echo()
-    curses.curs_set(1)
-    search_query = input_win.getstr(3, 2, 60).decode('utf-8')
-    curses.noecho()
-    curses.curs_set(0)
+def format_filing_item(item):
+    """Builds the lines of one Filing History record."""
+    marker = ""
+    description_lower = item.get('description', '').lower()
+    if "dormant" in description_lower or "active" in description_lower:
+        marker = "*** STATUS CHANGE *** "
+    return [
+        f"{marker}Date: {item.get('date', 'N/A')}",
+        f"  Desc: {item.get('description', 'N/A')}",
+        f"  Type: {item.get('type', 'N/A')}",
+        "",
+    ]
+
+def format_filing_history(filing):
+    """Builds the Filing History tab lines from one page of filing history."""
+    if not filing or not filing.get('items'):
+        return ["No filing history found."]
+    lines = []
+    for item in filing['items']:
+        lines.extend(format_filing_item(item))
+    return lines
+
+def stream_filing_history(client, company_number, document, summary=None):
+    """
+    Fills `document` with a company's complete filing history, page by page, so
+    the tab shows the newest filings while older pages are still loading.
+    Runs on a history_streams thread (never the client's pool, which it
+    prefetches pages on); stops early if the document is cancelled.
+
+    If a `summary` Future is given, the filings are also collected into a
+    FilingTable and the Future resolves to the Filing Summary tab lines once
+    the history is complete.
+    """
+    table = FilingTable() if summary is not None and summary.set_running_or_notify_cancel() else None
+    items = []
+    try:
+        for item in client.iter_filing_history(company_number, prefetch=True):
+            if document.cancelled:
+                break
+            document.extend(format_filing_item(item))
+            if table is not None:
+                items.append(item)
+        if not document.lines:
+            document.extend(["No filing history found."])
+    except Exception as e:
+        document.extend([f"Failed to load: {e}"])
+    finally:
+        document.finish()
+        if table is not None:
+            table.extend(company_number, items)
+            try:
+                summary.set_result(format_filing_summary(table, company_number))
+            except Exception as e:
+                summary.set_result([f"Failed to summarise: {e}"])
+
+def format_psc(psc):
+    """Builds the lines of one PSC record, with dual bar charts."""
+    name = psc.get('name', 'N/A')
+    status = "Ceased" if psc.get('ceased_on') else "Active"
+    natures = psc.get('natures_of_control', [])
+    
+    (voting_lower, voting_upper), (shares_lower, shares_upper) = parse_control_percentages(natures)
+    
+    # If ceased, set percentages to 0 to reflect no current control
+    if status == "Ceased":
+        voting_lower, voting_upper = 0, 0
+        shares_lower, shares_upper = 0, 0
+    
+    # Bar chart dimensions
+    bar_len_scale = 10 # 1 char for every 10%
+    
+    # Voting Bar
+    voting_bar_lower_len = voting_lower // bar_len_scale
+    voting_bar_range_len = (voting_upper - voting_lower) // bar_len_scale
+    
+    # Shares Bar
+    shares_bar_lower_len = shares_lower // bar_len_scale
+    shares_bar_range_len = (shares_upper - shares_lower) // bar_len_scale
+    
+    # Display Voting Bar
+    voting_line = "  Voting:  "
+    if voting_lower > 0:
+        voting_line += '█' * voting_bar_lower_len
+    if voting_upper > voting_lower:
+        voting_line += '▓' * voting_bar_range_len
+    voting_line += f" ({voting_lower}-{voting_upper}%) ".ljust(20) # Ensure consistent length
+    
+    # Display Shares Bar
+    shares_line = "  Shares:  "
+    if shares_lower > 0:
+        shares_line += '█' * shares_bar_lower_len
+    if shares_upper > shares_lower:
+        shares_line += '▓' * shares_bar_range_len
+    shares_line += f" ({shares_lower}-{shares_upper}%) ".ljust(20)
+    
+    return [
+        f"- Name:    {name}",
+        f"  Status:  {status}",
+        voting_line,
+        shares_line,
+        f"  Natures: {', '.join(natures)}",
+        "",
+    ]
+
+def format_pscs(pscs):
+    """Builds the PSCs tab lines for a company."""
+    if not pscs or not pscs.get('items'):
+        return ["No Persons with Significant Control found or company is exempt."]
+    lines = []
+    for psc in pscs['items']:
+        lines.extend(format_psc(psc))
+    return lines
 
-    if not search_query.strip(): return # Back to main menu if no query
+def company_search_flow(stdscr, client, prefetcher=None, downloader=None):
+    live_search = LiveSearch(client.search_companies, client.executor, seen=seen_companies,
+                             identify=lambda item: item.get('company_number'))
+    search_query, search_results = live_search_prompt(
+        stdscr, "Search Companies", "Enter company name to search: ", live_search,
+        lambda item: f"{item.get('title')} ({item.get('company_number')})",
+    )
 
-    search_results_cache = None # Cache search results for 'back to list' 
+    if search_query is None or not search_query.strip(): return # Back to main menu if no query
+
+    search_results_cache = search_results # Cache search results for 'back to list' 
 
     # Inner loop for viewing search results and company details
     while True:
@@ -210,107 +789,52 @@ def company_search_flow(stdscr, client):
             stdscr.getch()
             break # Break inner loop -> go to outer loop (new search) 
         
-        menu_items = [f"{item.get('title')} ({item.get('company_number')})" for item in search_results['items']]
+        menu_items = [
+            (f"{item.get('title')} ({item.get('company_number')})", item.get('company_number'))
+            for item in search_results['items']
+        ]
+
+        # Warm the cache for the top results and whatever is highlighted while the user browses.
+        on_highlight = None
+        if prefetcher is not None:
+            top_results = [number for _, number in menu_items[:PREFETCH_TOP_RESULTS]]
+            prefetcher.prefetch(top_results)
+            on_highlight = lambda numbers: prefetcher.prefetch(numbers + top_results)
         
-        # Call select_from_list, which now returns a navigation signal or selected item
-        selected_list_result = select_from_list(stdscr, menu_items, "Company Search Results")
+        # Call select_from_list, which now returns a navigation signal or the selected company number
+        company_number = select_from_list(stdscr, menu_items, "Company Search Results", on_highlight)
+        if prefetcher is not None:
+            prefetcher.prefetch([] if company_number in (None, "BACK_TO_NEW_SEARCH") else [company_number])
         
-        if selected_list_result == "BACK_TO_NEW_SEARCH":
+        if company_number == "BACK_TO_NEW_SEARCH":
             break # Break inner loop -> go to outer loop (new search)
-        elif selected_list_result is None: # User pressed q or nothing in select_from_list and exited
+        elif company_number is None: # User pressed q or nothing in select_from_list and exited
             return # Exit to main menu
-        
-        company_number = selected_list_result.split('(')[-1].replace(')', '')
 
-        # --- Step 3: Fetch Data and Prepare Tab Content ---
-        show_status_message(stdscr, "Fetching details...")
-        profile = client.get_company_profile(company_number)
-        filing = client.get_filing_history(company_number)
-        pscs = client.get_persons_with_significant_control(company_number)
-        
-        # --- Profile Tab ---
-        profile_content = ""
-        if profile:
-            profile_content += f"Name:     {profile.get('company_name')}\n"
-            profile_content += f"Status:   {profile.get('company_status')}\n"
-            address = profile.get('registered_office_address', {})
-            profile_content += f"Address:  {address.get('address_line_1')}, {address.get('postal_code')}\n"
-            profile_content += f"Type:     {profile.get('type')}\n" 
-            profile_content += f"Jurisdiction: {profile.get('jurisdiction')}\n"
-        else:
-            profile_content = "No profile data found."
-
-        # --- Filing History Tab ---
-        filing_content = ""
-        if filing and filing.get('items'):
-            for item in filing['items']:
-                marker = ""
-                description_lower = item.get('description', '').lower()
-                if "dormant" in description_lower or "active" in description_lower:
-                    marker = "*** STATUS CHANGE *** "
-                
-                filing_content += f"{marker}Date: {item.get('date', 'N/A')}\n"
-                filing_content += f"  Desc: {item.get('description', 'N/A')}\n"
-                filing_content += f"  Type: {item.get('type', 'N/A')}\n\n"
-        else:
-            filing_content = "No filing history found."
-
-        # --- PSCs Tab (with dual bar charts) ---
-        pscs_content = ""
-        if pscs and pscs.get('items'):
-            for psc in pscs['items']:
-                name = psc.get('name', 'N/A')
-                status = "Ceased" if psc.get('ceased_on') else "Active"
-                natures = psc.get('natures_of_control', [])
-                
-                (voting_lower, voting_upper), (shares_lower, shares_upper) = parse_control_percentages(natures)
-                
-                # If ceased, set percentages to 0 to reflect no current control
-                if status == "Ceased":
-                    voting_lower, voting_upper = 0, 0
-                    shares_lower, shares_upper = 0, 0
-                
-                # Bar chart dimensions
-                bar_len_scale = 10 # 1 char for every 10%
-                
-                # Voting Bar
-                voting_bar_lower_len = voting_lower // bar_len_scale
-                voting_bar_range_len = (voting_upper - voting_lower) // bar_len_scale
-                
-                # Shares Bar
-                shares_bar_lower_len = shares_lower // bar_len_scale
-                shares_bar_range_len = (shares_upper - shares_lower) // bar_len_scale
-                
-                pscs_content += f"- Name:    {name}\n"
-                pscs_content += f"  Status:  {status}\n"
-                
-                # Display Voting Bar
-                pscs_content += "  Voting:  "
-                if voting_lower > 0:
-                    pscs_content += '█' * voting_bar_lower_len
-                if voting_upper > voting_lower:
-                    pscs_content += '▓' * voting_bar_range_len
-                pscs_content += f" ({voting_lower}-{voting_upper}%) ".ljust(20) + "\n" # Ensure consistent length
-                
-                # Display Shares Bar
-                pscs_content += "  Shares:  "
-                if shares_lower > 0:
-                    pscs_content += '█' * shares_bar_lower_len
-                if shares_upper > shares_lower:
-                    pscs_content += '▓' * shares_bar_range_len
-                pscs_content += f" ({shares_lower}-{shares_upper}%) ".ljust(20) + "\n"
-                
-                pscs_content += f"  Natures: {', '.join(natures)}\n\n"
-        else:
-            pscs_content = "No Persons with Significant Control found or company is exempt."
+        # --- Step 3: Load Tab Content in the Background ---
+        def load(fetch, format_content):
+            return client.executor.submit(lambda: format_content(fetch(company_number)))
+
+        filing_document = TabDocument(loading=True)
+        filing_summary = Future()
+        history_streams.submit(stream_filing_history, client, company_number, filing_document, filing_summary)
 
         tab_data = {
-            "Profile": profile_content,
-            "Filing History": filing_content,
-            "PSCs": pscs_content
+            "Profile": load(client.get_company_profile, format_company_profile),
+            "Filing History": filing_document,
+            "Filing Summary": filing_summary,
+            "PSCs": load(client.get_persons_with_significant_control, format_pscs),
+            "Owners": background_jobs.submit(load_ultimate_owners, client, company_number),
         }
 
-        display_tabbed_viewer_result = display_tabbed_viewer(stdscr, tab_data, f"Details for {company_number}")
+        def start_download():
+            # Downloads carry on in the background if the user leaves the company.
+            document = TabDocument(loading=True)
+            document_jobs.submit(download_documents, downloader, company_number, document)
+            return "Documents", document
+
+        actions = {'d': ("Download Documents", start_download)} if downloader is not None else None
+        display_tabbed_viewer_result = display_tabbed_viewer(stdscr, tab_data, f"Details for {company_number}", actions)
         
         if display_tabbed_viewer_result == "BACK_TO_NEW_SEARCH":
             break # Break inner loop -> go to outer loop (new search)
@@ -320,70 +844,123 @@ def company_search_flow(stdscr, client):
         elif display_tabbed_viewer_result is None: # User pressed q from tabbed viewer to exit
             return # Exit to main menu
 
-def person_search_flow(stdscr, client):
-    help_text = "↵ Enter | Ctrl+C to Cancel/Exit"
-    input_win = draw_frame(stdscr, "Search Persons", help_text)
-    if input_win is None:
-        stdscr.getch()
-        return
+def download_documents(downloader, company_number, document):
+    """Downloads a company's filed documents, listing each one in the Documents tab as it finishes."""
+    kinds = ", ".join(downloader.categories) if downloader.categories else "all"
+    document.extend([f"Saving documents ({kinds}) to {os.path.join(downloader.directory, company_number)}", ""])
+    try:
+        results = downloader.download_company(company_number, on_result=lambda result: document.extend([format_result(result)]))
+        statuses = [result["status"] for result in results]
+        summary = ", ".join(f"{statuses.count(status)} {status}" for status in dict.fromkeys(statuses))
+        document.extend(["", f"Done: {summary}." if statuses else "No documents found."])
+    except Exception as e:
+        document.extend([f"Failed to download: {e}"])
+    finally:
+        document.finish()
 
-    input_win.addstr(1, 2, "Enter person name to search: ")
-    curses.echo()
-    curses.curs_set(1)        
-    search_query = input_win.getstr(3, 2, 60).decode('utf-8')
-    curses.noecho()
-    curses.curs_set(0)
+def load_ultimate_owners(client, company_number):
+    """Follows corporate PSCs up the ownership chain and builds the Owners tab lines."""
+    return format_ultimate_owners(OwnershipResolver(client).ultimate_owners(company_number))
 
-    if not search_query.strip(): return
+def format_officer_profile(officer):
+    """Builds the Profile tab lines for an officer search result."""
+    lines = [f"Name:             {officer.get('title', 'N/A')}"]
+    
+    address = officer.get('address', {})
+    if address:
+        lines.append(f"Address:          {address.get('address_line_1', '')}, {address.get('locality', '')}, {address.get('postal_code', '')}")
+    lines.append(f"Country of Res:   {officer.get('country_of_residence', 'N/A')}")
+    lines.append(f"Nationality:      {officer.get('nationality', 'N/A')}")
+    lines.append(f"Occupation:       {officer.get('occupation', 'N/A')}")
+    
+    # Date of birth might only be year, so display carefully
+    dob = officer.get('date_of_birth', {})
+    dob_year = dob.get('year')
+    if dob_year:
+        lines.append(f"Date of Birth:    {dob.get('month', '')}/{dob_year}")
+    return lines
 
-    show_status_message(stdscr, "Searching...")
-    search_results = client.search_officers(search_query)
+def format_appointments(officer_appointments):
+    """Builds the Appointments tab lines for an officer."""
+    if not officer_appointments or not officer_appointments.get('items'):
+        return ["No appointment history found."]
+    lines = []
+    for appt in officer_appointments['items']:
+        company_name = appt.get('appointed_to', {}).get('company_name', 'N/A')
+        company_number = appt.get('appointed_to', {}).get('company_number', 'N/A')
+        role = appt.get('officer_role', 'N/A')
+        appointed_on = appt.get('appointed_on', 'N/A')
+        resigned_on = appt.get('resigned_on', 'Current')
+        
+        lines.append(f"Company:   {company_name} ({company_number})")
+        lines.append(f"  Role:      {role}")
+        lines.append(f"  Appointed: {appointed_on}")
+        lines.append(f"  Resigned:  {resigned_on}")
+        lines.append("")
+    return lines
+
+def load_officer_network(client, appointments_link, name=None, max_depth=2, max_requests=30):
+    """Crawls the officers connected to an officer's companies and builds the Network tab lines."""
+    crawler = NetworkCrawler(client, max_depth=max_depth, max_requests=max_requests)
+    root = crawler.add_officer_seed(appointments_link, name)
+    network = crawler.crawl([root])
+    return format_network(network, root, crawler.truncated)
+
+def person_search_flow(stdscr, client):
+    live_search = LiveSearch(client.search_officers, client.executor, seen=seen_officers,
+                             identify=lambda item: item.get('links', {}).get('self'))
+    search_query, search_results = live_search_prompt(
+        stdscr, "Search Persons", "Enter person name to search: ", live_search,
+        lambda item: f"{item.get('title', 'N/A')} - Appointments: {item.get('appointment_count', 0)}",
+    )
+
+    if search_query is None or not search_query.strip(): return
 
     if not search_results or not search_results.get('items'):
         show_status_message(stdscr, f"No persons found for '{search_query}'. Press any key for new search.")
         return # Return to allow a new person search
 
-    # If search results are found, proceed to build menu and allow selection
+    # If search results are found, proceed to build menu and allow selection.
+    # Likely duplicate records of one person are listed together, marked ┌ │ └.
+    officers = [item for item in search_results['items'] if item.get('links', {}).get('self')] # Skip items without a self link
     menu_items = []
-    for item in search_results['items']:
-        name = item.get('title', 'N/A')
-        officer_self_link = item.get('links', {}).get('self') # This is the unique identifier
-        
-        if not officer_self_link: # Skip items without a self link
-            continue
-
-        appointment_count = item.get('appointment_count', 0)
-        
-        display_string = f"{name}"
-        if appointment_count > 0:
-            display_string += f" - Appointments: {appointment_count}"
-        
-        menu_items.append((display_string, officer_self_link)) # Store as a tuple
+    for group in group_duplicates(officers):
+        for member, position in enumerate(group):
+            item = officers[position]
+            if len(group) == 1:
+                marker = "  "
+            else:
+                marker = "┌ " if member == 0 else "└ " if member == len(group) - 1 else "│ "
+            display_string = marker + item.get('title', 'N/A')
+            dob = item.get('date_of_birth') or {}
+            if dob.get('year'):
+                display_string += f" (b. {dob.get('month', '?')}/{dob['year']})"
+            appointment_count = item.get('appointment_count', 0)
+            if appointment_count > 0:
+                display_string += f" - Appointments: {appointment_count}"
+            menu_items.append((display_string, item['links']['self'])) # The self link identifies the officer
     
-    # Debug prints - these will go to stdout, not TUI
-    print(f"DEBUG: menu_items constructed: {menu_items}")
-    print(f"DEBUG: len(menu_items): {len(menu_items)}")
+    logger.debug("Person search menu: %d items", len(menu_items))
 
+    # Summarise every officer's appointments in the background, shown next to each row as they arrive.
+    previews = AppointmentPreviews(client)
+    previews.load(link for _, link in menu_items)
+    try:
+        browse_person_results(stdscr, client, search_results, menu_items, previews)
+    finally:
+        previews.cancel()
+
+def browse_person_results(stdscr, client, search_results, menu_items, previews):
+    """Shows the person results, and the officers picked from them, until the user leaves the list."""
     # Inner loop for viewing search results and person details
     while True:
-        selected_list_result_tuple = select_from_list(stdscr, [item[0] for item in menu_items], "Person Search Results")
-        print(f"DEBUG: select_from_list returned: {selected_list_result_tuple}")
+        selected_officer_self_link = select_from_list(stdscr, menu_items, "Person Search Results", describe=previews.describe)
+        logger.debug("select_from_list returned: %r", selected_officer_self_link)
 
-        if selected_list_result_tuple == "BACK_TO_NEW_SEARCH":
+        if selected_officer_self_link == "BACK_TO_NEW_SEARCH":
             return # Return to allow a new person search
-        elif selected_list_result_tuple is None:
+        elif selected_officer_self_link is None:
             return # Exit to main menu
-        
-        # Extract unique identifier from selected_list_result_tuple
-        # Find the original tuple in menu_items based on the display string
-        selected_item = next((item_tuple for item_tuple in menu_items if item_tuple[0] == selected_list_result_tuple), None)
-
-        if not selected_item: # Should not happen if select_from_list works correctly
-            show_status_message(stdscr, "Error: Selected item not found in menu items. Press any key.")
-            stdscr.getch()
-            return
-
-        selected_officer_self_link = selected_item[1] # Get the self link from the tuple
 
         # Find the selected officer by their unique 'self' link
         selected_officer = next((item for item in search_results['items'] if item.get('links', {}).get('self') == selected_officer_self_link), None)
@@ -394,51 +971,22 @@ def person_search_flow(stdscr, client):
             return
 
         # Prepare tab content for the selected officer
-        profile_content = ""
-        profile_content += f"Name:             {selected_officer.get('title', 'N/A')}\n"
-        
-        address = selected_officer.get('address', {})
-        if address:
-            profile_content += f"Address:          {address.get('address_line_1', '')}, {address.get('locality', '')}, {address.get('postal_code', '')}\n"
-        profile_content += f"Country of Res:   {selected_officer.get('country_of_residence', 'N/A')}\n"
-        profile_content += f"Nationality:      {selected_officer.get('nationality', 'N/A')}\n"
-        profile_content += f"Occupation:       {selected_officer.get('occupation', 'N/A')}\n"
-        
-        # Date of birth might only be year, so display carefully
-        dob = selected_officer.get('date_of_birth', {})
-        dob_year = dob.get('year')
-        if dob_year:
-            profile_content += f"Date of Birth:    {dob.get('month', '')}/{dob_year}\n"
-
-        # Associated company information
         links = selected_officer.get('links', {})
         appointments_link = links.get('self') # Corrected: Use 'self' key for appointments link
-        
-        appointments_content = ""
+
         if appointments_link:
-            show_status_message(stdscr, "Fetching appointments...")
-            officer_appointments = client.get_officer_appointments(appointments_link)
-            if officer_appointments and officer_appointments.get('items'):
-                for appt in officer_appointments['items']:
-                    company_name = appt.get('appointed_to', {}).get('company_name', 'N/A')
-                    company_number = appt.get('appointed_to', {}).get('company_number', 'N/A')
-                    role = appt.get('officer_role', 'N/A')
-                    appointed_on = appt.get('appointed_on', 'N/A')
-                    resigned_on = appt.get('resigned_on', 'Current')
-                    
-                    appointments_content += f"Company:   {company_name} ({company_number})\n"
-                    appointments_content += f"  Role:      {role}\n"
-                    appointments_content += f"  Appointed: {appointed_on}\n"
-                    appointments_content += f"  Resigned:  {resigned_on}\n\n"
-            else:
-                appointments_content = "No appointment history found."
+            appointments_content = client.executor.submit(
+                lambda: format_appointments(client.get_officer_appointments(appointments_link))
+            )
         else:
             appointments_content = "No appointments link available."
-        
+
         tab_data = {
-            "Profile": profile_content,
-            "Appointments": appointments_content # Add the new appointments tab
+            "Profile": format_officer_profile(selected_officer),
+            "Appointments": appointments_content, # Add the new appointments tab
         }
+        if appointments_link:
+            tab_data["Network"] = background_jobs.submit(load_officer_network, client, appointments_link, selected_officer.get('title'))
 
         display_tabbed_viewer_result = display_tabbed_viewer(stdscr, tab_data, f"Details for {selected_officer.get('title', 'N/A')}")
         
@@ -449,13 +997,58 @@ def person_search_flow(stdscr, client):
         elif display_tabbed_viewer_result is None:
             return # Exit to main menu
 
+def format_request_stats(client, prefetcher=None):
+    """
+    Builds the Request Stats screen: quota usage, overall totals, prefetching
+    and the per-endpoint latency table.
+    """
+    totals = client.metrics.totals()
+    quota = client.quota_status()
+    lines = [
+        f"Requests: {totals['calls']}   Errors: {totals['errors']}   Retries: {totals['retries']}   "
+        f"429s: {totals['rate_limited']}   Received: {totals['bytes'] / 1024:.1f} KB",
+        f"Cache hits: {totals['cache_hits']}   Misses: {totals['cache_misses']}   "
+        f"Revalidated (304): {totals['not_modified']}   Shared in-flight: {totals['coalesced']}   "
+        f"Rate-limit wait: {totals['wait_seconds']:.1f}s",
+        "Quota: " + ", ".join(f"{key}={value}" for key, value in quota.items() if key != "keys"),
+    ]
+    for key in quota.get("keys", ()):
+        lines.append(f"  Key {key['key']}: {key['state']}, {key['requests']} requests, {key['errors']} errors, "
+                     f"{key['available']} available, {key['rate_limited']} 429s")
+    if prefetcher is not None and prefetcher.enabled:
+        stats = prefetcher.stats
+        lines.append(f"Prefetch ({prefetcher.budget:.0%} of quota): {stats['warmed']} warmed, "
+                     f"{stats['unavailable']} partly unavailable, {stats['cancelled']} cancelled, "
+                     f"{stats['over_budget']} over budget, {stats['failed']} failed")
+    return lines + [""] + client.metrics.format_table()
+
+
+def prefetch_share():
+    """
+    Share of the API quota spent warming the cache for likely selections, from
+    COMPANYCHECK_PREFETCH (0 turns it off). Read before curses starts, so a bad
+    value falls back to the default with a message rather than crashing.
+    """
+    value = os.getenv("COMPANYCHECK_PREFETCH", "0.25")
+    try:
+        share = float(value)
+    except ValueError:
+        share = -1.0
+    if not 0 <= share <= 1:
+        print(f"Ignoring COMPANYCHECK_PREFETCH={value!r}: expected a share from 0 to 1. Using 0.25.", file=sys.stderr)
+        share = 0.25
+    return share
+
+
 # New main function structure
-def main(stdscr):
+def main(stdscr, prefetch_budget=0.25):
     """Main function to run the TUI application with full navigation."""
     curses.curs_set(0)
 
     try:
-        client = CompaniesHouseAPI()
+        index_path = default_index_path()
+        local_index = CompanyIndex(index_path) if os.path.exists(index_path) else None
+        client = CompaniesHouseAPI(cache=ResponseCache.default(), local_index=local_index)
     except ValueError as e:
         stdscr.clear()
         stdscr.addstr(0, 0, f"API Key Error: {e}. Press any key to exit.")
@@ -463,16 +1056,37 @@ def main(stdscr):
         stdscr.getch()
         return # Exit app
 
-    while True:
-        menu_options = ["Search for Company", "Search for Person", "Exit"]
-        selected_option = select_from_list(stdscr, menu_options, "Main Menu")
+    prefetcher = Prefetcher(client, budget=prefetch_budget)
+    downloader = DocumentDownloader(client)
+    try:
+        while True:
+            menu_options = ["Search for Company", "Search for Person", "Request Stats", "Exit"]
+            selected_option = select_from_list(stdscr, menu_options, "Main Menu")
 
-        if selected_option == "Search for Company":
-            company_search_flow(stdscr, client)
-        elif selected_option == "Search for Person":
-            person_search_flow(stdscr, client) # Call the new person search flow function here
-        elif selected_option == "Exit" or selected_option is None: # None if user quits select_from_list
-            break # Exit the main loop to terminate the program
+            if selected_option == "Search for Company":
+                company_search_flow(stdscr, client, prefetcher, downloader)
+            elif selected_option == "Search for Person":
+                person_search_flow(stdscr, client) # Call the new person search flow function here
+            elif selected_option == "Request Stats":
+                display_tabbed_viewer(stdscr, {"Requests": format_request_stats(client, prefetcher)}, "Request Stats")
+            elif selected_option == "Exit" or selected_option is None: # None if user quits select_from_list
+                break # Exit the main loop to terminate the program
+    finally:
+        # Also on Ctrl+C: drop queued work so the interpreter isn't left waiting on it.
+        for executor in (background_jobs, history_streams, document_jobs):
+            executor.shutdown(wait=False, cancel_futures=True)
+        prefetcher.close()
+        downloader.close()
+        client.close()
 
 if __name__ == "__main__":
-    curses.wrapper(main)
+    os.environ.setdefault("ESCDELAY", "25") # Make Esc respond immediately
+    # Logging must never write to the terminal curses owns; send it to a file if asked.
+    logging.basicConfig(filename=os.getenv("COMPANYCHECK_LOG", os.devnull),
+                        level=os.getenv("COMPANYCHECK_LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    budget = prefetch_share()
+    try:
+        curses.wrapper(main, budget)
+    except KeyboardInterrupt:
+        pass
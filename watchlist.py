@@ -0,0 +1,617 @@
+"""
+Change monitoring for a watchlist of companies.
+
+Each watched company is stored in a small SQLite database as a fingerprint of
+the profile fields worth alerting on, a digest of its PSCs and the ID and date
+of the newest filing seen. A check costs one request for the first few items
+of the filing history (revalidated with its ETag when the client has a cache),
+walking back only as far as the first filing already seen. The profile and the
+PSC list are fetched only when a new filing suggests they changed (or the
+profile's weekly recheck is due), so a cycle over 100k companies costs
+little more than 100k small requests, against several full-size requests per
+company to refetch everything.
+
+Checks are scheduled across the polling interval rather than all at once, and
+paced to a share of the API quota so interactive use still has room.
+
+    python3 watchlist.py add numbers.txt
+    python3 watchlist.py poll --interval 86400 -o events.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import as_completed
+
+from companies_house_api import RequestFailed
+from rate_limiter import RateLimiter
+from records import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Profile fields whose change is reported; anything else in the profile is ignored.
+PROFILE_FIELDS = (
+    ("company_name",),
+    ("company_status",),
+    ("company_status_detail",),
+    ("registered_office_address",),
+    ("sic_codes",),
+    ("has_insolvency_history",),
+    ("has_charges",),
+    ("date_of_cessation",),
+    ("accounts", "next_due"),
+    ("accounts", "last_accounts", "made_up_to"),
+    ("confirmation_statement", "next_due"),
+)
+
+# Filings after which the PSC register is refetched.
+PSC_FILING_CATEGORIES = {"persons-with-significant-control"}
+PSC_FILING_TYPES = {"CS01"}  # Confirmation statements can carry PSC updates
+
+
+def _field(data, path):
+    for key in path:
+        if data is None:
+            return None
+        data = data.get(key)
+    return data
+
+
+def profile_snapshot(profile):
+    """
+    Returns the monitored fields of a profile (a JSON dict or CompanyProfile) as a dict.
+    """
+    if hasattr(profile, "to_dict"):
+        profile = profile.to_dict()
+        # Records flatten the nested fields; map them back to their JSON paths.
+        profile["accounts"] = {"next_due": profile.get("accounts_next_due"),
+                               "last_accounts": {"made_up_to": profile.get("last_accounts_made_up_to")}}
+        profile["confirmation_statement"] = {"next_due": profile.get("confirmation_statement_next_due")}
+    snapshot = {}
+    for path in PROFILE_FIELDS:
+        value = _field(profile, path)
+        if value is not None:
+            snapshot[".".join(path)] = value
+    return snapshot
+
+
+def fingerprint(value):
+    """Returns a 32-bit fingerprint of a JSON-serialisable value."""
+    return zlib.crc32(json.dumps(value, sort_keys=True).encode("utf-8"))
+
+
+def psc_digest(pscs):
+    """
+    Returns a compact digest of a PSC list response: each PSC's fingerprint
+    (over name, kind, natures and dates) mapped to its name and whether it is
+    still active.
+    """
+    digest = {}
+    for psc in (pscs.get("items") if pscs is not None else None) or ():
+        key = (psc.get("name"), psc.get("kind"), list(psc.get("natures_of_control") or ()),
+               psc.get("notified_on"), psc.get("ceased_on"))
+        digest[str(fingerprint(key))] = [psc.get("name") or "Unknown", not psc.get("ceased_on")]
+    return digest
+
+
+def diff_pscs(old, new):
+    """
+    Compares two PSC digests.
+
+    Returns:
+        dict: Names "added", "removed", "ceased" (newly marked as ceased) and
+              "changed" (natures or dates changed), each sorted.
+    """
+    old_active = {name: active for name, active in old.values()}
+    new_active = {name: active for name, active in new.values()}
+    changed_names = {name for key, (name, _) in new.items() if key not in old}
+    changed_names |= {name for key, (name, _) in old.items() if key not in new}
+    ceased = {name for name in changed_names if old_active.get(name) and new_active.get(name) is False}
+    added = set(new_active) - set(old_active)
+    removed = set(old_active) - set(new_active)
+    return {
+        "added": sorted(added),
+        "removed": sorted(removed),
+        "ceased": sorted(ceased),
+        "changed": sorted(changed_names - added - removed - ceased),
+    }
+
+
+class WatchEvent:
+    """
+    A change noticed on a watched company.
+
+    kind is one of "new_filing", "status_change", "profile_change" or
+    "psc_change"; detail holds the specifics (the filing, the old and new
+    status, the changed fields, or the PSCs added, removed and ceased).
+    """
+
+    __slots__ = ("company_number", "kind", "detail", "at")
+
+    def __init__(self, company_number, kind, detail, at=None):
+        self.company_number = company_number
+        self.kind = kind
+        self.detail = detail
+        self.at = at or time.time()
+
+    def to_dict(self):
+        return {"company_number": self.company_number, "kind": self.kind, "detail": self.detail, "at": self.at}
+
+    def __repr__(self):
+        return f"WatchEvent({self.company_number!r}, {self.kind!r}, {self.detail!r})"
+
+
+class WatchState:
+    """
+    What is known about one watched company. `profile` holds the monitored
+    profile fields, kept so changes can be reported field by field.
+    """
+
+    __slots__ = ("company_number", "profile_fingerprint", "profile", "psc_digest", "last_transaction_id",
+                 "last_filing_date", "profile_checked_at", "next_check_at")
+
+    def __init__(self, company_number, profile_fingerprint=None, profile=None, psc_digest=None,
+                 last_transaction_id=None, last_filing_date=None, profile_checked_at=0.0, next_check_at=0.0):
+        self.company_number = company_number
+        self.profile_fingerprint = profile_fingerprint
+        self.profile = profile
+        self.psc_digest = psc_digest
+        self.last_transaction_id = last_transaction_id
+        self.last_filing_date = last_filing_date
+        self.profile_checked_at = profile_checked_at
+        self.next_check_at = next_check_at
+
+    @property
+    def baselined(self):
+        return self.profile_fingerprint is not None
+
+
+class WatchlistStore:
+    """
+    SQLite table of watched companies and their last known state.
+    """
+
+    COLUMNS = WatchState.__slots__
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watchlist ("
+            " company_number TEXT PRIMARY KEY,"
+            " profile_fingerprint INTEGER,"
+            " profile TEXT,"
+            " psc_digest TEXT,"
+            " last_transaction_id TEXT,"
+            " last_filing_date TEXT,"
+            " profile_checked_at REAL NOT NULL DEFAULT 0,"
+            " next_check_at REAL NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS watchlist_due ON watchlist (next_check_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def default_path():
+        cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        return os.path.join(cache_home, "companycheck", "watchlist.sqlite3")
+
+    def add(self, company_numbers, first_check_at):
+        """
+        Adds companies not already watched. `first_check_at(number)` gives the
+        time of each one's first check.
+
+        Returns:
+            int: The number of companies added.
+        """
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO watchlist (company_number, next_check_at) VALUES (?, ?)",
+                ((number, first_check_at(number)) for number in company_numbers),
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def remove(self, company_numbers):
+        with self._lock:
+            self._conn.executemany("DELETE FROM watchlist WHERE company_number = ?",
+                                   ((number,) for number in company_numbers))
+            self._conn.commit()
+
+    def get(self, company_number):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM watchlist WHERE company_number = ?",
+                                     (company_number,)).fetchone()
+        return self._state(row) if row else None
+
+    def due(self, now, limit):
+        """Returns up to `limit` companies whose next check is due, most overdue first."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM watchlist WHERE next_check_at <= ?"
+                " ORDER BY next_check_at LIMIT ?", (now, limit)).fetchall()
+        return [self._state(row) for row in rows]
+
+    def next_due_at(self):
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(next_check_at) FROM watchlist").fetchone()
+        return row[0]
+
+    def save(self, states):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE watchlist SET profile_fingerprint = ?, profile = ?, psc_digest = ?, last_transaction_id = ?,"
+                " last_filing_date = ?, profile_checked_at = ?, next_check_at = ? WHERE company_number = ?",
+                ((state.profile_fingerprint, dumps(state.profile) if state.profile is not None else None,
+                  dumps(state.psc_digest) if state.psc_digest is not None else None,
+                  state.last_transaction_id, state.last_filing_date, state.profile_checked_at,
+                  state.next_check_at, state.company_number) for state in states),
+            )
+            self._conn.commit()
+
+    def company_numbers(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT company_number FROM watchlist ORDER BY company_number")]
+
+    def _state(self, row):
+        values = dict(zip(self.COLUMNS, row))
+        for name in ("profile", "psc_digest"):
+            if values[name] is not None:
+                values[name] = loads(values[name])
+        return WatchState(**values)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM watchlist").fetchone()[0]
+
+
+class Watchlist:
+    """
+    Polls watched companies incrementally and reports what changed.
+    """
+
+    def __init__(self, client, store=None, interval=24 * 60 * 60, profile_interval=7 * 24 * 60 * 60,
+                 page_size=5, quota_share=0.5, retry_delay=15 * 60):
+        """
+        Args:
+            client (CompaniesHouseAPI): Client used for the checks. Give it a
+                                        ResponseCache so unchanged pages come
+                                        back as 304s.
+            store (WatchlistStore, optional): Where the watched companies are kept.
+                                              Defaults to the store at
+                                              WatchlistStore.default_path().
+            interval (float): Seconds between checks of each company. Defaults to a day.
+            profile_interval (float): Seconds after which the profile is rechecked
+                                      even without a new filing. Defaults to a week.
+            page_size (int): Filing history items requested by each check. Defaults to 5.
+            quota_share (float): Share of the client's request quota the checks may
+                                 use. Defaults to 0.5.
+            retry_delay (float): Seconds after which a check whose requests failed
+                                 is repeated, if that comes before its next
+                                 regular check. Defaults to 15 minutes.
+        """
+        self.client = client
+        self.store = store if store is not None else WatchlistStore(WatchlistStore.default_path())
+        self.interval = interval
+        self.profile_interval = profile_interval
+        self.page_size = page_size
+        self.quota_share = quota_share
+        self.retry_delay = retry_delay
+        self.checks = 0
+        self.requests = 0
+        self._counter_lock = threading.Lock()
+
+        limiter = client.rate_limiter
+        self.pacer = RateLimiter(limit=max(1, int(limiter.limit * len(client.keys) * quota_share)),
+                                 window=limiter.window)
+
+    def add(self, company_numbers):
+        """
+        Starts watching companies. Their first checks (which only record a
+        baseline) are spread over the next polling interval.
+
+        Returns:
+            int: The number of companies that weren't already watched.
+        """
+        now = time.time()
+        return self.store.add(company_numbers,
+                              lambda number: now + (zlib.crc32(number.encode()) % 10000) / 10000 * self.interval)
+
+    def remove(self, company_numbers):
+        self.store.remove(company_numbers)
+
+    def _fetch(self, method, *args, **kwargs):
+        with self._counter_lock:
+            self.requests += 1
+        return method(*args, **kwargs)
+
+    def _new_filings(self, state):
+        """
+        Returns the filings newer than the last one seen, newest first (just the
+        first page for a company not yet baselined). Raises RequestFailed if a
+        request failed.
+        """
+        number = state.company_number
+        start_index, page_size = 0, self.page_size
+        new = []
+        while True:
+            page = self._fetch(self.client.get_filing_history, number, items_per_page=page_size,
+                               start_index=start_index, fresh=True, raise_errors=True)
+            if page is None:
+                return new  # A 404: the company hasn't filed anything yet
+            items = page.get("items") or []
+            for item in items:
+                if item.get("transaction_id") == state.last_transaction_id:
+                    return new
+                if state.last_filing_date and (item.get("date") or "") < state.last_filing_date:
+                    # Older than the last filing seen, which must have been removed.
+                    return new
+                new.append(item)
+            start_index += len(items)
+            total = page.get("total_count")
+            if not items or not state.last_transaction_id or (total is not None and start_index >= total):
+                return new
+            page_size = 100  # Catching up on a busy company
+
+    def check(self, state):
+        """
+        Checks one company, updating `state` in place.
+
+        `state` is only updated once every request the check needs has
+        succeeded. A check that fails part way leaves it as it was, so the next
+        check sees the same new filings again and the profile or PSC change
+        behind them isn't lost.
+
+        Returns:
+            list: The WatchEvent objects for what changed (none for a first check,
+                  which only records the baseline).
+
+        Raises:
+            RequestFailed: If a request failed.
+        """
+        with self._counter_lock:
+            self.checks += 1
+        number = state.company_number
+        now = time.time()
+        events = []
+
+        filings = self._new_filings(state)
+        profile = None
+        if not state.baselined or filings or now - state.profile_checked_at >= self.profile_interval:
+            profile = self._fetch(self.client.get_company_profile, number, fresh=True, raise_errors=True)
+        digest = None
+        if state.psc_digest is None or any(
+                item.get("category") in PSC_FILING_CATEGORIES or item.get("type") in PSC_FILING_TYPES
+                for item in filings):
+            pscs = self._fetch(self.client.get_persons_with_significant_control, number, fresh=True,
+                               raise_errors=True)
+            digest = psc_digest(pscs)  # pscs is None for a 404: the company has no PSCs
+
+        if state.baselined:
+            for item in reversed(filings):
+                events.append(WatchEvent(number, "new_filing", {
+                    "transaction_id": item.get("transaction_id"), "date": item.get("date"),
+                    "type": item.get("type"), "category": item.get("category"),
+                    "description": item.get("description"),
+                }, now))
+        if filings:
+            state.last_transaction_id = filings[0].get("transaction_id")
+            state.last_filing_date = filings[0].get("date")
+
+        if profile is not None:
+            snapshot = profile_snapshot(profile)
+            new_fingerprint = fingerprint(snapshot)
+            if state.baselined and new_fingerprint != state.profile_fingerprint:
+                events.extend(self._profile_events(number, state.profile or {}, snapshot, now))
+            state.profile_fingerprint, state.profile = new_fingerprint, snapshot
+            state.profile_checked_at = now
+
+        if digest is not None:
+            if state.psc_digest is not None and digest != state.psc_digest:
+                events.append(WatchEvent(number, "psc_change", diff_pscs(state.psc_digest, digest), now))
+            state.psc_digest = digest
+        return events
+
+    @staticmethod
+    def _profile_events(number, old, new, now):
+        events = []
+        if old.get("company_status") != new.get("company_status"):
+            events.append(WatchEvent(number, "status_change", {
+                "from": old.get("company_status"), "to": new.get("company_status")}, now))
+        changed = {key: {"from": old.get(key), "to": new.get(key)}
+                   for key in sorted(set(old) | set(new)) if key != "company_status" and old.get(key) != new.get(key)}
+        if changed:
+            events.append(WatchEvent(number, "profile_change", changed, now))
+        return events
+
+    def poll(self, limit=500, on_event=None):
+        """
+        Checks the companies that are due, up to `limit` of them, in parallel on
+        the client's worker pool.
+
+        Args:
+            limit (int): Most companies checked in this call.
+            on_event (callable, optional): Called with each WatchEvent as it is found.
+
+        Returns:
+            list: The WatchEvent objects found.
+        """
+        now = time.time()
+        return self._check_all(self.store.due(now, limit), now, on_event)
+
+    def poll_all(self, on_event=None, batch=500):
+        """
+        Checks every watched company once, due or not. Companies not yet due
+        keep their place in the schedule.
+
+        Returns:
+            list: The WatchEvent objects found.
+        """
+        events = []
+        numbers = self.store.company_numbers()
+        for start in range(0, len(numbers), batch):
+            states = [self.store.get(number) for number in numbers[start:start + batch]]
+            events.extend(self._check_all([state for state in states if state is not None], time.time(), on_event))
+        return events
+
+    def _check_all(self, states, now, on_event):
+        def check(state):
+            self.pacer.acquire()
+            return self.check(state)
+
+        events = []
+        futures = {self.client.executor.submit(check, state): state for state in states}
+        for future in as_completed(futures):
+            state = futures[future]
+            self._reschedule(state, now)
+            try:
+                found = future.result()
+            except RequestFailed as err:
+                logger.info("Check of %s failed, retrying in %.0fs: %s", state.company_number, self.retry_delay, err)
+                state.next_check_at = min(state.next_check_at, time.time() + self.retry_delay)
+                found = []
+            except Exception as err:
+                logger.warning("Check of %s failed: %s", state.company_number, err)
+                found = []
+            for event in found:
+                if on_event is not None:
+                    on_event(event)
+            events.extend(found)
+        self.store.save(states)
+        return events
+
+    def _reschedule(self, state, now):
+        # Move to the company's next slot after now, so checks stay spread over
+        # the interval even after the poller has been stopped for a while.
+        if state.next_check_at > now:
+            return
+        if self.interval <= 0:
+            state.next_check_at = now
+            return
+        state.next_check_at += self.interval * (int((now - state.next_check_at) // self.interval) + 1)
+
+    def run(self, on_event=None, stop=None, batch=100):
+        """
+        Polls forever (or until the `stop` threading.Event is set), checking
+        each company once per interval.
+        """
+        count = len(self.store)
+        capacity = self.pacer.rate * self.interval
+        if count > capacity:
+            logger.warning("%d companies can't all be checked every %.0fs with %d%% of the quota; "
+                           "each cycle will take about %.0fs", count, self.interval,
+                           self.quota_share * 100, count / self.pacer.rate)
+        while stop is None or not stop.is_set():
+            if self.poll(batch, on_event) or self._due_soon():
+                continue
+            next_due = self.store.next_due_at()
+            delay = 60.0 if next_due is None else min(60.0, max(0.0, next_due - time.time()))
+            if stop is not None:
+                stop.wait(delay)
+            else:
+                time.sleep(delay)
+
+    def _due_soon(self):
+        next_due = self.store.next_due_at()
+        return next_due is not None and next_due <= time.time()
+
+    def close(self):
+        self.store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch companies for new filings, status and PSC changes.")
+    parser.add_argument("--db", help="Watchlist database. Defaults to ~/.cache/companycheck/watchlist.sqlite3.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Watch the company numbers in a file (one per line, '-' for stdin).")
+    add.add_argument("input")
+    remove = commands.add_parser("remove", help="Stop watching companies.")
+    remove.add_argument("company_numbers", nargs="+")
+    commands.add_parser("list", help="List the watched companies.")
+    poll = commands.add_parser("poll", help="Check the watched companies and print what changed as JSON Lines.")
+    poll.add_argument("-o", "--output", default="-", help="Events file, appended to ('-' for stdout).")
+    poll.add_argument("--once", action="store_true", help="Check every company now, once, then exit.")
+    poll.add_argument("--interval", type=float, default=24 * 60 * 60,
+                      help="Seconds between checks of each company. Defaults to 86400.")
+    poll.add_argument("--profile-interval", type=float, default=7 * 24 * 60 * 60,
+                      help="Seconds between profile rechecks when nothing was filed. Defaults to a week.")
+    poll.add_argument("--quota-share", type=float, default=0.5,
+                      help="Share of the API quota to use. Defaults to 0.5.")
+    poll.add_argument("--workers", type=int, default=8, help="Companies checked in parallel. Defaults to 8.")
+    poll.add_argument("-v", "--verbose", action="store_true", help="Log retries and failed requests to stderr.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if getattr(args, "verbose", False) else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    store = WatchlistStore(args.db or WatchlistStore.default_path())
+
+    if args.command == "list":
+        for number in store.company_numbers():
+            print(number)
+        return 0
+    if args.command == "remove":
+        store.remove(args.company_numbers)
+        return 0
+
+    from batch_enrich import read_company_numbers
+    from companies_house_api import CompaniesHouseAPI
+    from response_cache import ResponseCache
+
+    try:
+        client = CompaniesHouseAPI(max_workers=getattr(args, "workers", 8), cache=ResponseCache.default())
+    except ValueError as e:
+        print(f"API Key Error: {e}", file=sys.stderr)
+        return 2
+    watchlist = Watchlist(client, store, interval=getattr(args, "interval", 24 * 60 * 60),
+                          profile_interval=getattr(args, "profile_interval", 7 * 24 * 60 * 60),
+                          quota_share=getattr(args, "quota_share", 0.5))
+    try:
+        if args.command == "add":
+            source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+            with source:
+                added = watchlist.add(read_company_numbers(source))
+            print(f"Watching {len(store)} companies ({added} added).", file=sys.stderr)
+            return 0
+
+        output = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+
+        def emit(event):
+            output.write(json.dumps(event.to_dict()) + "\n")
+            output.flush()
+
+        try:
+            if args.once:
+                watchlist.poll_all(emit)
+            else:
+                watchlist.run(emit)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        quota = client.quota_status()
+        quota.pop("keys", None)
+        print(f"{watchlist.checks} checks, {watchlist.requests} requests. Quota: {quota}", file=sys.stderr)
+    finally:
+        client.close()
+        watchlist.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())